@@ -10,4 +10,7 @@ admin.site.register(TaskImage)
 admin.site.register(Project)
 admin.site.register(ProjectMember)
 admin.site.register(ProjectImage)
-admin.site.register(Notification)
\ No newline at end of file
+admin.site.register(Notification)
+admin.site.register(ProjectTicketStats)
+admin.site.register(Job)
+admin.site.register(NotificationCounter)
@@ -0,0 +1,84 @@
+# assignments.py
+"""
+Assigning one task to many people at once.
+
+`assign_task()` writes a task per assignee, the shared image rows and one
+notification per assignee with batched INSERTs in a single transaction, so the
+query count stays the same whether the task goes to 2 people or 200. Images
+are stored once; every task's image row points at the same content-addressed
+file (see core/storage.py), and renditions are built once and shared (see
+core/images.py).
+"""
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Q
+from .jobs import enqueue
+from .models import Task, TaskImage, User
+from .notifications import build_notifications, send_notifications
+from .storage import is_blob
+from .uploads import claim_uploads
+
+MAX_ASSIGNEES = 1000
+
+
+def resolve_assignees(user_ids=(), departments=(), roles=()):
+    """
+    Active users matching the ids or selectors, in one query, as
+    ({user_id: user}, [requested ids that matched nobody]).
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    selector = Q(id__in=user_ids)
+    if departments:
+        selector |= Q(department__in=departments)
+    if roles:
+        selector |= Q(role__in=roles)
+    users = {user.id: user for user in User.objects.filter(selector, is_active=True).order_by('id')}
+    return users, [user_id for user_id in user_ids if user_id not in users]
+
+
+def _store_images(files, upload_names, copies):
+    # Each file is written once and then referenced by all `copies` rows
+    field = TaskImage._meta.get_field('image')
+    names = [default_storage.save(field.generate_filename(None, file.name), file) for file in files]
+    names += upload_names
+    if copies > 1:
+        for name in names:
+            if is_blob(name):
+                default_storage.add_reference(name, count=copies - 1)
+    return names
+
+
+def assign_task(template, assigned_by, assignees, files=(), upload_ids=()):
+    """
+    Create a copy of the task `template` (model field values) for every user in
+    `assignees` and notify them. Returns the tasks in assignee order.
+    """
+    assignees = list(assignees)
+    with transaction.atomic():
+        tasks = Task.objects.bulk_create([
+            Task(**template, user=assignee, assigned_by=assigned_by)
+            for assignee in assignees
+        ])
+
+        names = _store_images(files, claim_uploads(assigned_by, upload_ids), len(tasks))
+        images = TaskImage.objects.bulk_create([
+            TaskImage(task=task, image=name)
+            for name in names
+            for task in tasks
+        ])
+        for start in range(0, len(images), len(tasks)):
+            # Renditions are rendered once per image and shared by every task
+            pks = [image.pk for image in images[start:start + len(tasks)]]
+            enqueue('images.share_renditions', {'model': 'core.TaskImage', 'pks': pks})
+
+        notifications = []
+        for task in tasks:
+            notifications += build_notifications(
+                f"{assigned_by.username} has assigned you a new task.",
+                'task',
+                users=[task.user_id],
+                task=task,  # Link the notification to the specific task
+                created_by=assigned_by,
+            )
+        send_notifications(notifications)
+    return tasks
@@ -0,0 +1,114 @@
+# authentication.py
+"""
+JWT authentication without a user SELECT on every request.
+
+`CachedJWTAuthentication` resolves the token's user from a small per-process
+cache of user rows, refreshed at most every AUTH_USER_CACHE_TTL seconds. Every
+request gets its own `User` instance built from the cached row, so views can
+modify and save `request.user` freely. Views that change or delete a user call
+`forget_user()`. That only reaches the current process; the others pick up the
+change when their entry expires, which bounds how long a change can go unseen.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import FileField
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from .routing import note_user, use_primary
+
+
+class UserCache:
+    """
+    Thread-safe LRU of user rows keyed by ID, each entry expiring after `ttl` seconds.
+    """
+
+    def __init__(self, ttl, maxsize):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._rows = OrderedDict()
+
+    def get(self, model, user_id):
+        key = str(user_id)
+        with self._lock:
+            entry = self._rows.get(key)
+            if entry is None:
+                return None
+            expires_at, field_names, values = entry
+            if expires_at <= time.monotonic():
+                del self._rows[key]
+                return None
+            self._rows.move_to_end(key)
+        return model.from_db(DEFAULT_DB_ALIAS, field_names, values)
+
+    def put(self, user):
+        fields = user._meta.concrete_fields
+        field_names = [field.attname for field in fields]
+        values = [self._column_value(user, field) for field in fields]
+        with self._lock:
+            self._rows[str(user.pk)] = (time.monotonic() + self.ttl, field_names, values)
+            self._rows.move_to_end(str(user.pk))
+            while len(self._rows) > self.maxsize:
+                self._rows.popitem(last=False)
+
+    @staticmethod
+    def _column_value(user, field):
+        # What the database would return; a FieldFile is bound to `user` and
+        # would be shared by every instance built from the entry
+        value = field.value_from_object(user)
+        if isinstance(field, FileField):
+            return value.name
+        return value
+
+    def forget(self, user_id):
+        with self._lock:
+            self._rows.pop(str(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
+
+
+user_cache = UserCache(
+    ttl=getattr(settings, 'AUTH_USER_CACHE_TTL', 30),
+    maxsize=getattr(settings, 'AUTH_USER_CACHE_SIZE', 10_000),
+)
+
+
+def forget_user(user_id):
+    """
+    Drop a changed or deleted user from this process's authentication cache.
+    """
+    user_cache.forget(user_id)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that loads the user from `user_cache` when it can.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        user = user_cache.get(self.user_model, user_id) if user_id is not None else None
+        if user is None:
+            # Missing claim, unknown or inactive users all fail here as usual. Read
+            # from the primary, so a lagging replica cannot revive a deactivated user
+            with use_primary():
+                user = super().get_user(validated_token)
+            user_cache.put(user)
+            note_user(user.pk)
+            return user
+
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        note_user(user.pk)
+        return user
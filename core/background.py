@@ -0,0 +1,34 @@
+# background.py
+"""
+Handlers for the background job queue (see core/jobs.py).
+"""
+from .images import generate_renditions, share_renditions
+from .jobs import job
+from .models import Project
+from .notifications import build_notification_batch, build_notifications, send_notifications
+
+
+@job('notifications.fan_out')
+def fan_out_notifications(payload):
+    send_notifications(build_notifications(**payload))
+
+
+@job('notifications.fan_out_batch')
+def fan_out_notification_batch(payload):
+    send_notifications(build_notification_batch(payload['notifications']))
+
+
+@job('projects.delete')
+def delete_project(payload):
+    # The cascade over tickets, members, images and notifications runs here instead of in the request
+    Project.objects.filter(id=payload['project']).delete()
+
+
+@job('images.renditions')
+def build_image_renditions(payload):
+    generate_renditions(payload['model'], payload['pk'])
+
+
+@job('images.share_renditions')
+def share_image_renditions(payload):
+    share_renditions(payload['model'], payload['pks'])
@@ -0,0 +1,170 @@
+# caching.py
+"""
+Response cache for the project list and project detail endpoints.
+
+Entries are keyed by a version token instead of being deleted. Every user has a
+list version that changes whenever a project they can see changes, Admins
+share one version for the list of all projects, and every project has its own
+version for the detail payload. Invalidation swaps the affected tokens (after
+the transaction commits, so a concurrent rebuild cannot store pre-commit data
+under the new token), and the old entries simply expire.
+
+A miss takes a short lock so only one request rebuilds an entry while the others
+wait for its result. Hits, misses and coalesced waits are counted in the cache
+itself, so the numbers cover every process sharing it (`python manage.py
+project_cache_stats`).
+"""
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from .models import Project, ProjectMember
+from .routing import use_primary
+
+PREFIX = 'project-cache'
+METRICS = ('hits', 'misses', 'coalesced', 'invalidations')
+
+ADMIN_VERSION_KEY = f'{PREFIX}:admin:version'
+
+
+def _user_version_key(user_id):
+    return f'{PREFIX}:user:{user_id}:version'
+
+
+def _project_version_key(project_id):
+    return f'{PREFIX}:project:{project_id}:version'
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _count(metric, amount=1):
+    key = f'{PREFIX}:metrics:{metric}'
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        # First use (or evicted): create it, tolerating a concurrent creator
+        if not cache.add(key, amount, None):
+            cache.incr(key, amount)
+
+
+def metrics():
+    values = cache.get_many([f'{PREFIX}:metrics:{metric}' for metric in METRICS])
+    stats = {metric: values.get(f'{PREFIX}:metrics:{metric}', 0) for metric in METRICS}
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else None
+    return stats
+
+
+def reset_metrics():
+    cache.delete_many([f'{PREFIX}:metrics:{metric}' for metric in METRICS])
+
+
+def _version(key):
+    version = cache.get(key)
+    if version is None:
+        # Never seen or evicted: a fresh token can never match an old entry
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def _params_key(context):
+    fields = ','.join(sorted(context.get('fields') or ()))
+    expand = ','.join(sorted(context.get('expand') or ()))
+    return f'fields={fields}&expand={expand}'
+
+
+def list_key(user, context):
+    if user.role == 'Admin':
+        scope, version = 'all', _version(ADMIN_VERSION_KEY)
+    else:
+        scope, version = f'user:{user.pk}', _version(_user_version_key(user.pk))
+    return f'{PREFIX}:list:{scope}:{version}:{_params_key(context)}'
+
+
+def detail_key(project_id, context):
+    version = _version(_project_version_key(project_id))
+    return f'{PREFIX}:detail:{project_id}:{version}:{_params_key(context)}'
+
+
+def get_or_build(key, build):
+    """
+    Return the cached value for `key`, or build and store it. Concurrent misses
+    on the same key wait for the first builder instead of all hitting the
+    database; if it takes longer than PROJECT_CACHE_WAIT they build it themselves.
+    """
+    value = cache.get(key)
+    if value is not None:
+        _count('hits')
+        return value
+
+    _count('misses')
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, _setting('PROJECT_CACHE_LOCK_TIMEOUT', 10)):
+        try:
+            # Cached entries outlive replica lag, so they are built from the primary
+            with use_primary():
+                value = build()
+            cache.set(key, value, _setting('PROJECT_CACHE_TIMEOUT', 300))
+        finally:
+            cache.delete(lock_key)
+        return value
+
+    deadline = time.monotonic() + _setting('PROJECT_CACHE_WAIT', 2)
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        value = cache.get(key)
+        if value is not None:
+            _count('coalesced')
+            return value
+    with use_primary():
+        return build()
+
+
+def cached_project_list(user, context, build):
+    return get_or_build(list_key(user, context), build)
+
+
+def cached_project_detail(project_id, context, build):
+    return get_or_build(detail_key(project_id, context), build)
+
+
+def project_audience(project_ids):
+    """
+    IDs of the users whose own project list includes any of the projects:
+    team leads, creators and members.
+    """
+    project_ids = list(project_ids)
+    user_ids = set()
+    for lead_id, creator_id in Project.objects.filter(id__in=project_ids).values_list('team_lead_id', 'created_by_id'):
+        user_ids.update((lead_id, creator_id))
+    user_ids.update(ProjectMember.objects.filter(project_id__in=project_ids).values_list('user_id', flat=True))
+    return user_ids
+
+
+def invalidate_projects(project_ids, user_ids=()):
+    """
+    Drop the cached detail of the given projects and the cached lists of everyone
+    who can see them, plus `user_ids` (e.g. a member who was just removed).
+    Takes effect when the current transaction commits.
+    """
+    project_ids = {project_id for project_id in project_ids if project_id is not None}
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if project_ids:
+        user_ids |= project_audience(project_ids)
+    if not project_ids and not user_ids:
+        return
+
+    keys = [ADMIN_VERSION_KEY]
+    keys += [_project_version_key(project_id) for project_id in project_ids]
+    keys += [_user_version_key(user_id) for user_id in user_ids]
+
+    def bump():
+        cache.set_many({key: uuid.uuid4().hex for key in keys}, None)
+        _count('invalidations', len(keys))
+
+    transaction.on_commit(bump)
@@ -0,0 +1,95 @@
+# conditional.py
+"""
+Conditional GET support (ETag / Last-Modified) for the read endpoints.
+
+Validators are computed from the rows' `updated_at` columns with a single
+aggregate query, before anything is serialized: a collection's ETag hashes the
+newest `updated_at`, the row count (so deletions change it), the requesting
+user and the full request path (so `?fields=`, cursors and page sizes get
+their own tags). A view checks `not_modified()` first and only builds the
+payload when the client's copy is stale. Keyset-paginated views select their
+page first and validate only the rows on it (`for_page()`), so a request costs
+the same however long the collection is.
+
+Project payloads nest members, images and ticket progress, so changes to
+those bump the project's `updated_at` through `touch_projects()`. Task payloads
+nest their project, user and assigner, whose `updated_at` the task ETags read
+too. Queryset `.update()` calls skip `auto_now` and must set `updated_at`
+themselves, as must `save(update_fields=...)` calls that leave it out.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.utils.timezone import now
+from .models import Project
+
+# Task payloads nest their project and users, so a task list is stale when any changes
+TASK_STAMPS = ('updated_at', 'project__updated_at', 'user__updated_at', 'assigned_by__updated_at')
+
+
+def touch_projects(project_ids):
+    project_ids = {project_id for project_id in project_ids if project_id is not None}
+    if project_ids:
+        Project.objects.filter(id__in=project_ids).update(updated_at=now())
+
+
+class Validators:
+    """
+    ETag and (for single objects) Last-Modified of a response.
+    """
+
+    def __init__(self, request, latest, *parts, last_modified=False):
+        raw = '|'.join(str(part) for part in (request.user.pk, request.get_full_path(), latest, *parts))
+        self.etag = '"%s"' % hashlib.sha1(raw.encode()).hexdigest()
+        # Deleting a row from a collection does not move its newest timestamp,
+        # so only single objects are validated by date
+        self.last_modified = latest if last_modified else None
+
+    @classmethod
+    def for_queryset(cls, request, queryset, fields=('updated_at',), extra=()):
+        """
+        Validators for a collection, from the newest of `fields` and the row count.
+        """
+        if not queryset.query.is_sliced:
+            queryset = queryset.order_by()
+        aggregates = {f'latest_{n}': Max(field) for n, field in enumerate(fields)}
+        state = queryset.aggregate(count=Count('pk'), **aggregates)
+        stamps = [state[name] for name in aggregates if state[name] is not None]
+        return cls(request, max(stamps) if stamps else None, state['count'], *extra)
+
+    @classmethod
+    def for_page(cls, request, model, rows, fields=('updated_at',), extra=()):
+        """
+        Validators for one page of a keyset-paginated collection, from the rows
+        on it in order and the newest of `fields` among them: one query on the
+        page's primary keys. Pass the next cursor and anything else the payload
+        shows about the rest of the collection in `extra`.
+        """
+        ids = [row.pk for row in rows]
+        return cls.for_queryset(request, model._base_manager.filter(pk__in=ids), fields, extra=(ids, *extra))
+
+    @classmethod
+    def for_object(cls, request, stamps, extra=()):
+        """
+        Validators for a single object whose payload depends on the given timestamps.
+        """
+        stamps = [stamp for stamp in stamps if stamp is not None]
+        return cls(request, max(stamps) if stamps else None, *extra, last_modified=bool(stamps))
+
+    def not_modified(self, request):
+        """
+        The 304 response when the client's copy is current, otherwise None.
+        """
+        last_modified = int(self.last_modified.timestamp()) if self.last_modified else None
+        response = get_conditional_response(request._request, etag=self.etag, last_modified=last_modified)
+        return self.apply(response) if response is not None else None
+
+    def apply(self, response):
+        response['ETag'] = self.etag
+        if self.last_modified:
+            response['Last-Modified'] = http_date(self.last_modified.timestamp())
+        # Payloads are per user; clients may keep them but must revalidate
+        response['Cache-Control'] = 'private, no-cache'
+        return response
@@ -0,0 +1,125 @@
+# counters.py
+from collections import Counter, defaultdict
+
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+from .models import ProjectTicketStats, Task
+
+TICKET_STATUSES = ('pending', 'in_review', 'approved')
+
+
+def _counted_under(is_ticket, project_id, status):
+    # The (project, status) a task is counted under, or None when it is not a ticket
+    return (project_id, status) if is_ticket and project_id is not None else None
+
+
+def _apply(project_id, create=True, **deltas):
+    """
+    Add the given deltas to a project's counters with a single UPDATE. Counters
+    that have drifted low stop at zero instead of failing the write; the next
+    rebuild_ticket_stats() corrects them.
+    """
+    if create:
+        ProjectTicketStats.objects.get_or_create(project_id=project_id)
+    ProjectTicketStats.objects.filter(project_id=project_id).update(
+        **{field: Greatest(F(field) + delta, 0) for field, delta in deltas.items()}
+    )
+
+
+def ticket_saved(task, previous):
+    """
+    Counter update for a saved task, given the (is_ticket, project_id, status)
+    it had before the save, or None for a new task. Called from the Task
+    post_save handler in core/signals.py.
+    """
+    before = _counted_under(*previous) if previous else None
+    after = _counted_under(task.is_ticket, task.project_id, task.status)
+    if before == after:
+        return
+    deltas = defaultdict(Counter)
+    if before:
+        deltas[before[0]].update({'total': -1, before[1]: -1})
+    if after:
+        deltas[after[0]].update({'total': 1, after[1]: 1})
+    for project_id, project_deltas in deltas.items():
+        project_deltas = {field: delta for field, delta in project_deltas.items() if delta}
+        if project_deltas:
+            _apply(project_id, create=bool(after) and project_id == after[0], **project_deltas)
+
+
+def tickets_moved(moved_per_project, old_status, new_status):
+    """
+    Counter update for a bulk status change, given {project_id: tickets moved}.
+    """
+    for project_id, moved in moved_per_project.items():
+        if project_id is not None and moved:
+            _apply(project_id, **{old_status: -moved, new_status: moved})
+
+
+def tickets_deleted(tasks):
+    """
+    Counter update for tasks about to be deleted, given as a queryset: one
+    grouped count, then one UPDATE per project. Returns the project ids.
+    """
+    deltas = defaultdict(Counter)
+    for row in tasks.filter(is_ticket=True, project__isnull=False).values('project_id', 'status').annotate(n=Count('id')):
+        deltas[row['project_id']].update({'total': -row['n'], row['status']: -row['n']})
+    for project_id, project_deltas in deltas.items():
+        # Never create a row here; a project without one is recounted by rebuild_ticket_stats
+        _apply(project_id, create=False, **project_deltas)
+    return set(deltas)
+
+
+def count_tickets(project_ids=None):
+    """
+    Recount tickets from the Task table. Returns {project_id: {field: count}}.
+    """
+    tickets = Task.objects.filter(is_ticket=True, project__isnull=False)
+    if project_ids is not None:
+        tickets = tickets.filter(project_id__in=project_ids)
+
+    counts = {}
+    for row in tickets.values('project_id', 'status').annotate(n=Count('id')):
+        stats = counts.setdefault(row['project_id'], dict.fromkeys(('total',) + TICKET_STATUSES, 0))
+        stats[row['status']] += row['n']
+        stats['total'] += row['n']
+    return counts
+
+
+def rebuild_ticket_stats(project_ids=None):
+    """
+    Replace the counters with a fresh count. Returns the number of rows written.
+    """
+    counts = count_tickets(project_ids)
+    stale = ProjectTicketStats.objects.exclude(project_id__in=counts)
+    if project_ids is not None:
+        stale = stale.filter(project_id__in=project_ids)
+    stale.delete()
+
+    rows = [ProjectTicketStats(project_id=project_id, **stats) for project_id, stats in counts.items()]
+    ProjectTicketStats.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['project'],
+        update_fields=['total', *TICKET_STATUSES],
+    )
+    return len(rows)
+
+
+def verify_ticket_stats():
+    """
+    Compare the counters with a fresh count.
+    Returns a list of (project_id, stored, expected) for every mismatch.
+    """
+    fields = ('total',) + TICKET_STATUSES
+    empty = dict.fromkeys(fields, 0)
+    expected = count_tickets()
+    stored = {row.pop('project_id'): row for row in ProjectTicketStats.objects.values('project_id', *fields)}
+
+    mismatches = []
+    for project_id in sorted(set(expected) | set(stored)):
+        have = stored.get(project_id, empty)
+        want = expected.get(project_id, empty)
+        if have != want:
+            mismatches.append((project_id, have, want))
+    return mismatches
@@ -0,0 +1,49 @@
+# dates.py
+"""
+Date handling for task queries.
+
+Filtering with `field__date__lte=day` makes the database cast every row's
+timestamp to a local date, which cannot use an index. These helpers turn a
+calendar day into half-open datetime bounds in the configured timezone, so
+the same filters become plain range predicates on the indexed columns:
+
+    start_date__date <= day   ->  start_date < end_of(day)
+    due_date__date >= day     ->  due_date >= start_of(day)
+"""
+from datetime import date, datetime, time, timedelta
+
+from django.db.models import Q
+from django.utils.timezone import make_aware
+
+DATE_FORMAT = '%d-%m-%Y'  # e.g. '25-11-2024'
+
+
+def parse_day(value):
+    """
+    Parse a 'dd-mm-yyyy' URL segment into a date. Raises ValueError.
+    """
+    return datetime.strptime(value, DATE_FORMAT).date()
+
+
+def start_of(day):
+    """
+    The first instant of `day` in the current timezone.
+    """
+    return make_aware(datetime.combine(day, time.min))
+
+
+def end_of(day):
+    """
+    The first instant after `day` (exclusive upper bound). After the last
+    representable day there is none, so the bound is the latest instant.
+    """
+    if day == date.max:
+        return make_aware(datetime.max)
+    return start_of(day + timedelta(days=1))
+
+
+def active_on_day_q(day):
+    """
+    Tasks running on `day`: started on or before it and due on or after it.
+    """
+    return Q(start_date__lt=end_of(day), due_date__gte=start_of(day))
@@ -0,0 +1,86 @@
+# heatmap.py
+"""
+Per-day task counts for a calendar month.
+
+All tasks touching the month are read in one indexed query (see core/dates.py)
+and counted with a sweep over their interval endpoints: each task adds +1 at
+the first day it covers and -1 after the last, and a running sum gives the
+per-day totals. The cost is linear in the number of tasks, however long they
+run.
+"""
+import calendar
+from datetime import date, timedelta
+
+from django.db.models import Q
+from django.utils.timezone import localdate, localtime
+
+from .dates import end_of, start_of
+from .models import Task
+
+
+def month_bounds(year, month):
+    """
+    First and last day of the month. Raises ValueError for an invalid month or a
+    year outside 1..date.max.year.
+    """
+    first = date(year, month, 1)
+    return first, first.replace(day=calendar.monthrange(year, month)[1])
+
+
+def _add_span(deltas, first, last, start_day, end_day):
+    start_day, end_day = max(start_day, first), min(end_day, last)
+    if start_day <= end_day:
+        deltas[(start_day - first).days] += 1
+        deltas[(end_day - first).days + 1] -= 1
+        return start_day, end_day
+    return None
+
+
+def month_heatmap(user_id, year, month, include_tasks=False):
+    """
+    For every day of the month: tasks active that day (started on or before it
+    and due on or after it), the active ones still pending, and tasks overdue
+    on that day (due earlier and not approved; only counted up to today).
+    With `include_tasks`, each day also lists summaries of its active tasks.
+    """
+    first, last = month_bounds(year, month)
+    today = localdate()
+    days = (last - first).days + 1
+
+    window = Q(start_date__lt=end_of(last), due_date__gte=start_of(first))
+    if first <= today:
+        window |= Q(due_date__lt=min(end_of(last), start_of(today)), status__in=['pending', 'in_review'])
+
+    tasks = Task.objects.filter(window, user_id=user_id).values_list(
+        'id', 'title', 'status', 'priority', 'start_date', 'due_date',
+    )
+
+    active, pending, overdue = [0] * (days + 1), [0] * (days + 1), [0] * (days + 1)
+    buckets = [[] for _ in range(days)] if include_tasks else None
+
+    for task_id, title, status, priority, start_date, due_date in tasks:
+        due_day = localtime(due_date).date()
+
+        if start_date is not None:
+            span = _add_span(active, first, last, localtime(start_date).date(), due_day)
+            if span and status == 'pending':
+                _add_span(pending, first, last, *span)
+            if span and include_tasks:
+                summary = {'id': task_id, 'title': title, 'status': status, 'priority': priority, 'due_date': due_date}
+                for offset in range((span[0] - first).days, (span[1] - first).days + 1):
+                    buckets[offset].append(summary)
+
+        if status != 'approved' and due_day < today:
+            _add_span(overdue, first, last, due_day + timedelta(days=1), today)
+
+    result = []
+    counts = {'active': 0, 'pending': 0, 'overdue': 0}
+    for offset in range(days):
+        counts['active'] += active[offset]
+        counts['pending'] += pending[offset]
+        counts['overdue'] += overdue[offset]
+        day = {'date': first + timedelta(days=offset), **counts}
+        if include_tasks:
+            day['tasks'] = buckets[offset]
+        result.append(day)
+    return result
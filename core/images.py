@@ -0,0 +1,150 @@
+# images.py
+"""
+Thumbnail and preview renditions of uploaded images.
+
+Saving a new `TaskImage`, `ProjectImage` or user avatar queues an
+'images.renditions' job (see core/signals.py and core/background.py), so the
+upload request never decodes the image. The job writes each rendition as a
+compact WebP (JPEG when Pillow lacks WebP support), oriented from the EXIF
+data and stripped of all metadata, and stores it through the default storage.
+"""
+import os
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from django.utils.timezone import now
+from PIL import Image, ImageOps, features
+from .authentication import forget_user
+
+# Bounding boxes; images are scaled down to fit, never up
+RENDITIONS = {
+    'thumbnail': (256, 256),
+    'preview': (1280, 1280),
+}
+
+# model label -> (source field, prefix of its rendition fields)
+SOURCES = {
+    'core.TaskImage': ('image', ''),
+    'core.ProjectImage': ('image', ''),
+    'core.User': ('avatar', 'avatar_'),
+}
+
+
+def rendition_fields(label):
+    source, prefix = SOURCES[label]
+    return {name: f'{prefix}{name}' for name in RENDITIONS}
+
+
+def _output_format():
+    fmt = getattr(settings, 'IMAGE_RENDITION_FORMAT', 'WEBP').upper()
+    if fmt == 'WEBP' and not features.check('webp'):
+        return 'JPEG'
+    return fmt
+
+
+def render(source, size, fmt=None):
+    """
+    Scale an image file down to fit `size` and re-encode it without metadata.
+    Returns (bytes, file extension).
+    """
+    fmt = fmt or _output_format()
+    with Image.open(source) as image:
+        image.draft('RGB', size)  # Lets the JPEG decoder skip detail we are about to throw away
+        image = ImageOps.exif_transpose(image)
+        if fmt == 'JPEG' or image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if fmt != 'JPEG' and image.has_transparency_data else 'RGB')
+        image.thumbnail(size, Image.Resampling.LANCZOS)
+
+        # Nothing from the original info (EXIF, XMP, ICC) is passed on
+        output = BytesIO()
+        options = {'quality': getattr(settings, 'IMAGE_RENDITION_QUALITY', 80)}
+        if fmt == 'JPEG':
+            options.update(optimize=True, progressive=True)
+        else:
+            options['method'] = 4
+        image.save(output, fmt, **options)
+    return output.getvalue(), 'jpg' if fmt == 'JPEG' else fmt.lower()
+
+
+def generate_renditions(label, pk):
+    """
+    (Re)build the renditions of one image. Clears them when the source is empty.
+    Saving with update_fields lets the usual signals refresh caches and ETags.
+    """
+    model = apps.get_model(label)
+    instance = model._default_manager.filter(pk=pk).first()
+    if instance is None:
+        return
+
+    source_field, _ = SOURCES[label]
+    source = getattr(instance, source_field)
+    targets = rendition_fields(label)
+    # Names only: saving a rendition renames its FieldFile in place
+    stale = [(getattr(instance, field).storage, getattr(instance, field).name) for field in targets.values() if getattr(instance, field)]
+    if not source and not stale:
+        return
+
+    stem = os.path.splitext(os.path.basename(source.name))[0] if source else None
+    for name, field in targets.items():
+        if not source:
+            setattr(instance, field, None)
+            continue
+        with source.open('rb') as original:
+            data, extension = render(original, RENDITIONS[name])
+        getattr(instance, field).save(f'{stem}-{name}.{extension}', ContentFile(data), save=False)
+
+    # The source may have been replaced while we were rendering; that upload queued its own job
+    current = model._default_manager.filter(pk=pk).values_list(source_field, flat=True).first()
+    if (current or '') != (source.name or ''):
+        for field in targets.values():
+            if getattr(instance, field):
+                getattr(instance, field).delete(save=False)
+        return
+
+    update_fields = list(targets.values())
+    if any(field.name == 'updated_at' for field in model._meta.concrete_fields):
+        update_fields.append('updated_at')  # New rendition URLs change the payloads that nest the row
+    instance.save(update_fields=update_fields)
+    if label == 'core.User':
+        # Authenticated requests in this process would keep the old rendition URLs
+        forget_user(pk)
+    for storage, name in stale:
+        storage.delete(name)
+
+
+def share_renditions(label, pks):
+    """
+    Build the renditions of the first image once and hand them to the other
+    rows, which store the same source file (e.g. one attachment assigned to
+    many people), taking one blob reference per row.
+    """
+    pks = list(pks)
+    if not pks:
+        return
+    generate_renditions(label, pks[0])
+    model = apps.get_model(label)
+    source_field, _ = SOURCES[label]
+    targets = list(rendition_fields(label).values())
+    first = model._default_manager.filter(pk=pks[0]).values(source_field, *targets).first()
+    if first is None or not all(first[field] for field in targets):
+        # Rendering failed or the row is gone: fall back to one render each
+        for pk in pks[1:]:
+            generate_renditions(label, pk)
+        return
+
+    # Only rows still on the same source and without renditions of their own
+    rest = model._default_manager.filter(pk__in=pks[1:], **{source_field: first[source_field]})
+    for field in targets:
+        rest = rest.filter(Q(**{f'{field}__isnull': True}) | Q(**{field: ''}))
+    shared = rest.update(**{field: first[field] for field in targets})
+    if shared:
+        for field in targets:
+            default_storage.add_reference(first[field], count=shared)
+        if label == 'core.TaskImage':
+            # Task payloads nest their images; bulk updates skip the signal that touches them
+            from .models import Task
+            Task.objects.filter(images__pk__in=pks[1:]).update(updated_at=now())
@@ -0,0 +1,154 @@
+# jobs.py
+"""
+Database-backed background job queue.
+
+Views call `enqueue()` to persist a job and return immediately; the `run_jobs`
+management command claims queued jobs with a guarded UPDATE, runs them on a
+thread pool, and retries failures with exponential backoff. Handlers are
+registered with the `@job('name')` decorator and receive the JSON payload.
+"""
+import logging
+import random
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Avg, Count, F, Max
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_handlers = {}
+
+
+def job(name):
+    """
+    Register a function as the handler for jobs called `name`.
+    """
+    def register(func):
+        _handlers[name] = func
+        return func
+    return register
+
+
+def get_handler(name):
+    try:
+        return _handlers[name]
+    except KeyError:
+        raise LookupError(f"No job handler registered for '{name}'.")
+
+
+def enqueue(name, payload=None, delay=None, max_attempts=None):
+    """
+    Queue a job. With JOBS_EAGER enabled the handler runs inline instead, which
+    keeps tests and single-process development setups working without a worker.
+    """
+    payload = payload or {}
+    handler = get_handler(name)
+
+    if getattr(settings, 'JOBS_EAGER', False):
+        handler(payload)
+        return None
+
+    return Job.objects.create(
+        name=name,
+        payload=payload,
+        run_after=timezone.now() + (delay or timedelta()),
+        max_attempts=max_attempts or getattr(settings, 'JOBS_MAX_ATTEMPTS', 5),
+    )
+
+
+def claim_next(worker_id, batch=10):
+    """
+    Claim the oldest due job for this worker. The status-guarded UPDATE makes
+    sure two workers never run the same job.
+    """
+    now = timezone.now()
+    candidates = Job.objects.filter(status='queued', run_after__lte=now).order_by('run_after', 'id').values_list('id', flat=True)[:batch]
+
+    for job_id in candidates:
+        claimed = Job.objects.filter(id=job_id, status='queued').update(
+            status='running',
+            locked_by=worker_id,
+            locked_at=now,
+            started_at=now,
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Job.objects.get(id=job_id)
+    return None
+
+
+def backoff_delay(attempts):
+    """
+    Exponential backoff with jitter, capped at JOBS_BACKOFF_MAX seconds.
+    """
+    base = getattr(settings, 'JOBS_BACKOFF_BASE', 5)
+    cap = getattr(settings, 'JOBS_BACKOFF_MAX', 15 * 60)
+    delay = min(base * (2 ** (attempts - 1)), cap)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def run_job(job):
+    """
+    Run a claimed job and record its outcome and timing.
+    """
+    started = time.monotonic()
+    fields = {}
+    if job.attempts == 1:
+        fields['wait_ms'] = int((job.started_at - job.created_at).total_seconds() * 1000)
+
+    try:
+        get_handler(job.name)(job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            fields.update(status='queued', run_after=timezone.now() + backoff_delay(job.attempts))
+            logger.warning("Job %s #%s failed (attempt %s/%s), retrying", job.name, job.pk, job.attempts, job.max_attempts)
+        else:
+            fields.update(status='failed', finished_at=timezone.now())
+            logger.error("Job %s #%s failed permanently after %s attempts", job.name, job.pk, job.attempts)
+        fields['last_error'] = error
+    else:
+        fields.update(status='done', finished_at=timezone.now(), last_error='')
+
+    fields['duration_ms'] = int((time.monotonic() - started) * 1000)
+    logger.info("Job %s #%s %s in %sms", job.name, job.pk, fields['status'], fields['duration_ms'])
+    Job.objects.filter(id=job.id).update(locked_by='', locked_at=None, **fields)
+    return fields['status']
+
+
+def requeue_stale_jobs(timeout):
+    """
+    Put back jobs whose worker died mid-run. Returns how many were requeued.
+    """
+    cutoff = timezone.now() - timeout
+    return Job.objects.filter(status='running', locked_at__lt=cutoff).update(
+        status='queued', locked_by='', locked_at=None, run_after=timezone.now(),
+    )
+
+
+def job_metrics():
+    """
+    Per job name and status: count, average/max run time and average queue wait.
+    """
+    return list(
+        Job.objects.values('name', 'status').annotate(
+            count=Count('id'),
+            avg_duration_ms=Avg('duration_ms'),
+            max_duration_ms=Max('duration_ms'),
+            avg_wait_ms=Avg('wait_ms'),
+        ).order_by('name', 'status')
+    )
+
+
+def prune_finished_jobs(older_than):
+    """
+    Delete done jobs finished before `older_than` ago. Failed jobs are kept for inspection.
+    """
+    cutoff = timezone.now() - older_than
+    deleted, _ = Job.objects.filter(status='done', finished_at__lt=cutoff).delete()
+    return deleted
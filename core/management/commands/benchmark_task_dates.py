@@ -0,0 +1,88 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils.timezone import localdate, now
+from core.dates import active_on_day_q
+from core.models import Task, User
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the old `__date` task filters with the half-open range filters on a synthetic "
+        "data set. The rows are created inside a transaction that is rolled back at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100_000, help="Number of tasks to generate (e.g. 1000000).")
+        parser.add_argument('--users', type=int, default=50, help="Number of users the tasks are spread over.")
+        parser.add_argument('--repeat', type=int, default=20, help="Runs per query; the best time is reported.")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            self.stdout.write("Synthetic data rolled back.")
+
+    def run(self, options):
+        users = self.create_users(options['users'])
+        self.create_tasks(users, options['rows'])
+
+        day = localdate()
+        user = users[0]
+        queries = {
+            'legacy  (__date casts)': Task.objects.filter(
+                user=user, start_date__date__lte=day, due_date__date__gte=day,
+            ),
+            'ranges  (indexed)': Task.objects.filter(active_on_day_q(day), user=user),
+        }
+
+        for label, queryset in queries.items():
+            best = self.time_query(queryset, options['repeat'])
+            self.stdout.write(f"{label}: {best * 1000:.2f}ms best of {options['repeat']}, {queryset.count()} rows")
+            self.stdout.write(f"    plan: {queryset.explain()}")
+
+    def create_users(self, count):
+        suffix = int(time.time())
+        users = User.objects.bulk_create([
+            User(username=f"bench-{suffix}-{n}", email=f"bench-{suffix}-{n}@example.com", full_name=f"Bench {n}")
+            for n in range(count)
+        ])
+        return users
+
+    def create_tasks(self, users, rows):
+        started = time.monotonic()
+        base = now() - timedelta(days=365)
+        batch = []
+        for n in range(rows):
+            start = base + timedelta(minutes=random.randrange(2 * 365 * 24 * 60))
+            user = users[n % len(users)]
+            batch.append(Task(
+                title=f"Task {n}", description='', user=user, assigned_by=user,
+                start_date=start, due_date=start + timedelta(hours=random.randrange(1, 24 * 14)),
+            ))
+            if len(batch) == 5000:
+                Task.objects.bulk_create(batch)
+                batch = []
+        Task.objects.bulk_create(batch)
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute('ANALYZE')
+        self.stdout.write(f"Created {rows} tasks in {time.monotonic() - started:.1f}s")
+
+    def time_query(self, queryset, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            list(queryset.values_list('id', flat=True))
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
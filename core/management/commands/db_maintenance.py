@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Refresh query planner statistics and, on request, VACUUM the database. On SQLite the "
+        "write-ahead log is checkpointed and truncated. With no action flags, runs --analyze --checkpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--analyze', action='store_true', help="Refresh planner statistics (ANALYZE, then PRAGMA optimize on SQLite).")
+        parser.add_argument('--vacuum', action='store_true', help="Rebuild the database file to reclaim free pages. Blocks writers while it runs.")
+        parser.add_argument('--checkpoint', action='store_true', help="SQLite: copy the WAL into the database file and truncate it.")
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help="Database alias (default 'default').")
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.in_atomic_block:
+            raise CommandError("Maintenance statements cannot run inside a transaction.")
+        actions = [name for name in ('analyze', 'vacuum', 'checkpoint') if options[name]] or ['analyze', 'checkpoint']
+        sqlite = connection.vendor == 'sqlite'
+        if not sqlite and connection.vendor != 'postgresql':
+            raise CommandError(f"Unsupported database vendor: {connection.vendor}")
+
+        with connection.cursor() as cursor:
+            if sqlite:
+                self.report_sqlite(cursor, 'before')
+            if 'analyze' in actions:
+                cursor.execute('ANALYZE')
+                if sqlite:
+                    cursor.execute('PRAGMA optimize')
+                self.stdout.write("ANALYZE done.")
+            if 'vacuum' in actions:
+                # PostgreSQL's plain VACUUM marks dead rows reusable without locking out writers
+                cursor.execute('VACUUM')
+                self.stdout.write("VACUUM done.")
+            if 'checkpoint' in actions:
+                if sqlite:
+                    cursor.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+                    busy, log_frames, checkpointed = cursor.fetchone()
+                    if busy:
+                        self.stderr.write("Checkpoint incomplete: a reader or writer held the WAL; run again later.")
+                    self.stdout.write(f"Checkpointed {checkpointed} of {log_frames} WAL frame(s).")
+                else:
+                    self.stdout.write("Checkpoints are managed by the PostgreSQL server, skipped.")
+            if sqlite:
+                self.report_sqlite(cursor, 'after')
+
+    def report_sqlite(self, cursor, label):
+        values = {}
+        for pragma in ('journal_mode', 'page_size', 'page_count', 'freelist_count'):
+            cursor.execute(f'PRAGMA {pragma}')
+            values[pragma] = cursor.fetchone()[0]
+        size = values['page_size'] * values['page_count']
+        free = values['page_size'] * values['freelist_count']
+        self.stdout.write(
+            f"{label}: {size / 1024 / 1024:.1f} MB, {free / 1024 / 1024:.1f} MB free, journal_mode={values['journal_mode']}"
+        )
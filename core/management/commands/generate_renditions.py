@@ -0,0 +1,36 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from core.images import SOURCES, generate_renditions, rendition_fields
+from core.jobs import enqueue
+
+
+class Command(BaseCommand):
+    help = "Queue thumbnail and preview renditions for existing images that have none."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Rebuild renditions that already exist.")
+        parser.add_argument('--sync', action='store_true', help="Render in this process instead of queueing jobs.")
+
+    def handle(self, *args, **options):
+        for label, (source_field, _) in SOURCES.items():
+            model = apps.get_model(label)
+            rows = model._default_manager.exclude(Q(**{f'{source_field}__isnull': True}) | Q(**{source_field: ''}))
+            if not options['force']:
+                missing = Q()
+                for field in rendition_fields(label).values():
+                    missing |= Q(**{f'{field}__isnull': True}) | Q(**{field: ''})
+                rows = rows.filter(missing)
+
+            count = 0
+            for pk in rows.values_list('pk', flat=True).iterator():
+                if options['sync']:
+                    try:
+                        generate_renditions(label, pk)
+                    except OSError as e:
+                        self.stderr.write(f"{label} #{pk}: {e}")
+                        continue
+                else:
+                    enqueue('images.renditions', {'model': label, 'pk': pk})
+                count += 1
+            self.stdout.write(f"{label}: {count} image(s) {'rendered' if options['sync'] else 'queued'}")
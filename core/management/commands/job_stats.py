@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from core.jobs import job_metrics, prune_finished_jobs
+
+
+class Command(BaseCommand):
+    help = "Show counts and timing metrics for background jobs, optionally pruning old finished jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prune-days', type=int, help="Delete done jobs finished more than this many days ago.")
+
+    def handle(self, *args, **options):
+        if options['prune_days'] is not None:
+            deleted = prune_finished_jobs(timedelta(days=options['prune_days']))
+            self.stdout.write(f"Pruned {deleted} finished job(s).")
+
+        def ms(value):
+            return '-' if value is None else f"{value:.0f}ms"
+
+        self.stdout.write(f"{'job':<30} {'status':<8} {'count':>7} {'avg run':>9} {'max run':>9} {'avg wait':>9}")
+        for row in job_metrics():
+            self.stdout.write(
+                f"{row['name']:<30} {row['status']:<8} {row['count']:>7} "
+                f"{ms(row['avg_duration_ms']):>9} {ms(row['max_duration_ms']):>9} {ms(row['avg_wait_ms']):>9}"
+            )
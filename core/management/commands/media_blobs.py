@@ -0,0 +1,96 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, FileField, Q, Sum
+from core.models import MediaBlob
+from core.storage import is_blob
+
+
+def file_fields():
+    for model in apps.get_app_config('core').get_models():
+        for field in model._meta.concrete_fields:
+            if isinstance(field, FileField):
+                yield model, field
+
+
+class Command(BaseCommand):
+    help = (
+        "Show content-addressed media storage usage. Optionally move pre-existing uploads into the "
+        "blob tree, recount references from the database and remove unreferenced blobs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--import-legacy', action='store_true', help="Move files stored under their upload names into the blob tree.")
+        parser.add_argument('--reconcile', action='store_true', help="Reset reference counts to the number of file fields using each blob.")
+        parser.add_argument('--collect', action='store_true', help="Delete blobs that nothing has referenced for the grace period.")
+        parser.add_argument('--grace-minutes', type=int, default=60, help="Grace period for --collect (default 60).")
+
+    def handle(self, *args, **options):
+        if options['import_legacy']:
+            self.import_legacy()
+        if options['reconcile']:
+            self.reconcile()
+        if options['collect']:
+            removed, freed = default_storage.collect(timedelta(minutes=options['grace_minutes']))
+            self.stdout.write(f"Removed {removed} unreferenced blob(s), {freed / 1024 / 1024:.1f} MB freed.")
+        self.report()
+
+    def import_legacy(self):
+        moved = missing = 0
+        for model, field in file_fields():
+            rows = model._default_manager.exclude(Q(**{f'{field.attname}__isnull': True}) | Q(**{field.attname: ''}))
+            users = Counter(name for name in rows.values_list(field.attname, flat=True) if not is_blob(name))
+            for name, count in users.items():
+                if not default_storage.exists(name):
+                    missing += 1
+                    self.stderr.write(f"{model._meta.label}.{field.name}: {name} is missing on disk, left as is")
+                    continue
+                with default_storage.open(name) as legacy:
+                    blob = default_storage.save(name, legacy)  # One reference
+                with transaction.atomic():
+                    if count > 1:
+                        MediaBlob.objects.filter(name=blob).update(refcount=F('refcount') + count - 1)
+                    # Saved one by one so the signals refresh cached payloads and ETags
+                    for instance in model._default_manager.filter(**{field.attname: name}):
+                        setattr(instance, field.attname, blob)
+                        instance.save(update_fields=[field.attname])
+                default_storage.delete(name)
+                moved += 1
+        self.stdout.write(f"Imported {moved} legacy file(s); {missing} missing.")
+
+    def reconcile(self):
+        actual = Counter()
+        for model, field in file_fields():
+            names = model._default_manager.filter(**{f'{field.attname}__startswith': 'blobs/'}).values_list(field.attname, flat=True)
+            actual.update(names)
+
+        stored = dict(MediaBlob.objects.values_list('name', 'refcount'))
+        drift = {}
+        with transaction.atomic():
+            for name in set(actual) | set(stored):
+                if name not in stored:
+                    size = default_storage.size(name) if default_storage.exists(name) else 0
+                    MediaBlob.objects.create(name=name, size=size, refcount=actual[name])
+                elif stored[name] != actual[name]:
+                    MediaBlob.objects.filter(name=name).update(refcount=actual[name])
+                else:
+                    continue
+                drift[name] = (stored.get(name), actual[name])
+
+        for name, (before, after) in sorted(drift.items()):
+            self.stdout.write(f"{name}: {before if before is not None else 'untracked'} -> {after}")
+        self.stdout.write(f"Reconciled {len(drift)} blob(s).")
+
+    def report(self):
+        blobs = MediaBlob.objects.aggregate(count=Count('id'), stored=Sum('size'))
+        referenced = MediaBlob.objects.filter(refcount__gt=0)
+        saved = referenced.aggregate(saved=Sum(F('size') * (F('refcount') - 1)))['saved'] or 0
+        self.stdout.write(
+            f"blobs: {blobs['count'] or 0}  stored: {(blobs['stored'] or 0) / 1024 / 1024:.1f} MB  "
+            f"saved by deduplication: {saved / 1024 / 1024:.1f} MB  "
+            f"unreferenced: {MediaBlob.objects.filter(refcount=0).count()}"
+        )
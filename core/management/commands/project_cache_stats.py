@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from core.caching import metrics, reset_metrics
+
+
+class Command(BaseCommand):
+    help = "Show hit and miss counts for the project list/detail response cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help="Zero the counters after printing them.")
+
+    def handle(self, *args, **options):
+        stats = metrics()
+        hit_rate = '-' if stats['hit_rate'] is None else f"{stats['hit_rate']:.1%}"
+        self.stdout.write(
+            f"hits: {stats['hits']}  misses: {stats['misses']}  hit rate: {hit_rate}\n"
+            f"coalesced (waited for another rebuild): {stats['coalesced']}\n"
+            f"invalidated keys: {stats['invalidations']}"
+        )
+        if options['reset']:
+            reset_metrics()
+            self.stdout.write("Counters reset.")
@@ -0,0 +1,16 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from core.uploads import purge_uploads
+
+
+class Command(BaseCommand):
+    help = "Abort chunked uploads left idle past UPLOAD_EXPIRY_HOURS and free their space and quota."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, help="Idle time before an upload expires (default UPLOAD_EXPIRY_HOURS).")
+
+    def handle(self, *args, **options):
+        older_than = timedelta(hours=options['hours']) if options['hours'] is not None else None
+        aborted = purge_uploads(older_than)
+        self.stdout.write(f"Aborted {aborted} expired upload(s).")
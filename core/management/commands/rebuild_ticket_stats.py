@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from core.counters import rebuild_ticket_stats, verify_ticket_stats
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-project ticket counters from the Task table, or verify them with --verify."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true', help="Only report counters that drifted, do not write.")
+        parser.add_argument('--project', type=int, action='append', dest='projects', help="Limit the rebuild to this project ID (repeatable).")
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            mismatches = verify_ticket_stats()
+            for project_id, stored, expected in mismatches:
+                self.stdout.write(f"Project {project_id}: stored {stored}, expected {expected}")
+            if mismatches:
+                raise CommandError(f"{len(mismatches)} project counter(s) out of date. Run without --verify to rebuild.")
+            self.stdout.write(self.style.SUCCESS("Ticket counters are up to date."))
+            return
+
+        with transaction.atomic():
+            written = rebuild_ticket_stats(options['projects'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt ticket counters for {written} project(s)."))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from core.notifications import reconcile_unread_counters
+
+
+class Command(BaseCommand):
+    help = "Repair per-user unread notification counters that drifted from the Notification table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users', help="Limit to this user ID (repeatable).")
+
+    def handle(self, *args, **options):
+        drift = reconcile_unread_counters(options['users'])
+        for user_id, (stored, actual) in sorted(drift.items()):
+            self.stdout.write(f"User {user_id}: counter was {stored}, actual unread {actual}")
+        self.stdout.write(self.style.SUCCESS(f"Repaired {len(drift)} unread counter(s)."))
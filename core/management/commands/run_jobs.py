@@ -0,0 +1,58 @@
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from core.jobs import claim_next, requeue_stale_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = "Run background jobs from the database queue on a pool of worker threads."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help="Number of worker threads.")
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds to sleep when the queue is empty.")
+        parser.add_argument('--stale-after', type=int, default=600, help="Requeue running jobs locked longer than this many seconds.")
+        parser.add_argument('--once', action='store_true', help="Exit once the queue is drained instead of polling forever.")
+
+    def handle(self, *args, **options):
+        self.stop = threading.Event()
+        self.poll_interval = options['poll_interval']
+        self.once = options['once']
+        worker_prefix = f"{socket.gethostname()}:{os.getpid()}"
+
+        requeued = requeue_stale_jobs(timedelta(seconds=options['stale_after']))
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale job(s).")
+
+        self.stdout.write(f"Starting {options['workers']} job worker(s).")
+        with ThreadPoolExecutor(max_workers=options['workers'], thread_name_prefix='job-worker') as pool:
+            futures = [pool.submit(self.work, f"{worker_prefix}:{n}") for n in range(options['workers'])]
+            try:
+                while not all(future.done() for future in futures):
+                    time.sleep(0.5)
+            except KeyboardInterrupt:
+                self.stdout.write("Stopping after the running jobs finish...")
+                self.stop.set()
+
+        for future in futures:
+            future.result()
+        self.stdout.write(self.style.SUCCESS("Job workers stopped."))
+
+    def work(self, worker_id):
+        try:
+            while not self.stop.is_set():
+                close_old_connections()
+                job = claim_next(worker_id)
+                if job is None:
+                    if self.once:
+                        return
+                    self.stop.wait(self.poll_interval)
+                    continue
+                run_job(job)
+        finally:
+            connection.close()
@@ -0,0 +1,71 @@
+import sqlite3
+import time
+from collections import deque
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the SQLite primary database into the replica files from DB_REPLICAS, a local stand-in for "
+        "replication. --interval keeps copying until interrupted; --lag holds every snapshot back before "
+        "it reaches the replicas, to simulate replication lag."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, help="Take a snapshot every this many seconds until interrupted.")
+        parser.add_argument('--lag', type=float, default=0, help="Seconds a snapshot waits before it is applied (default 0).")
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError("Only SQLite replicas are synced here; other databases replicate on the server.")
+        aliases = getattr(settings, 'DATABASE_REPLICAS', [])
+        if not aliases:
+            raise CommandError("No replicas configured. Set DB_REPLICAS to the replica database files.")
+        interval, lag = options['interval'], max(options['lag'], 0)
+
+        pending = deque()  # (taken at, in-memory copy of the primary), oldest first
+        next_snapshot = time.monotonic()
+        try:
+            while True:
+                now = time.monotonic()
+                if now >= next_snapshot:
+                    pending.append((now, self.snapshot(primary)))
+                    next_snapshot = now + interval if interval is not None else float('inf')
+                while pending and pending[0][0] + lag <= time.monotonic():
+                    taken_at, snapshot = pending.popleft()
+                    self.apply(snapshot, aliases)
+                    snapshot.close()
+                    self.stdout.write(
+                        f"Synced {', '.join(aliases)} with the primary as of "
+                        f"{time.monotonic() - taken_at:.1f}s ago."
+                    )
+                if interval is None and not pending:
+                    break
+                wake = min(next_snapshot, pending[0][0] + lag if pending else float('inf'))
+                time.sleep(max(wake - time.monotonic(), 0))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for _, snapshot in pending:
+                snapshot.close()
+
+    def snapshot(self, primary):
+        # The backup API copies a consistent view of the database, even with writers active
+        primary.ensure_connection()
+        copy = sqlite3.connect(':memory:')
+        primary.connection.backup(copy)
+        return copy
+
+    def apply(self, snapshot, aliases):
+        for alias in aliases:
+            # Close this process's own connection, then replace the file's contents in place
+            connections[alias].close()
+            replica = sqlite3.connect(connections[alias].settings_dict['NAME'], timeout=30)
+            try:
+                snapshot.backup(replica)
+            finally:
+                replica.close()
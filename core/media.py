@@ -0,0 +1,149 @@
+# media.py
+"""
+Serving of uploaded media (mounted at MEDIA_URL by project/urls.py).
+
+Unlike `django.views.static.serve` this supports conditional requests
+(ETag / Last-Modified), single byte ranges (`Range`, `If-Range`) and long-lived
+caching: content-addressed blob names (see core/storage.py) never change
+content, so they are served as immutable for a year, with the content hash as a
+strong ETag. With MEDIA_SERVE_OFFLOAD set, the response only carries the
+headers plus an `X-Accel-Redirect` (nginx) or `X-Sendfile` (Apache, lighttpd)
+instruction, and the front proxy sends the bytes, ranges included.
+"""
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+from .storage import CHUNK_SIZE, blob_digest
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _validators(name, stat):
+    digest = blob_digest(name)
+    if digest:
+        return f'"{digest}"', f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    # Files stored under their upload name can be overwritten in place
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    return etag, f"public, max-age={getattr(settings, 'MEDIA_CACHE_MAX_AGE', 3600)}"
+
+
+def parse_range(header, size):
+    """
+    (start, end) inclusive for a single `bytes=` range, None to serve the whole
+    file (no header, several ranges, or a syntax we ignore), or False when the
+    range cannot be satisfied.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if start >= size or (last and int(last) < start):
+            return False
+    else:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        start, end = max(size - length, 0), size - 1
+    return start, end
+
+
+def _if_range_matches(request, etag, mtime):
+    value = request.META.get('HTTP_IF_RANGE')
+    if not value:
+        return True
+    if value.startswith('"') or value.startswith('W/'):
+        return value == etag  # Strong comparison only
+    modified = parse_http_date_safe(value)
+    return modified is not None and int(mtime) <= modified
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
+
+
+def _offload(path, name, content_type):
+    mode = getattr(settings, 'MEDIA_SERVE_OFFLOAD', '')
+    if not mode:
+        return None
+    response = HttpResponse(content_type=content_type)
+    if mode == 'x-accel-redirect':
+        prefix = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + name
+    elif mode == 'x-sendfile':
+        response['X-Sendfile'] = path
+    else:
+        raise ValueError(f"Unknown MEDIA_SERVE_OFFLOAD mode: {mode!r}")
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    name = path.replace('\\', '/')
+    if name.startswith('.') or '/.' in name:
+        # Spool files and other hidden entries are not media
+        raise Http404
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, name)
+        stat = os.stat(full_path)
+    except (OSError, ValueError):
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+
+    etag, cache_control = _validators(name, stat)
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+
+    def finish(response):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        response['Cache-Control'] = cache_control
+        response['Accept-Ranges'] = 'bytes'
+        return response
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if not_modified is not None:
+        return finish(not_modified)
+
+    offloaded = _offload(full_path, name, content_type)
+    if offloaded is not None:
+        # The proxy applies Range itself
+        return finish(offloaded)
+
+    byte_range = None
+    if _if_range_matches(request, etag, stat.st_mtime):
+        byte_range = parse_range(request.META.get('HTTP_RANGE'), stat.st_size)
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+        return finish(response)
+
+    if byte_range is None:
+        response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+        return finish(response)
+
+    start, end = byte_range
+    length = end - start + 1
+    response = StreamingHttpResponse(_read_range(full_path, start, length), status=206, content_type=content_type)
+    response['Content-Length'] = str(length)
+    response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+    return finish(response)
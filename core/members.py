@@ -0,0 +1,80 @@
+# members.py
+"""
+Adding, removing and replacing project members in bulk.
+
+`set_members()` resolves every user in one IN query, diffs the request against
+the project's current ProjectMember rows, and applies the inserts, deletes and
+notifications in batches inside one transaction, so the project is invalidated
+once for the additions and once for the removals rather than once per member
+(see core/signals.py).
+"""
+from django.db import transaction
+from .models import ProjectMember, User
+from .notifications import notify
+from .signals import project_content_changed
+
+
+class MemberError(Exception):
+    def __init__(self, message, user_ids=()):
+        super().__init__(message)
+        self.message = message
+        self.user_ids = list(user_ids)
+
+
+def _ids(values):
+    try:
+        return list(dict.fromkeys(int(value) for value in values))
+    except (TypeError, ValueError):
+        raise MemberError("User ids must be integers.")
+
+
+def set_members(project, actor, add=(), remove=(), replace=None, role='staff'):
+    """
+    Add `add` and remove `remove`, or, when `replace` is given, make it the
+    exact member list. The team lead is never stored as a member. Unknown users
+    fail the whole change. Returns {'added', 'removed', 'unchanged'} user ids.
+    """
+    add, remove = _ids(add), _ids(remove)
+    wanted = _ids(replace) if replace is not None else add
+
+    known = set(User.objects.filter(id__in=wanted).values_list('id', flat=True)) if wanted else set()
+    missing = [user_id for user_id in wanted if user_id not in known]
+    if missing:
+        raise MemberError(f"Users with IDs {', '.join(map(str, missing))} do not exist.", missing)
+
+    with transaction.atomic():
+        current = set(ProjectMember.objects.filter(project=project).values_list('user_id', flat=True))
+        wanted = [user_id for user_id in wanted if user_id != project.team_lead_id]
+        added = [user_id for user_id in wanted if user_id not in current]
+        if replace is not None:
+            removed = sorted(current - set(wanted))
+        else:
+            removed = [user_id for user_id in remove if user_id in current and user_id not in added]
+
+        if added:
+            # The unique constraint makes a concurrent add of the same user a no-op
+            ProjectMember.objects.bulk_create(
+                [ProjectMember(project=project, user_id=user_id, role=role) for user_id in added],
+                ignore_conflicts=True,
+            )
+        if removed:
+            # Invalidates the project once for all removed members (see core/signals.py)
+            ProjectMember.objects.filter(project=project, user_id__in=removed).delete()
+
+        if added:
+            # bulk_create() sends no signals
+            project_content_changed([project.pk], user_ids=added)
+        if added:
+            notify(
+                f"{actor.username} has added you as a member to the '{project.title}' project.",
+                'project',
+                users=added,
+                project=project,  # Link the notification to the specific project
+                created_by=actor,
+            )
+
+    return {
+        'added': added,
+        'removed': removed,
+        'unchanged': [user_id for user_id in wanted if user_id in current and user_id not in removed],
+    }
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_ticket_stats(apps, schema_editor):
+    Task = apps.get_model('core', 'Task')
+    ProjectTicketStats = apps.get_model('core', 'ProjectTicketStats')
+
+    stats = {}
+    tickets = Task.objects.filter(is_ticket=True, project__isnull=False)
+    for row in tickets.values('project_id', 'status').annotate(n=Count('id')):
+        counters = stats.setdefault(row['project_id'], {'total': 0, 'pending': 0, 'in_review': 0, 'approved': 0})
+        counters[row['status']] += row['n']
+        counters['total'] += row['n']
+
+    ProjectTicketStats.objects.bulk_create(
+        ProjectTicketStats(project_id=project_id, **counters) for project_id, counters in stats.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_notification_created_by'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectTicketStats',
+            fields=[
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ticket_stats', serialize=False, to='core.project')),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('pending', models.PositiveIntegerField(default=0)),
+                ('in_review', models.PositiveIntegerField(default=0)),
+                ('approved', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='department',
+            field=models.CharField(blank=True, choices=[('Graphic Designing', 'Graphic Designing'), ('Social Media', 'Social Media'), ('Digital Marketing', 'Digital Marketing'), ('Video Editing', 'Video Editing'), ('Web Development', 'Web Development'), ('Videography', 'Videography'), ('Photography', 'Photography')], max_length=50, null=True),
+        ),
+        migrations.RunPython(backfill_ticket_stats, migrations.RunPython.noop),
+    ]
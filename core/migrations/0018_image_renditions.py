@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_project_notification_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='projectimage',
+            name='preview',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='renditions/project_images/'),
+        ),
+        migrations.AddField(
+            model_name='projectimage',
+            name='thumbnail',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='renditions/project_images/'),
+        ),
+        migrations.AddField(
+            model_name='taskimage',
+            name='preview',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='renditions/task_images/'),
+        ),
+        migrations.AddField(
+            model_name='taskimage',
+            name='thumbnail',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='renditions/task_images/'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='avatar_preview',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='renditions/users'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='avatar_thumbnail',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='renditions/users'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:30
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def drop_duplicate_members(apps, schema_editor):
+    # Keep the earliest row of each (project, user) pair
+    ProjectMember = apps.get_model('core', 'ProjectMember')
+    keep = ProjectMember.objects.values('project', 'user').annotate(first=Min('id')).values('first')
+    ProjectMember.objects.exclude(id__in=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_upload'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_members, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='projectmember',
+            constraint=models.UniqueConstraint(fields=('project', 'user'), name='core_projectmember_unique'),
+        ),
+    ]
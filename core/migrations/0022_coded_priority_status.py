@@ -0,0 +1,98 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:38
+
+import core.fields
+from django.db import migrations, models
+from django.db.models import Case, Value, When
+
+# model -> field -> {value: code}, frozen here so later edits to the models cannot change history
+CODES = {
+    'Project': {
+        'status': {'pending': 1, 'approved': 2, 'completed': 3},
+        'priority': {'low': 1, 'medium': 2, 'high': 3},
+    },
+    'Task': {
+        'status': {'pending': 1, 'in_review': 2, 'approved': 3},
+        'priority': {'low': 1, 'medium': 2, 'high': 3},
+    },
+}
+
+
+def encode(apps, schema_editor):
+    for model_name, fields in CODES.items():
+        model = apps.get_model('core', model_name)
+        for field, codes in fields.items():
+            # Refuse rather than guess: every stored value must have a code
+            unknown = set(model.objects.exclude(**{f'{field}__in': codes}).values_list(field, flat=True))
+            if unknown:
+                raise RuntimeError(f"{model_name}.{field} has values without a code: {sorted(unknown, key=str)}")
+            model.objects.update(**{f'{field}_code': Case(
+                *[When(**{field: value}, then=Value(code)) for value, code in codes.items()],
+            )})
+
+
+def decode(apps, schema_editor):
+    for model_name, fields in CODES.items():
+        model = apps.get_model('core', model_name)
+        for field, codes in fields.items():
+            model.objects.update(**{field: Case(
+                *[When(**{f'{field}_code': code}, then=Value(value)) for value, code in codes.items()],
+            )})
+
+
+def coded_field(model_name, field, **kwargs):
+    return core.fields.CodedChoiceField(codes=CODES[model_name][field], **kwargs)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_projectmember_unique'),
+    ]
+
+    operations = [
+        # Add the integer columns next to the strings, copy, drop the strings, take their names
+        *[
+            migrations.AddField(
+                model_name=model_name.lower(),
+                name=f'{field}_code',
+                field=models.PositiveSmallIntegerField(null=True),
+            )
+            for model_name, fields in CODES.items()
+            for field in fields
+        ],
+        migrations.RunPython(encode, decode),
+        *[
+            migrations.RemoveField(model_name=model_name.lower(), name=field)
+            for model_name, fields in CODES.items()
+            for field in fields
+        ],
+        *[
+            migrations.RenameField(model_name=model_name.lower(), old_name=f'{field}_code', new_name=field)
+            for model_name, fields in CODES.items()
+            for field in fields
+        ],
+        migrations.AlterField(
+            model_name='project',
+            name='priority',
+            field=coded_field('Project', 'priority', choices=[('high', 'High'), ('medium', 'Medium'), ('low', 'Low')], default='medium'),
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='status',
+            field=coded_field('Project', 'status', choices=[('pending', 'Pending'), ('approved', 'Approved'), ('completed', 'Completed')], default='pending'),
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='priority',
+            field=coded_field('Task', 'priority', choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High')], default='medium'),
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='status',
+            field=coded_field('Task', 'status', choices=[('pending', 'Pending'), ('in_review', 'In Review'), ('approved', 'Approved')], default='pending'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('is_ticket', True)), fields=['project', 'status', '-priority', 'due_date', 'id'], name='core_task_board'),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.utils import timezone
+from .fields import CodedChoiceField
+import uuid
 
 
 class UserManager(BaseUserManager):
@@ -53,10 +55,14 @@ class User(AbstractBaseUser, PermissionsMixin):
     position = models.CharField(max_length=150, blank=True, null=True)
     role = models.CharField(max_length=10, choices=ROLE_CHOICES, default='Staff')
     avatar = models.ImageField(upload_to='users', blank=True, null=True, verbose_name="Profile Picture")
+    # Resized copies of the avatar, generated in the background (see core/images.py)
+    avatar_thumbnail = models.ImageField(upload_to='renditions/users', blank=True, null=True, editable=False)
+    avatar_preview = models.ImageField(upload_to='renditions/users', blank=True, null=True, editable=False)
 
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
     is_superuser = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)  # Read by the ETags of task lists that nest the user
 
     objects = UserManager()
 
@@ -87,6 +93,9 @@ class Project(models.Model):
         ('medium', 'Medium'),
         ('low', 'Low'),
     ]
+    # Stored codes (see core/fields.py); their order is the sort order
+    STATUS_CODES = {'pending': 1, 'approved': 2, 'completed': 3}
+    PRIORITY_CODES = {'low': 1, 'medium': 2, 'high': 3}
 
 
     DEPARTMENT_CHOICES = [
@@ -102,11 +111,12 @@ class Project(models.Model):
     client_name = models.CharField(max_length=255)
     due_date = models.DateTimeField()
     start_date = models.DateTimeField()
-    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
-    priority = models.CharField(max_length=10, choices=PRIORITY_CHOICES, default='medium')
+    status = CodedChoiceField(codes=STATUS_CODES, choices=STATUS_CHOICES, default='pending')
+    priority = CodedChoiceField(codes=PRIORITY_CODES, choices=PRIORITY_CHOICES, default='medium')
     team_lead = models.ForeignKey(User, on_delete=models.CASCADE, related_name="projects_as_team_lead")
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name="projects_created_by")
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # Also bumped when members, images, tickets or nested users change
 
     def __str__(self):
         return self.title
@@ -117,6 +127,11 @@ class ProjectMember(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     role = models.CharField(max_length=255, default='staff')  # Optional field for role of the member
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['project', 'user'], name='core_projectmember_unique'),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.project.title}"
 
@@ -124,6 +139,9 @@ class ProjectMember(models.Model):
 class ProjectImage(models.Model):
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name="images")
     image = models.ImageField(upload_to="project_images/")
+    # Resized copies of the image, generated in the background (see core/images.py)
+    thumbnail = models.ImageField(upload_to="renditions/project_images/", blank=True, null=True, editable=False)
+    preview = models.ImageField(upload_to="renditions/project_images/", blank=True, null=True, editable=False)
 
     def __str__(self):
         return f"Image for {self.project.title}"
@@ -143,6 +161,9 @@ class Task(models.Model):
         ('in_review', 'In Review'),
         ('approved', 'Approved'),
     ]
+    # Stored codes (see core/fields.py); their order is the sort order
+    PRIORITY_CODES = {'low': 1, 'medium': 2, 'high': 3}
+    STATUS_CODES = {'pending': 1, 'in_review': 2, 'approved': 3}
 
 
     
@@ -150,17 +171,26 @@ class Task(models.Model):
     description = models.TextField()
     due_date = models.DateTimeField()
     start_date = models.DateTimeField(null=True, blank=True)
-    priority = models.CharField(max_length=6, choices=PRIORITY_CHOICES, default='medium')
+    priority = CodedChoiceField(codes=PRIORITY_CODES, choices=PRIORITY_CHOICES, default='medium')
     user = models.ForeignKey(User, related_name='tasks', on_delete=models.CASCADE)  # User who the task is assigned to
     assigned_by = models.ForeignKey(User, related_name='assigned_tasks', on_delete=models.CASCADE)  # User who assigned the task
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_ticket = models.BooleanField(default=False)  # Added boolean field for is_ticket
-    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    status = CodedChoiceField(codes=STATUS_CODES, choices=STATUS_CHOICES, default='pending')
     review_date = models.DateTimeField(null=True, blank=True)
     approved_date = models.DateTimeField(null=True, blank=True)
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name="projects", null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Date views filter a user's tasks with range predicates on these columns (see core/dates.py)
+            models.Index(fields=['user', 'start_date'], name='core_task_user_start'),
+            models.Index(fields=['user', 'due_date'], name='core_task_user_due'),
+            # Ticket board columns and lists: filter by project and status, sorted by priority then due date.
+            # Partial on is_ticket: queries test the bare boolean, which cannot seek a middle index column
+            models.Index(fields=['project', 'status', '-priority', 'due_date', 'id'], condition=models.Q(is_ticket=True), name='core_task_board'),
+        ]
 
     def __str__(self):
         return self.title
@@ -171,13 +201,44 @@ class Task(models.Model):
 class TaskImage(models.Model):
     task = models.ForeignKey(Task, related_name='images', on_delete=models.CASCADE)
     image = models.ImageField(upload_to='task_images/')
-    
+    # Resized copies of the image, generated in the background (see core/images.py)
+    thumbnail = models.ImageField(upload_to='renditions/task_images/', blank=True, null=True, editable=False)
+    preview = models.ImageField(upload_to='renditions/task_images/', blank=True, null=True, editable=False)
+
     def __str__(self):
         return f"Image for {self.task.title}"
 
 
 
 
+# ProjectTicketStats Model: Denormalized ticket counters for a project
+class ProjectTicketStats(models.Model):
+    """
+    Ticket counters kept in step with ticket writes (see core/counters.py),
+    so project progress can be read without scanning the Task table.
+    """
+    project = models.OneToOneField(Project, on_delete=models.CASCADE, primary_key=True, related_name="ticket_stats")
+    total = models.PositiveIntegerField(default=0)
+    pending = models.PositiveIntegerField(default=0)
+    in_review = models.PositiveIntegerField(default=0)
+    approved = models.PositiveIntegerField(default=0)
+
+    @property
+    def completed(self):
+        return self.in_review + self.approved
+
+    @property
+    def percentage(self):
+        if not self.total:
+            return 0
+        return round((self.completed / self.total) * 100, 2)
+
+    def __str__(self):
+        return f"Ticket stats for {self.project.title}"
+
+
+
+
 
 
 
@@ -194,6 +255,7 @@ class Notification(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="notifications")  # Link to a user
     message = models.TextField()  # Notification message content
     created_at = models.DateTimeField(default=timezone.now)  # Timestamp of when the notification was created
+    updated_at = models.DateTimeField(auto_now=True)  # Set explicitly by queryset updates such as mark_as_read
     read_status = models.BooleanField(default=False)  # To track whether the notification has been read
     type = models.CharField(max_length=10, choices=NOTIFICATION_TYPE_CHOICES)  # Type of notification (task or project)
     project = models.ForeignKey(Project, on_delete=models.CASCADE, null=True, blank=True)
@@ -202,6 +264,121 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ['-created_at']  # Order notifications by most recent first
+        indexes = [
+            # Serves the keyset-paginated feed: WHERE user = ? AND (created_at, id) < cursor
+            models.Index(fields=['user', '-created_at', '-id'], name='core_notif_user_feed'),
+        ]
+
+    def __str__(self):
+        return f"Notification for {self.user.username}: {self.message[:50]}..."
+
+
+
+
+
+
+
+class Job(models.Model):
+    """
+    Unit of background work stored in the database queue (see core/jobs.py).
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100)  # Registered handler name
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)  # Not picked up before this time (used for retry backoff)
+    locked_by = models.CharField(max_length=100, blank=True, default='')  # Worker currently running the job
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)  # Start of the latest attempt
+    finished_at = models.DateTimeField(null=True, blank=True)
+    wait_ms = models.PositiveIntegerField(null=True, blank=True)  # Time spent queued before the first attempt
+    duration_ms = models.PositiveIntegerField(null=True, blank=True)  # Run time of the latest attempt
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='core_job_status_run_after'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+
+
+
+class NotificationCounter(models.Model):
+    """
+    Per-user count of unread notifications, maintained by core/notifications.py
+    so the unread badge never has to scan the Notification table.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name="notification_counter")
+    unread = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user.username}: {self.unread} unread"
+
+
+
+
+class MediaBlob(models.Model):
+    """
+    One stored media file, shared by every upload with the same content.
+    `refcount` is the number of file fields pointing at it (see core/storage.py).
+    """
+    name = models.CharField(max_length=255, unique=True)  # Storage name, derived from the SHA-256 of the content
+    size = models.PositiveBigIntegerField()
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # Last reference change; unreferenced blobs are collected after a grace period
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['refcount', 'updated_at'], name='core_mediablob_unreferenced'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount} refs)"
+
+
+
+
+class Upload(models.Model):
+    """
+    A chunked, resumable upload (see core/uploads.py). Once complete it holds
+    one reference to its stored file until it is attached to a task, project
+    or avatar, which takes the reference over.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('complete', 'Complete'),
+        ('attached', 'Attached'),
+        ('aborted', 'Aborted'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="uploads")
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()  # Declared total size in bytes
+    received = models.PositiveBigIntegerField(default=0)  # Bytes written so far; the offset of the next chunk
+    sha256 = models.CharField(max_length=64, blank=True)  # Checksum given at start, or the verified one once complete
+    name = models.CharField(max_length=255, blank=True)  # Storage name once complete
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'status'], name='core_upload_user_status'),
+        ]
 
     def __str__(self):
-        return f"Notification for {self.user.username}: {self.message[:50]}..."
\ No newline at end of file
+        return f"{self.filename} ({self.received}/{self.size} bytes, {self.status})"
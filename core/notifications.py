@@ -0,0 +1,187 @@
+# notifications.py
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+from django.utils.timezone import now
+from .jobs import enqueue
+from .models import Notification, NotificationCounter, User
+from .streams import publish_notifications
+
+
+def _pk(obj):
+    if obj is None:
+        return None
+    return obj.pk if hasattr(obj, 'pk') else int(obj)
+
+
+def build_notifications(message, type, users=(), roles=(), created_by=None, task=None, project=None):
+    """
+    Build (but do not save) one notification per recipient. Recipients are the
+    given users plus every user holding one of `roles`, resolved in one query
+    and de-duplicated. Users, creator, task and project may be instances or IDs.
+    """
+    recipient_ids = {_pk(user) for user in users}
+    if roles:
+        recipient_ids.update(User.objects.filter(role__in=roles).values_list('id', flat=True))
+
+    return [
+        Notification(
+            user_id=user_id,
+            message=message,
+            type=type,
+            task_id=_pk(task),
+            project_id=_pk(project),
+            created_by_id=_pk(created_by),
+        )
+        for user_id in sorted(recipient_ids)
+    ]
+
+
+def build_notification_batch(specs):
+    """
+    build_notifications() for a list of keyword dicts, resolving each distinct
+    set of roles only once.
+    """
+    by_roles = {}
+    notifications = []
+    for spec in specs:
+        spec = dict(spec)
+        roles = tuple(sorted(spec.pop('roles', ())))
+        if roles and roles not in by_roles:
+            by_roles[roles] = list(User.objects.filter(role__in=roles).values_list('id', flat=True))
+        users = list(spec.pop('users', ())) + by_roles.get(roles, [])
+        notifications += build_notifications(users=users, **spec)
+    return notifications
+
+
+def send_notifications(notifications):
+    """
+    Write the notifications with a single batched INSERT in one transaction,
+    bumping the recipients' unread counters alongside. Connected streams get
+    the new rows once the transaction commits.
+    """
+    with transaction.atomic():
+        created = Notification.objects.bulk_create(notifications)
+        increment_unread(Counter(n.user_id for n in created if not n.read_status))
+        transaction.on_commit(lambda: publish_notifications(created))
+    return created
+
+
+def increment_unread(counts):
+    """
+    Add to the unread counters, given {user_id: amount}. Issues one UPDATE per
+    distinct amount, which is a single UPDATE for an ordinary fan-out.
+    """
+    if not counts:
+        return
+    NotificationCounter.objects.bulk_create(
+        [NotificationCounter(user_id=user_id) for user_id in counts],
+        ignore_conflicts=True,
+    )
+    by_amount = defaultdict(list)
+    for user_id, amount in counts.items():
+        by_amount[amount].append(user_id)
+    for amount, user_ids in by_amount.items():
+        NotificationCounter.objects.filter(user_id__in=user_ids).update(unread=F('unread') + amount)
+
+
+def decrement_unread(user_id, amount):
+    # Clamp at zero so a drifted counter can never violate the unsigned column
+    if amount:
+        NotificationCounter.objects.filter(user_id=user_id).update(unread=Greatest(F('unread') - amount, 0))
+
+
+def notifications_deleted(notifications):
+    """
+    Counter update for notifications about to be deleted, given as a queryset:
+    one grouped count of the unread ones, then one UPDATE per distinct amount.
+    """
+    by_amount = defaultdict(list)
+    for user_id, amount in notifications.filter(read_status=False).values_list('user_id').annotate(n=Count('id')):
+        by_amount[amount].append(user_id)
+    for amount, user_ids in by_amount.items():
+        NotificationCounter.objects.filter(user_id__in=user_ids).update(unread=Greatest(F('unread') - amount, 0))
+
+
+def unread_count(user):
+    return NotificationCounter.objects.filter(user=user).values_list('unread', flat=True).first() or 0
+
+
+def mark_as_read(user, notification_ids):
+    """
+    Mark the user's notifications as read. Returns how many were unread.
+    """
+    with transaction.atomic():
+        marked = Notification.objects.filter(id__in=notification_ids, user=user, read_status=False).update(
+            read_status=True, updated_at=now(),
+        )
+        decrement_unread(user.pk, marked)
+    return marked
+
+
+def reconcile_unread_counters(user_ids=None):
+    """
+    Reset counters to the true number of unread notifications.
+    Returns {user_id: (stored, actual)} for every counter that had drifted.
+    """
+    unread = Notification.objects.filter(read_status=False)
+    counters = NotificationCounter.objects.all()
+    if user_ids is not None:
+        unread = unread.filter(user_id__in=user_ids)
+        counters = counters.filter(user_id__in=user_ids)
+
+    actual = dict(unread.values_list('user_id').annotate(n=Count('id')))
+    stored = dict(counters.values_list('user_id', 'unread'))
+
+    drift = {}
+    for user_id in set(actual) | set(stored):
+        if actual.get(user_id, 0) != stored.get(user_id, 0):
+            drift[user_id] = (stored.get(user_id, 0), actual.get(user_id, 0))
+
+    with transaction.atomic():
+        NotificationCounter.objects.bulk_create(
+            [NotificationCounter(user_id=user_id, unread=counts[1]) for user_id, counts in drift.items()],
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=['unread'],
+        )
+    return drift
+
+
+def notify(message, type, users=(), roles=(), created_by=None, task=None, project=None):
+    """
+    Queue a notification fan-out to the given users and roles. Recipients are
+    resolved and the rows written by the 'notifications.fan_out' job, so the
+    request only pays for a single job insert.
+    """
+    return enqueue('notifications.fan_out', {
+        'message': message,
+        'type': type,
+        'users': [_pk(user) for user in users],
+        'roles': list(roles),
+        'created_by': _pk(created_by),
+        'task': _pk(task),
+        'project': _pk(project),
+    })
+
+
+def notify_batch(specs):
+    """
+    Queue several notify() fan-outs, given as keyword dicts, as a single job.
+    """
+    if not specs:
+        return None
+    return enqueue('notifications.fan_out_batch', {'notifications': [
+        {
+            'message': spec['message'],
+            'type': spec['type'],
+            'users': [_pk(user) for user in spec.get('users', ())],
+            'roles': list(spec.get('roles', ())),
+            'created_by': _pk(spec.get('created_by')),
+            'task': _pk(spec.get('task')),
+            'project': _pk(spec.get('project')),
+        }
+        for spec in specs
+    ]})
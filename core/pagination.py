@@ -0,0 +1,128 @@
+# pagination.py
+"""
+Keyset (cursor) pagination.
+
+Pages are selected with a WHERE clause on the ordering columns instead of an
+OFFSET, so every page costs the same as the first one as long as an index
+covers the ordering. Cursors are opaque URL-safe strings holding the ordering
+values of the last row of the previous page.
+"""
+import base64
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _split(ordering):
+    return [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+
+
+def _json_value(value):
+    # Keep full microsecond precision: a truncated timestamp would skip rows that tie on it
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot encode {type(value).__name__} in a cursor.")
+
+
+def encode_cursor(obj, ordering):
+    values = [getattr(obj, name) for name, _ in _split(ordering)]
+    raw = json.dumps(values, default=_json_value, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, model, ordering):
+    fields = _split(ordering)
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(fields):
+            raise ValueError
+        return [model._meta.get_field(name).to_python(value) for (name, _), value in zip(fields, values)]
+    except (ValueError, TypeError, ValidationError) as e:
+        raise InvalidCursor("Invalid cursor.") from e
+
+
+def after_cursor_q(ordering, values):
+    """
+    Rows strictly after `values` in `ordering`, expanded to
+    (a < x) OR (a = x AND b < y) OR ... so the database can seek the index.
+    """
+    fields = _split(ordering)
+    condition = Q()
+    for i, (name, descending) in enumerate(fields):
+        step = Q(**{f"{name}__{'lt' if descending else 'gt'}": values[i]})
+        for j, (prev_name, _) in enumerate(fields[:i]):
+            step &= Q(**{prev_name: values[j]})
+        condition |= step
+    return condition
+
+
+def paginate_keyset(queryset, ordering, cursor=None, page_size=20):
+    """
+    Return (rows, next_cursor) for one page. `ordering` must end in a unique
+    column (usually 'id' or '-id') so rows never tie.
+    """
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        values = decode_cursor(cursor, queryset.model, ordering)
+        queryset = queryset.filter(after_cursor_q(ordering, values))
+
+    rows = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(rows[-1], ordering)
+    return rows, next_cursor
+
+
+def _loading(queryset, names):
+    # Make sure sparse fieldsets (only()/defer()) still load the given columns
+    field_names, deferred = queryset.query.deferred_loading
+    if deferred:
+        kept = field_names - set(names)
+        return queryset.defer(None).defer(*kept) if kept != field_names else queryset
+    return queryset.only(*field_names, *names) if field_names else queryset
+
+
+def first_pages(queryset, partition, ordering, page_size=20):
+    """
+    The first page of every group of rows sharing a value of `partition`, in
+    one query: rows are numbered per group with ROW_NUMBER() and cut off after
+    page_size + 1. Returns {value: (rows, next_cursor)}; next cursors continue
+    with paginate_keyset() on the group's rows.
+    """
+    fields = _split(ordering)
+    order_by = [F(name).desc() if descending else F(name).asc() for name, descending in fields]
+    rows = _loading(queryset, [partition] + [name for name, _ in fields]).annotate(
+        _row=Window(RowNumber(), partition_by=[F(partition)], order_by=order_by),
+    ).filter(_row__lte=page_size + 1).order_by(partition, *ordering)
+
+    groups = {}
+    for row in rows:
+        groups.setdefault(getattr(row, partition), []).append(row)
+    pages = {}
+    for value, group in groups.items():
+        next_cursor = None
+        if len(group) > page_size:
+            group = group[:page_size]
+            next_cursor = encode_cursor(group[-1], ordering)
+        pages[value] = (group, next_cursor)
+    return pages
+
+
+def page_size_from(request, default, maximum):
+    """
+    Read `?page_size=` from the request, clamped to [1, maximum].
+    """
+    try:
+        size = int(request.query_params.get('page_size', default))
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, maximum))
@@ -0,0 +1,51 @@
+# queries.py
+from django.db.models import Q
+from .models import Project, ProjectMember, Task
+from .serializers import ProjectProgressSerializer, TaskListSerializer, TaskSerializer
+from .sparse import load_for
+
+
+def visible_projects_q(user):
+    """
+    Q object matching the projects a user can see: the ones they lead, created,
+    or are a member of. Membership is matched through a subquery so the project
+    rows are never duplicated by the members join.
+    """
+    member_of = ProjectMember.objects.filter(user=user).values('project_id')
+    return Q(team_lead=user) | Q(created_by=user) | Q(id__in=member_of)
+
+
+def project_queryset(context=None):
+    """
+    Base queryset for every project payload. Ticket progress comes from the
+    denormalized counters joined in the same query, and the nested members,
+    member users, images and team lead are loaded up front, so serializing a
+    list costs a fixed number of queries. With `?fields=` in the context only
+    the rendered columns and relations are loaded.
+    """
+    return load_for(Project.objects.all(), ProjectProgressSerializer, context)
+
+
+def projects_for_user(user, context=None):
+    """
+    Projects visible to the given user, with ticket progress. Admins see everything.
+    """
+    projects = project_queryset(context)
+    if user.role != 'Admin':
+        projects = projects.filter(visible_projects_q(user))
+    return projects.order_by('due_date')
+
+
+def task_list_queryset(context=None):
+    """
+    Base queryset for task lists rendered with TaskListSerializer: the users and
+    project are joined in, loading only the columns of their summaries.
+    """
+    return load_for(Task.objects.all(), TaskListSerializer, context)
+
+
+def task_detail_queryset(context=None):
+    """
+    Queryset for the full TaskSerializer payload, including the nested project.
+    """
+    return load_for(Task.objects.all(), TaskSerializer, context)
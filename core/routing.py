@@ -0,0 +1,139 @@
+# routing.py
+"""
+Primary/replica database routing.
+
+Writes always go to the primary ('default'). Reads go to a read replica (one of
+DATABASE_REPLICAS, picked once per request so all of its reads see the same
+snapshot) only inside GET/HEAD/OPTIONS requests handled by
+`ReplicaRoutingMiddleware`. Reads fall back to the primary:
+
+- for the rest of a request once it has written anything, and inside any
+  transaction on the primary, so a request always reads its own writes;
+- for REPLICA_STICKY_SECONDS after a request by the same client wrote, so the
+  page loaded right after a change shows it even while the replicas lag. The
+  client is recognised by a cookie, or by its user through the cache for API
+  clients that do not keep cookies;
+- inside `use_primary()`, for data that must be current;
+- outside requests: background jobs, management commands and the shell.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = 'db_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class RoutingState:
+    __slots__ = ('replica', 'pinned', 'wrote', 'primary_blocks')
+
+    def __init__(self, replica, pinned):
+        self.replica = replica  # None when the request reads from the primary
+        self.pinned = pinned
+        self.wrote = False
+        self.primary_blocks = 0
+
+
+_state = ContextVar('db_routing_state', default=None)
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def _pin_key(user_id):
+    return f'db-routing:pinned:{user_id}'
+
+
+def read_alias():
+    state = _state.get()
+    if state is None or state.replica is None or state.pinned or state.wrote or state.primary_blocks:
+        return DEFAULT_DB_ALIAS
+    if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return DEFAULT_DB_ALIAS
+    return state.replica
+
+
+@contextmanager
+def use_primary():
+    """
+    Read from the primary inside the block.
+    """
+    state = _state.get()
+    if state is None:
+        yield
+        return
+    state.primary_blocks += 1
+    try:
+        yield
+    finally:
+        state.primary_blocks -= 1
+
+
+def note_user(user_id):
+    """
+    Pin the current request to the primary if this user wrote within the
+    sticky window. Called once the request's user is known.
+    """
+    state = _state.get()
+    if state is not None and state.replica is not None and not state.pinned:
+        state.pinned = cache.get(_pin_key(user_id)) is not None
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replicas hold the same rows as the primary
+        aliases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Replicas get the schema with the data, from the primary
+        if db in replicas():
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Sets up routing for each request and pins clients that wrote to the primary.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        aliases = replicas()
+        if not aliases:
+            return self.get_response(request)
+
+        replica = random.choice(aliases) if request.method in SAFE_METHODS else None
+        state = RoutingState(replica, pinned=PIN_COOKIE in request.COOKIES)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+
+        if state.wrote:
+            seconds = getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+            response.set_cookie(PIN_COOKIE, '1', max_age=seconds, httponly=True, samesite='Lax')
+            # DRF stores the authenticated API user on the underlying request
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                cache.set(_pin_key(user.pk), 1, seconds)
+        return response
@@ -1,6 +1,9 @@
 # serializers.py
 from rest_framework import serializers
 from .models import *
+from django.db import transaction
+from .sparse import SparseFieldsMixin
+from .uploads import UploadError, claim_uploads
 
 class LoginSerializer(serializers.Serializer):
     username = serializers.CharField(max_length=150)
@@ -13,33 +16,66 @@ class LoginSerializer(serializers.Serializer):
 class TaskImageSerializer(serializers.ModelSerializer):
     class Meta:
         model = TaskImage
-        fields = ['image']
+        fields = ['image', 'thumbnail', 'preview']
 
 
 
-class UserSerializer(serializers.ModelSerializer):
+
+def create_task_with_images(validated_data, request):
+    """
+    Create the task with the request's image files and the finished chunked
+    uploads listed in `upload_ids`; nothing is created if an upload is invalid.
+    """
+    upload_ids = validated_data.pop('upload_ids', [])
+    with transaction.atomic():
+        task = Task.objects.create(**validated_data)
+
+        # Save images related to the task
+        for image in request.FILES.getlist('images', []):
+            TaskImage.objects.create(task=task, image=image)
+        try:
+            names = claim_uploads(request.user, upload_ids)
+        except UploadError as e:
+            raise serializers.ValidationError({'upload_ids': [e.message]})
+        for name in names:
+            TaskImage.objects.create(task=task, image=name)
+    return task
+
+
+
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Serializer for the User model to include user details.
     """
     class Meta:
         model = User
-        fields = ['id', 'username', 'full_name', 'avatar', 'email', 'position', 'role', 'phone_number', 'department']  # Add other fields if needed
+        fields = ['id', 'username', 'full_name', 'avatar', 'avatar_thumbnail', 'avatar_preview', 'email', 'position', 'role', 'phone_number', 'department']  # Add other fields if needed
+
+
+
+
+class UserSummarySerializer(serializers.ModelSerializer):
+    """
+    Compact user representation for list payloads.
+    """
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'full_name', 'avatar', 'avatar_thumbnail']
 
 
 
 
 class TaskSerializerManager(serializers.ModelSerializer):
     images = TaskImageSerializer(many=True, required=False)
+    upload_ids = serializers.ListField(child=serializers.UUIDField(), write_only=True, required=False)  # Finished chunked uploads to attach
     assigned_by = UserSerializer(read_only=True)  # To display assigned user info
     user = UserSerializer(read_only=True)  # To display task owner info
 
     class Meta:
         model = Task
-        fields = ['id', 'title', 'approved_date', 'review_date', 'description', 'due_date', 'start_date', 'priority', 'user', 'assigned_by', 'is_ticket', 'status', 'images']
+        fields = ['id', 'title', 'approved_date', 'review_date', 'description', 'due_date', 'start_date', 'priority', 'user', 'assigned_by', 'is_ticket', 'status', 'images', 'upload_ids']
 
     def create(self, validated_data):
-        # Extract files from the context
-        images_data = self.context['request'].FILES.getlist('images', [])
         user = self.context['user']  # Access the user from context
         to_user = self.context['to_user']  # Access the user from context
 
@@ -51,14 +87,8 @@ class TaskSerializerManager(serializers.ModelSerializer):
         validated_data['assigned_by'] = user
         validated_data['user'] = to_user
 
-        # Create the Task object
-        task = Task.objects.create(**validated_data)
-
-        # Save images related to the task
-        for image in images_data:
-            TaskImage.objects.create(task=task, image=image)
-
-        return task
+        # Create the Task object with its images
+        return create_task_with_images(validated_data, self.context['request'])
 
 
 
@@ -80,11 +110,11 @@ class ProjectMemberSerializer(serializers.ModelSerializer):
 class ProjectImageSerializer(serializers.ModelSerializer):
     class Meta:
         model = ProjectImage
-        fields = ['image']
+        fields = ['image', 'thumbnail', 'preview']
         
         
         
-class ProjectSerializer(serializers.ModelSerializer):
+class ProjectSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     members = ProjectMemberSerializer(many=True)
     images = ProjectImageSerializer(many=True)
     team_lead = UserSerializer()  # Nested serializer to get team lead details
@@ -96,6 +126,25 @@ class ProjectSerializer(serializers.ModelSerializer):
                   'status', 'priority', 'team_lead', 'created_by', 'created_at', 'members', 'images']
 
 
+class ProjectProgressSerializer(ProjectSerializer):
+    """
+    Project payload with the percentage of tickets that are in review or approved,
+    read from the project's ticket counters.
+    """
+    percentage = serializers.SerializerMethodField()
+
+    class Meta(ProjectSerializer.Meta):
+        fields = ProjectSerializer.Meta.fields + ['percentage']
+        field_dependencies = {'percentage': ['ticket_stats']}
+
+    def get_percentage(self, project):
+        try:
+            return project.ticket_stats.percentage
+        except ProjectTicketStats.DoesNotExist:
+            # Projects without any tickets have no counter row yet
+            return 0
+
+
 class ProjectSerializerCreate(serializers.ModelSerializer):
     team_lead = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())  # Expecting an ID, not a full object
 
@@ -111,8 +160,33 @@ class ProjectSerializerCreate(serializers.ModelSerializer):
 
 
 
+class TaskAssignmentSerializer(serializers.ModelSerializer):
+    """
+    A task template plus who gets it: user ids and/or whole departments or roles.
+    """
+    assignees = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    departments = serializers.ListField(child=serializers.ChoiceField(choices=User.DEPARTMENT_CHOICES), required=False, default=list)
+    roles = serializers.ListField(child=serializers.ChoiceField(choices=User.ROLE_CHOICES), required=False, default=list)
+    upload_ids = serializers.ListField(child=serializers.UUIDField(), required=False, default=list)  # Finished chunked uploads to attach
+
+    class Meta:
+        model = Task
+        fields = ['title', 'description', 'due_date', 'start_date', 'priority', 'assignees', 'departments', 'roles', 'upload_ids']
+
+    def validate(self, attrs):
+        if not (attrs['assignees'] or attrs['departments'] or attrs['roles']):
+            raise serializers.ValidationError("Give assignees, departments or roles.")
+        return attrs
+
+
+
+
+
+
+
 class TicketTaskSerializer(serializers.ModelSerializer):
     images = TaskImageSerializer(many=True, required=False)
+    upload_ids = serializers.ListField(child=serializers.UUIDField(), write_only=True, required=False)  # Finished chunked uploads to attach
     assigned_by = UserSerializer(read_only=True)  # The logged-in user who assigns the task
     user = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())  # The user the task is assigned to
     project = serializers.PrimaryKeyRelatedField(queryset=Project.objects.all())  # The project the task is associated with
@@ -122,12 +196,10 @@ class TicketTaskSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'title', 'approved_date', 'review_date', 'description', 
             'due_date', 'start_date', 'priority', 'user', 'assigned_by', 
-            'is_ticket', 'status', 'images', 'project'
+            'is_ticket', 'status', 'images', 'project', 'upload_ids'
         ]
 
     def create(self, validated_data):
-        # Extract files from the context (if any)
-        images_data = self.context['request'].FILES.getlist('images', [])
         user = self.context['user']  # The logged-in user making the request (assigned_by)
 
         # Ensure `assigned_by` is set to the logged-in user
@@ -136,14 +208,8 @@ class TicketTaskSerializer(serializers.ModelSerializer):
         # Ensure `is_ticket` is set to True
         validated_data['is_ticket'] = True
 
-        # Create the Task object
-        task = Task.objects.create(**validated_data)
-
-        # Save associated images if any
-        for image in images_data:
-            TaskImage.objects.create(task=task, image=image)
-
-        return task
+        # Create the Task object with its images
+        return create_task_with_images(validated_data, self.context['request'])
 
 
 
@@ -151,32 +217,60 @@ class TicketTaskSerializer(serializers.ModelSerializer):
 
 
 
-class TaskSerializer(serializers.ModelSerializer):
+class TaskSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     images = TaskImageSerializer(many=True, required=False)
+    upload_ids = serializers.ListField(child=serializers.UUIDField(), write_only=True, required=False)  # Finished chunked uploads to attach
     assigned_by = UserSerializer(read_only=True)  # To display assigned user info
     user = UserSerializer(read_only=True)  # To display task owner info
     project = ProjectSerializer(read_only=True) # To display
     class Meta:
         model = Task
-        fields = ['id', 'title', 'approved_date', 'review_date', 'description', 'due_date', 'start_date', 'priority', 'user', 'assigned_by', 'is_ticket', 'status', 'images', 'project']
+        fields = ['id', 'title', 'approved_date', 'review_date', 'description', 'due_date', 'start_date', 'priority', 'user', 'assigned_by', 'is_ticket', 'status', 'images', 'project', 'upload_ids']
 
     def create(self, validated_data):
-        # Extract files from the context
-        images_data = self.context['request'].FILES.getlist('images', [])
         user = self.context['user']  # Access the user from context
 
         # Manually assign user and assigned_by fields
         validated_data['assigned_by'] = user
         validated_data['user'] = user
 
-        # Create the Task object
-        task = Task.objects.create(**validated_data)
+        # Create the Task object with its images
+        return create_task_with_images(validated_data, self.context['request'])
 
-        # Save images related to the task
-        for image in images_data:
-            TaskImage.objects.create(task=task, image=image)
 
-        return task
+
+
+
+
+class ProjectSummarySerializer(serializers.ModelSerializer):
+    """
+    Compact project representation for list payloads.
+    """
+    class Meta:
+        model = Project
+        fields = ['id', 'title']
+
+
+class TaskListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    Task representation for list endpoints: same fields as TaskSerializer, but
+    users and project are summaries instead of full nested objects. Use with
+    `core.queries.task_list_queryset()`. TaskDetailView keeps the full payload.
+    `?expand=project,user,assigned_by` renders those in full instead.
+    """
+    images = TaskImageSerializer(many=True, read_only=True)
+    assigned_by = UserSummarySerializer(read_only=True)
+    user = UserSummarySerializer(read_only=True)
+    project = ProjectSummarySerializer(read_only=True)
+
+    class Meta:
+        model = Task
+        fields = ['id', 'title', 'approved_date', 'review_date', 'description', 'due_date', 'start_date', 'priority', 'user', 'assigned_by', 'is_ticket', 'status', 'images', 'project']
+        expandable = {
+            'project': ProjectSerializer,
+            'user': UserSerializer,
+            'assigned_by': UserSerializer,
+        }
 
 
 
@@ -202,7 +296,7 @@ class UserCreateSerializer(serializers.ModelSerializer):
 
 
 
-class NotificationSerializer(serializers.ModelSerializer):
+class NotificationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     created_by = UserSerializer(read_only=True)  # The logged-in user who assigns the task
 
     class Meta:
@@ -0,0 +1,251 @@
+# signals.py
+from django.db.models import FileField, Model, Q
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils.timezone import now
+from .caching import invalidate_projects
+from .conditional import touch_projects
+from .counters import ticket_saved, tickets_deleted
+from .images import SOURCES, rendition_fields
+from .jobs import enqueue
+from .storage import release_on_commit
+from .models import Notification, Project, ProjectImage, ProjectMember, Task, TaskImage, User
+from .notifications import decrement_unread, notifications_deleted
+
+
+# Project list/detail cache invalidation (see core/caching.py). Changes to what a
+# project payload nests also bump the project's updated_at, which its ETag reads.
+
+def project_content_changed(project_ids, user_ids=()):
+    touch_projects(project_ids)
+    invalidate_projects(project_ids, user_ids=user_ids)
+
+
+@receiver(pre_save, sender=Project)
+def remember_project_audience(sender, instance, **kwargs):
+    # A new team lead or creator takes the project out of the previous one's list
+    instance._previous_audience = set()
+    if instance.pk is not None:
+        previous = Project.objects.filter(pk=instance.pk).values_list('team_lead_id', 'created_by_id').first()
+        instance._previous_audience = set(previous or ())
+
+
+@receiver(post_save, sender=Project)
+def invalidate_project_on_save(sender, instance, **kwargs):
+    invalidate_projects([instance.pk], user_ids=getattr(instance, '_previous_audience', ()))
+
+
+@receiver(post_save, sender=ProjectMember)
+def invalidate_project_on_member_save(sender, instance, **kwargs):
+    project_content_changed([instance.project_id], user_ids=[instance.user_id])
+
+
+@receiver(pre_delete, sender=ProjectMember)
+def invalidate_project_on_member_delete(sender, instance, origin=None, **kwargs):
+    members = _deleted_values('content', sender, instance, origin, 'project_id', 'user_id')
+    if members:
+        project_content_changed({row[0] for row in members}, user_ids={row[1] for row in members})
+
+
+@receiver(post_save, sender=ProjectImage)
+def invalidate_project_on_image_save(sender, instance, **kwargs):
+    project_content_changed([instance.project_id])
+
+
+@receiver(pre_delete, sender=ProjectImage)
+def invalidate_project_on_image_delete(sender, instance, origin=None, **kwargs):
+    images = _deleted_values('content', sender, instance, origin, 'project_id')
+    if images:
+        project_content_changed({row[0] for row in images})
+
+
+# Ticket counters (see core/counters.py). update() and bulk_create() skip these;
+# their callers apply the counters themselves or rebuild them.
+
+COUNTED_FIELDS = {'is_ticket', 'project', 'project_id', 'status'}
+
+
+@receiver(pre_save, sender=Task)
+def remember_ticket_status(sender, instance, update_fields=None, **kwargs):
+    instance._counted_before = None
+    if instance._state.adding or (update_fields is not None and not COUNTED_FIELDS & set(update_fields)):
+        return
+    instance._counted_before = Task.objects.filter(pk=instance.pk).values_list('is_ticket', 'project_id', 'status').first()
+
+
+@receiver(post_save, sender=Task)
+def count_ticket_on_save(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_counted_before', None)
+    instance._counted_before = None
+    if created or previous is not None:
+        ticket_saved(instance, previous)
+
+
+@receiver(post_save, sender=Task)
+def invalidate_project_on_ticket_change(sender, instance, **kwargs):
+    # Ticket counts feed the project's completion percentage
+    if instance.is_ticket and instance.project_id:
+        project_content_changed([instance.project_id])
+
+
+# Deletes. A cascade sends delete signals for every ticket, member and image it
+# removes, including those of projects that are going away too, and a queryset
+# delete sends them for every row. The delete handlers do the bookkeeping once
+# per delete() call instead, from the rows the call was made on, before anything
+# is removed; rows removed by a cascade are covered by settle_cascade_on_delete.
+
+def _deleted_rows(handler, sender, instance, origin):
+    """
+    A queryset of the `sender` rows a delete() call was made on, the first time
+    `handler` sees the call; None otherwise, including for rows removed by a
+    cascade from another model.
+    """
+    if origin is None or origin is instance:
+        return sender._base_manager.filter(pk=instance.pk)
+    if isinstance(origin, Model) or origin.model is not sender:
+        return None
+    # Queryset deletes signal every row; only the first one is handled
+    handled = origin.__dict__.setdefault('_delete_handlers', set())
+    if handler in handled:
+        return None
+    handled.add(handler)
+    return sender._base_manager.filter(pk__in=origin.values('pk'))
+
+
+def _deleted_values(handler, sender, instance, origin, *fields):
+    # The given fields of the rows a delete() call removes, once per call (see _deleted_rows)
+    if origin is None or origin is instance:
+        return [tuple(getattr(instance, field) for field in fields)]
+    rows = _deleted_rows(handler, sender, instance, origin)
+    return [] if rows is None else list(rows.values_list(*fields))
+
+
+def _cascade(sender, rows):
+    # The projects and tasks that deleting `rows` removes along with them
+    if sender is User:
+        projects = Project.objects.filter(Q(team_lead__in=rows) | Q(created_by__in=rows))
+        tasks = Task.objects.filter(Q(user__in=rows) | Q(assigned_by__in=rows) | Q(project__in=projects))
+    elif sender is Project:
+        projects, tasks = rows, Task.objects.filter(project__in=rows)
+    else:
+        projects, tasks = Project.objects.none(), rows
+    return projects, tasks
+
+
+@receiver(pre_delete, sender=User)
+@receiver(pre_delete, sender=Project)
+@receiver(pre_delete, sender=Task)
+def settle_cascade_on_delete(sender, instance, origin=None, **kwargs):
+    rows = _deleted_rows('cascade', sender, instance, origin)
+    if rows is None:
+        return
+    projects, tasks = _cascade(sender, rows)
+    project_ids = set(projects.values_list('id', flat=True))
+
+    # Counters and payloads of the projects being deleted are left alone
+    changed = tickets_deleted(tasks.exclude(project_id__in=project_ids))
+    if sender is User:
+        member_of = ProjectMember.objects.filter(user__in=rows).exclude(project_id__in=project_ids)
+        changed |= set(member_of.values_list('project_id', flat=True))
+
+    # Notifications go with their task or project (and their sender); a deleted
+    # user's own notifications go with their counter
+    notifications = Q(task__in=tasks) | Q(project_id__in=project_ids)
+    if sender is User:
+        notifications = Notification.objects.filter(notifications | Q(created_by__in=rows)).exclude(user__in=rows)
+    else:
+        notifications = Notification.objects.filter(notifications)
+    notifications_deleted(notifications)
+
+    # Before the cascade, while the members are still there to be found
+    invalidate_projects(project_ids)
+    if changed:
+        project_content_changed(changed)
+
+
+@receiver(pre_delete, sender=Notification)
+def update_unread_counter_on_delete(sender, instance, origin=None, **kwargs):
+    # Cascaded notifications are counted by settle_cascade_on_delete
+    if origin is None or origin is instance:
+        if not instance.read_status:
+            decrement_unread(instance.user_id, 1)
+        return
+    rows = _deleted_rows('unread', sender, instance, origin)
+    if rows is not None:
+        notifications_deleted(rows)
+
+
+@receiver(post_save, sender=User)
+def invalidate_projects_on_user_change(sender, instance, created, update_fields=None, **kwargs):
+    # Project payloads nest the team lead and members; logins only touch last_login
+    if created or (update_fields is not None and set(update_fields) <= {'last_login'}):
+        return
+    lead_of = Project.objects.filter(team_lead=instance).values_list('id', flat=True)
+    member_of = ProjectMember.objects.filter(user=instance).values_list('project_id', flat=True)
+    project_content_changed(set(lead_of) | set(member_of), user_ids=[instance.pk])
+
+
+# Image renditions (see core/images.py)
+
+@receiver(pre_save, sender=TaskImage)
+@receiver(pre_save, sender=ProjectImage)
+@receiver(pre_save, sender=User)
+def detect_image_upload(sender, instance, update_fields=None, **kwargs):
+    # A newly assigned upload is only written to storage during save(), so it is
+    # still uncommitted here. A stored name assigned directly (an attached chunked
+    # upload, see core/uploads.py) looks committed, so existing rows compare
+    # against the database.
+    label = sender._meta.label
+    source_field = SOURCES[label][0]
+    instance._renditions_stale = False
+    instance._replaced_files = []
+    if update_fields is not None and source_field not in update_fields:
+        return
+
+    source = getattr(instance, source_field)
+    if instance._state.adding:
+        instance._renditions_stale = bool(source)
+        return
+
+    previous = sender._default_manager.filter(pk=instance.pk).values_list(source_field, flat=True).first()
+    changed = not source._committed or (source.name or '') != (previous or '')
+    if source:
+        instance._renditions_stale = changed
+    else:
+        instance._renditions_stale = any(getattr(instance, field) for field in rendition_fields(label).values())
+    if changed and previous:
+        # The file being replaced or cleared loses this reference (see core/storage.py)
+        instance._replaced_files = [(source.storage, previous)]
+
+
+@receiver(post_save, sender=TaskImage)
+@receiver(post_save, sender=ProjectImage)
+@receiver(post_save, sender=User)
+def queue_image_renditions(sender, instance, **kwargs):
+    release_on_commit(getattr(instance, '_replaced_files', []))
+    instance._replaced_files = []
+    if getattr(instance, '_renditions_stale', False):
+        instance._renditions_stale = False
+        enqueue('images.renditions', {'model': sender._meta.label, 'pk': instance.pk})
+
+
+@receiver(post_delete, sender=TaskImage)
+@receiver(post_delete, sender=ProjectImage)
+@receiver(post_delete, sender=User)
+def release_image_files(sender, instance, **kwargs):
+    files = [getattr(instance, field.attname) for field in sender._meta.concrete_fields if isinstance(field, FileField)]
+    release_on_commit([(file.storage, file.name) for file in files if file])
+
+
+# Task payloads nest their images; these move the task lists' ETags
+
+@receiver(post_save, sender=TaskImage)
+def touch_task_on_image_save(sender, instance, **kwargs):
+    Task.objects.filter(pk=instance.task_id).update(updated_at=now())
+
+
+@receiver(pre_delete, sender=TaskImage)
+def touch_task_on_image_delete(sender, instance, origin=None, **kwargs):
+    images = _deleted_values('touch', sender, instance, origin, 'task_id')
+    if images:
+        Task.objects.filter(pk__in={row[0] for row in images}).update(updated_at=now())
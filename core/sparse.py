@@ -0,0 +1,130 @@
+# sparse.py
+"""
+Sparse fieldsets and expansion for read endpoints.
+
+`?fields=id,title,status` limits a payload to the listed top-level fields and
+`?expand=project` swaps a compact nested field for its full representation
+(declared per serializer in `Meta.expandable`). `load_for()` then derives the
+queryset from the serializer that will actually render: `.only()` for the
+columns in use, `select_related` for nested single objects and `Prefetch` for
+nested lists, so relations that are not rendered are never queried.
+
+Serializer fields computed from something other than a model field declare
+what they read in `Meta.field_dependencies`, e.g. {'percentage': ['ticket_stats']}.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+def _split_param(value):
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+
+def sparse_context(request, **extra):
+    """
+    Serializer context carrying the request's `fields` and `expand` parameters.
+    """
+    return {
+        'request': request,
+        'fields': _split_param(request.query_params.get('fields')),
+        'expand': _split_param(request.query_params.get('expand')),
+        **extra,
+    }
+
+
+class SparseFieldsMixin:
+    """
+    Applies the context's `fields` and `expand` to the top-level serializer only;
+    nested serializers always render in full.
+    """
+
+    def _is_top_level(self):
+        parent = self.parent
+        return parent is None or (isinstance(parent, serializers.ListSerializer) and parent.parent is None)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self._is_top_level():
+            return fields
+
+        expand = self.context.get('expand') or set()
+        for name, serializer_class in getattr(self.Meta, 'expandable', {}).items():
+            if name in expand and name in fields:
+                fields[name] = serializer_class(read_only=True)
+
+        requested = {name for name in self.context.get('fields') or () if name in fields}
+        if requested:
+            fields = {name: field for name, field in fields.items() if name in requested}
+        return fields
+
+
+def _related_columns(model, prefix):
+    return [prefix + field.name for field in model._meta.concrete_fields]
+
+
+def _plan(serializer, model, prefix=''):
+    """
+    Work out (columns, select_related, prefetches) for rendering `serializer`
+    over `model`, with lookups relative to the root model through `prefix`.
+    """
+    meta = model._meta
+    columns, select, prefetch = [prefix + meta.pk.name], [], []
+    dependencies = getattr(getattr(serializer, 'Meta', None), 'field_dependencies', {})
+
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+
+        if name in dependencies:
+            for lookup in dependencies[name]:
+                related = meta.get_field(lookup).related_model
+                select.append(prefix + lookup)
+                columns += _related_columns(related, f'{prefix}{lookup}__')
+            continue
+
+        source = field.source.split('.')[0]
+        try:
+            model_field = meta.get_field(source)
+        except FieldDoesNotExist:
+            continue
+
+        if not model_field.is_relation:
+            columns.append(prefix + model_field.name)
+
+        elif model_field.concrete and (model_field.many_to_one or model_field.one_to_one):
+            columns.append(prefix + model_field.name)
+            if isinstance(field, serializers.BaseSerializer) and not isinstance(field, serializers.ListSerializer):
+                select.append(prefix + source)
+                sub_columns, sub_select, sub_prefetch = _plan(field, model_field.related_model, f'{prefix}{source}__')
+                columns += sub_columns
+                select += sub_select
+                prefetch += sub_prefetch
+
+        elif isinstance(field, serializers.ListSerializer):
+            related = model_field.related_model
+            sub_columns, sub_select, sub_prefetch = _plan(field.child, related)
+            if model_field.one_to_many:
+                # The prefetch matches rows back to their parent through this column
+                sub_columns.append(model_field.field.name)
+            queryset = related._default_manager.all()
+            if sub_select:
+                queryset = queryset.select_related(*sub_select)
+            queryset = queryset.prefetch_related(*sub_prefetch).only(*sub_columns)
+            prefetch.append(Prefetch(prefix + source, queryset=queryset))
+
+    return columns, select, prefetch
+
+
+def load_for(queryset, serializer_class, context=None):
+    """
+    Load exactly what `serializer_class` renders with the given context.
+    Replaces any select_related/prefetch_related already on the queryset.
+    """
+    serializer = serializer_class(context=context or {})
+    columns, select, prefetch = _plan(serializer, queryset.model)
+    queryset = queryset.select_related(None).prefetch_related(None)
+    if select:
+        # select_related() without arguments would follow every foreign key
+        queryset = queryset.select_related(*select)
+    return queryset.prefetch_related(*prefetch).only(*columns)
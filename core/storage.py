@@ -0,0 +1,172 @@
+# storage.py
+"""
+Content-addressed media storage.
+
+Every upload is hashed (SHA-256) while it is streamed to a temporary file and
+then stored once under `blobs/<2 hex>/<2 hex>/<hash><ext>`, whatever the
+field's `upload_to` says. The two levels of 256 directories keep each
+directory small at millions of files. Uploading a file that is already stored
+gives the same name and only bumps the blob's reference count, so it costs no
+extra disk.
+
+`delete()` releases one reference. Blobs nobody references are removed by
+`python manage.py media_blobs --collect`, and only after a grace period. An
+identical upload arriving just as a blob is released therefore never finds
+its file gone.
+
+Names written before this storage was introduced (e.g. `task_images/x.jpg`)
+keep working; `media_blobs --import-legacy` moves them into the blob tree.
+"""
+import hashlib
+import os
+import re
+import tempfile
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.utils.timezone import now
+
+BLOB_DIR = 'blobs'
+CHUNK_SIZE = 64 * 1024
+
+
+def blob_name(digest, extension):
+    return f'{BLOB_DIR}/{digest[:2]}/{digest[2:4]}/{digest}{extension}'
+
+
+BLOB_RE = re.compile(rf'^{BLOB_DIR}/[0-9a-f]{{2}}/[0-9a-f]{{2}}/([0-9a-f]{{64}})(\.[^/]*)?$')
+
+
+def is_blob(name):
+    return bool(name) and name.startswith(f'{BLOB_DIR}/')
+
+
+def blob_digest(name):
+    """
+    The SHA-256 a blob name was derived from, or None for other names.
+    """
+    match = BLOB_RE.match(name or '')
+    return match.group(1) if match else None
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def release_on_commit(files):
+    """
+    Release stored files, given as (storage, name) pairs, once the current
+    transaction commits, so a rollback never drops a reference that is still used.
+    """
+    files = [(storage, name) for storage, name in files if name]
+    if files:
+        transaction.on_commit(lambda: [storage.delete(name) for storage, name in files])
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    FileSystemStorage that names files by their content and reference-counts them.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # The final name comes from the content in _save(); identical names are the point
+        return name
+
+    def _save(self, name, content):
+        extension = os.path.splitext(name)[1].lower()
+
+        if hasattr(content, 'temporary_file_path'):
+            # Large uploads are already on disk: hash in place, then rename instead of copying
+            source = content.temporary_file_path()
+            return self._place(source, file_sha256(source), os.path.getsize(source), extension, file_move_safe, owned=False)
+
+        source, digest, size = self._spool(content)
+        return self._place(source, digest, size, extension, os.replace, owned=True)
+
+    def adopt(self, path, extension, digest=None):
+        """
+        Move a finished file that already sits inside MEDIA_ROOT (e.g. an
+        assembled chunked upload) into the blob tree without copying it, and
+        take one reference. Returns the blob name.
+        """
+        digest = digest or file_sha256(path)
+        return self._place(path, digest, os.path.getsize(path), extension.lower(), os.replace, owned=True)
+
+    def _place(self, source, digest, size, extension, move, owned):
+        # `owned` sources are ours to remove; Django cleans up its own temporary uploads
+        name = blob_name(digest, extension)
+        path = self.path(name)
+        try:
+            if os.path.exists(path):
+                # Already stored: the upload only costs the reference below
+                if owned:
+                    os.remove(source)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                move(source, path)
+                if self.file_permissions_mode is not None:
+                    os.chmod(path, self.file_permissions_mode)
+        except BaseException:
+            if owned and os.path.exists(source):
+                os.remove(source)
+            raise
+
+        self.add_reference(name, size)
+        return name
+
+    def _spool(self, content):
+        # Hash while writing; the temporary file sits inside MEDIA_ROOT so the
+        # final rename never crosses filesystems
+        spool_dir = self.path('.tmp')
+        os.makedirs(spool_dir, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        fd, temp_path = tempfile.mkstemp(dir=spool_dir)
+        try:
+            with os.fdopen(fd, 'wb') as spool:
+                # Storage.save() has wrapped plain file objects in File, so chunks() exists
+                for chunk in content.chunks(CHUNK_SIZE):
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    digest.update(chunk)
+                    spool.write(chunk)
+                    size += len(chunk)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return temp_path, digest.hexdigest(), size
+
+    def add_reference(self, name, size=0, count=1):
+        # `count` > 1 when one stored file is handed to several rows at once
+        from .models import MediaBlob
+        MediaBlob.objects.bulk_create([MediaBlob(name=name, size=size)], ignore_conflicts=True)
+        MediaBlob.objects.filter(name=name).update(refcount=F('refcount') + count, updated_at=now())
+
+    def delete(self, name):
+        if not is_blob(name):
+            # Pre-existing per-upload file: nothing else can point at it
+            return super().delete(name)
+        from .models import MediaBlob
+        MediaBlob.objects.filter(name=name, refcount__gt=0).update(refcount=F('refcount') - 1, updated_at=now())
+
+    def collect(self, grace):
+        """
+        Remove blobs that have had no references for longer than `grace`
+        (a timedelta). Returns (files removed, bytes freed).
+        """
+        from .models import MediaBlob
+        removed, freed = 0, 0
+        candidates = MediaBlob.objects.filter(refcount=0, updated_at__lt=now() - grace).values_list('id', 'name', 'size')
+        for blob_id, name, size in candidates.iterator():
+            # Guarded delete: skip blobs that were referenced again meanwhile
+            if MediaBlob.objects.filter(id=blob_id, refcount=0).delete()[0]:
+                super().delete(name)
+                removed += 1
+                freed += size
+        return removed, freed
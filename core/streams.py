@@ -0,0 +1,364 @@
+# streams.py
+"""
+Server-Sent Events stream of new notifications.
+
+`NotificationStreamApp` is a plain ASGI app mounted at /notifications/stream/
+by project/asgi.py. Each connection subscribes to the in-process
+`NotificationBroker`. `core.notifications.send_notifications` publishes to it
+once the rows are committed, which reaches connections in the same process
+directly.
+
+Fan-out normally runs in the job worker (`manage.py run_jobs`), so it also
+signals through the cache: one key per recipient holds the id of their latest
+notification. In every ASGI process a single `CacheRelay` task reads the keys
+of the users connected to it every NOTIFICATION_STREAM_RELAY_INTERVAL seconds,
+with one get_many() for all connections, and wakes the connections whose key
+changed. Those then read the new rows from the database. Across processes this
+needs a shared cache (REDIS_URL, see project/settings.py). With the per-process
+default, only notifications written in the ASGI process itself (JOBS_EAGER) are
+pushed. The rest arrive with the fallback database poll every
+NOTIFICATION_STREAM_POLL_INTERVAL seconds, which also covers evicted keys.
+Clients resume from the `Last-Event-ID` header (or `?last_event_id=`) after a
+reconnect.
+
+Browsers cannot set headers on an EventSource, so the access token may also
+be passed as `?token=`.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken
+from .authentication import CachedJWTAuthentication
+
+SIGNAL_PREFIX = 'notification-stream:latest'
+SIGNAL_TIMEOUT = 5 * 60  # Seconds a signal stays readable; the relays see it much sooner
+WAKE = None  # Queued instead of an event: new rows are in the database
+
+
+class Subscription:
+    """
+    One connection's bounded buffer of pending notification payloads.
+    """
+
+    def __init__(self, user_id, loop, maxsize):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def offer(self, event):
+        # Runs on the connection's event loop. When the client cannot keep up the
+        # event is dropped and the connection catches up from the database instead.
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    def wake(self):
+        self.offer(WAKE)
+
+
+class NotificationBroker:
+    """
+    In-process pub/sub keyed by user ID. `publish` is thread-safe and may be
+    called from synchronous code running outside the subscribers' event loop.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+
+    def subscribe(self, user_id, maxsize):
+        subscription = Subscription(user_id, asyncio.get_running_loop(), maxsize)
+        with self._lock:
+            self._subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def subscribed_users(self, user_ids=None):
+        with self._lock:
+            if user_ids is None:
+                return set(self._subscriptions)
+            return {user_id for user_id in user_ids if user_id in self._subscriptions}
+
+    def publish(self, user_id, event):
+        self._deliver(user_id, 'offer', event)
+
+    def wake(self, user_id):
+        # The user has new rows in the database, written by another process
+        self._deliver(user_id, 'wake')
+
+    def _deliver(self, user_id, method, *args):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(getattr(subscription, method), *args)
+            except RuntimeError:
+                # The connection's loop has shut down; it will unsubscribe itself
+                pass
+
+
+def _signal_key(user_id):
+    return f'{SIGNAL_PREFIX}:{user_id}'
+
+
+class CacheRelay:
+    """
+    Reads the cache signals of every user subscribed to `broker` in this
+    process, and wakes their connections when a signal changes. Runs as one
+    task while any connection is open.
+    """
+
+    def __init__(self, broker):
+        self.broker = broker
+        self._lock = threading.Lock()
+        self._seen = {}  # user_id -> last signal value acted on
+        self._task = None
+
+    def ensure_running(self):
+        task = self._task
+        if task is None or task.done() or task.get_loop().is_closed():
+            with self._lock:
+                self._seen.clear()
+            self._task = asyncio.ensure_future(self.run())
+
+    def note(self, signals):
+        # Delivered in-process already; do not wake the connections again
+        with self._lock:
+            self._seen.update(signals)
+
+    async def run(self):
+        interval = getattr(settings, 'NOTIFICATION_STREAM_RELAY_INTERVAL', 0.5)
+        while True:
+            await asyncio.sleep(interval)
+            user_ids = self.broker.subscribed_users()
+            if not user_ids:
+                self._task = None
+                return
+            values = await sync_to_async(cache.get_many)([_signal_key(user_id) for user_id in user_ids])
+            with self._lock:
+                self._seen = {user_id: value for user_id, value in self._seen.items() if user_id in user_ids}
+                changed = []
+                for user_id in user_ids:
+                    value = values.get(_signal_key(user_id))
+                    if value is not None and value != self._seen.get(user_id):
+                        self._seen[user_id] = value
+                        changed.append(user_id)
+            for user_id in changed:
+                self.broker.wake(user_id)
+
+
+broker = NotificationBroker()
+relay = CacheRelay(broker)
+
+
+def publish_notifications(notifications):
+    """
+    Push freshly committed notifications to connected recipients: directly to
+    connections in this process, through the cache to the other processes.
+    """
+    from .serializers import NotificationSerializer
+    from .models import User
+
+    notifications = [n for n in notifications if n.pk is not None]
+    signals = {}
+    for notification in notifications:
+        signals[notification.user_id] = max(notification.pk, signals.get(notification.user_id, 0))
+    if signals:
+        cache.set_many({_signal_key(user_id): latest for user_id, latest in signals.items()}, SIGNAL_TIMEOUT)
+
+    listening = broker.subscribed_users(signals)
+    relay.note({user_id: signals[user_id] for user_id in listening})
+    notifications = [n for n in notifications if n.user_id in listening]
+    if not notifications:
+        return
+
+    creators = User.objects.in_bulk({n.created_by_id for n in notifications if n.created_by_id})
+    for notification in notifications:
+        notification.created_by = creators.get(notification.created_by_id)
+        broker.publish(notification.user_id, NotificationSerializer(notification).data)
+
+
+@sync_to_async
+def _authenticate(raw_token):
+    authentication = CachedJWTAuthentication()
+    try:
+        return authentication.get_user(authentication.get_validated_token(raw_token))
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+@sync_to_async
+def _latest_notification_id(user_id):
+    from .models import Notification
+    return Notification.objects.filter(user_id=user_id).order_by('-id').values_list('id', flat=True).first() or 0
+
+
+@sync_to_async
+def _notifications_after(user_id, last_id, limit):
+    from .models import Notification
+    from .serializers import NotificationSerializer
+    rows = Notification.objects.filter(user_id=user_id, id__gt=last_id).select_related('created_by').order_by('id')[:limit]
+    return NotificationSerializer(rows, many=True).data
+
+
+class NotificationStreamApp:
+    """
+    ASGI app streaming the authenticated user's new notifications as SSE events.
+    """
+    catch_up_batch = 100
+
+    def __init__(self):
+        self.heartbeat = getattr(settings, 'NOTIFICATION_STREAM_HEARTBEAT', 15)
+        self.poll_interval = getattr(settings, 'NOTIFICATION_STREAM_POLL_INTERVAL', 5)
+        self.buffer_size = getattr(settings, 'NOTIFICATION_STREAM_BUFFER', 100)
+
+    async def __call__(self, scope, receive, send):
+        if scope['method'] != 'GET':
+            return await self.reject(send, 405, "Method not allowed.")
+
+        headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+        query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+
+        user = await self.authenticate(headers, query)
+        if user is None:
+            return await self.reject(send, 401, "Authentication credentials were not provided or are invalid.")
+
+        last_id = self.last_event_id(headers, query)
+        subscription = broker.subscribe(user.id, self.buffer_size)
+        relay.ensure_running()
+        disconnect = asyncio.ensure_future(self.wait_for_disconnect(receive))
+        try:
+            # Subscribe first so nothing created in between is missed
+            if last_id is None:
+                last_id = await _latest_notification_id(user.id)
+
+            await send({
+                'type': 'http.response.start',
+                'status': 200,
+                'headers': self.response_headers(headers),
+            })
+            await self.write(send, "retry: 3000\n\n")
+            last_id = await self.catch_up(send, user.id, last_id)
+            await self.stream(send, subscription, disconnect, last_id)
+        except OSError:
+            pass
+        finally:
+            broker.unsubscribe(subscription)
+            disconnect.cancel()
+
+    async def stream(self, send, subscription, disconnect, last_id):
+        loop = asyncio.get_running_loop()
+        last_write = last_poll = loop.time()
+
+        while not disconnect.done():
+            get = asyncio.ensure_future(subscription.queue.get())
+            timeout = min(self.heartbeat, self.poll_interval)
+            done, _ = await asyncio.wait({get, disconnect}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if get not in done:
+                get.cancel()
+            if disconnect in done:
+                return
+
+            caught_up = last_id
+            if get in done:
+                events = [get.result()]
+                while not subscription.queue.empty():
+                    events.append(subscription.queue.get_nowait())
+                if subscription.overflowed or WAKE in events:
+                    # Too far behind, or rows written by another process: read them
+                    subscription.overflowed = False
+                    caught_up = await self.catch_up(send, subscription.user_id, last_id)
+                    last_poll = loop.time()
+                else:
+                    for event in events:
+                        if event['id'] > caught_up:
+                            await self.write_event(send, event)
+                            caught_up = event['id']
+            elif loop.time() - last_poll >= self.poll_interval:
+                # Fallback for signals that never arrived (per-process cache, eviction)
+                caught_up = await self.catch_up(send, subscription.user_id, last_id)
+                last_poll = loop.time()
+
+            if caught_up != last_id:
+                last_id = caught_up
+                last_write = loop.time()
+            elif loop.time() - last_write >= self.heartbeat:
+                await self.write(send, ": keep-alive\n\n")
+                last_write = loop.time()
+
+    async def catch_up(self, send, user_id, last_id):
+        while True:
+            events = await _notifications_after(user_id, last_id, self.catch_up_batch)
+            for event in events:
+                await self.write_event(send, event)
+                last_id = event['id']
+            if len(events) < self.catch_up_batch:
+                return last_id
+
+    async def write_event(self, send, event):
+        data = json.dumps(event, separators=(',', ':'))
+        await self.write(send, f"id: {event['id']}\nevent: notification\ndata: {data}\n\n")
+
+    async def write(self, send, text):
+        await send({'type': 'http.response.body', 'body': text.encode(), 'more_body': True})
+
+    async def wait_for_disconnect(self, receive):
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+
+    async def authenticate(self, headers, query):
+        raw_token = None
+        authorization = headers.get('authorization', '')
+        if authorization.startswith('Bearer '):
+            raw_token = authorization[len('Bearer '):].strip()
+        elif query.get('token'):
+            raw_token = query['token'][0]
+        if not raw_token:
+            return None
+        return await _authenticate(raw_token)
+
+    def last_event_id(self, headers, query):
+        value = headers.get('last-event-id') or (query.get('last_event_id') or [None])[0]
+        try:
+            return int(value) if value is not None else None
+        except ValueError:
+            return None
+
+    def response_headers(self, request_headers):
+        headers = [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),  # Stop nginx from buffering the stream
+        ]
+        origin = request_headers.get('origin')
+        if origin and (getattr(settings, 'CORS_ALLOW_ALL_ORIGINS', False) or origin in getattr(settings, 'CORS_ALLOWED_ORIGINS', [])):
+            headers.append((b'access-control-allow-origin', origin.encode('latin-1')))
+            headers.append((b'vary', b'Origin'))
+        return headers
+
+    async def reject(self, send, status_code, detail):
+        body = json.dumps({'detail': detail}).encode()
+        await send({
+            'type': 'http.response.start',
+            'status': status_code,
+            'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())],
+        })
+        await send({'type': 'http.response.body', 'body': body})
@@ -1,3 +1,1077 @@
-from django.test import TestCase
+import asyncio
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, transaction
+from django.db.utils import ConnectionHandler
+from django.db.migrations.executor import MigrationExecutor
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APITestCase, APITransactionTestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from project.database import database_config, replica_configs
+from .authentication import UserCache, user_cache
+from .counters import rebuild_ticket_stats, verify_ticket_stats
+from .images import generate_renditions
+from .jobs import backoff_delay, claim_next, enqueue, job, requeue_stale_jobs, run_job
+from .members import set_members
+from .models import Job, MediaBlob, Notification, Project, ProjectMember, ProjectTicketStats, Task, TaskImage, Upload, User
+from .notifications import notify, reconcile_unread_counters, send_notifications
+from .routing import PIN_COOKIE
+from .storage import blob_digest
+from .streams import NotificationBroker, NotificationStreamApp, publish_notifications
+
+
+class ProjectFixture:
+    """
+    An admin, a manager and a staff member, and two projects led by the manager,
+    each with the staff member and four tickets.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user('admin', 'admin@example.com', 'pw', full_name='Admin', role='Admin')
+        self.manager = User.objects.create_user('manager', 'manager@example.com', 'pw', full_name='Manager', role='Manager')
+        self.staff = User.objects.create_user('staff', 'staff@example.com', 'pw', full_name='Staff', role='Staff')
+        self.now = timezone.now()
+        self.projects = []
+        for number in range(2):
+            project = Project.objects.create(
+                title=f'Project {number}', description='', client_name='Client',
+                due_date=self.now + timedelta(days=30), start_date=self.now,
+                team_lead=self.manager, created_by=self.admin,
+            )
+            ProjectMember.objects.create(project=project, user=self.staff)
+            for status in ('pending', 'pending', 'in_review', 'approved'):
+                self.ticket(project, status=status)
+            self.projects.append(project)
+        rebuild_ticket_stats()
+
+    def ticket(self, project, user=None, **fields):
+        return Task.objects.create(
+            title='Ticket', description='', due_date=self.now + timedelta(days=1), start_date=self.now,
+            user=user or self.staff, assigned_by=self.manager, is_ticket=True, project=project, **fields,
+        )
+
+
+class TemporaryMediaRoot:
+    """
+    Stores each test's files in a temporary MEDIA_ROOT, removed afterwards.
+    """
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+
+class ProjectListTests(ProjectFixture, APITestCase):
+    def fetch(self, url):
+        cache.clear()  # Measure the database work, not the response cache
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return response.json()['data'], len(queries)
+
+    def test_queries_do_not_grow_with_projects(self):
+        self.client.force_authenticate(self.admin)
+        before = {url: self.fetch(url)[1] for url in ('/projects/', f'/projects/user/?user_id={self.staff.pk}')}
+        for number in range(5):
+            project = Project.objects.create(
+                title=f'More {number}', description='', client_name='Client', due_date=self.now, start_date=self.now,
+                team_lead=self.manager, created_by=self.admin,
+            )
+            ProjectMember.objects.create(project=project, user=self.staff)
+            self.ticket(project, status='approved')
+        for url, count in before.items():
+            projects, after = self.fetch(url)
+            self.assertEqual(len(projects), 7, url)
+            self.assertEqual(after, count, url)
+
+        projects, _ = self.fetch('/projects/')
+        self.assertEqual({project['title']: project['percentage'] for project in projects}['Project 0'], 50.0)
+
+
+class TaskListPayloadTests(ProjectFixture, APITestCase):
+    def test_lists_nest_summaries(self):
+        self.client.force_authenticate(self.staff)
+        with CaptureQueriesContext(connection) as queries:
+            tasks = self.client.get('/tasks/pending/').json()['data']
+        self.assertEqual(len(tasks), 8)
+        self.assertEqual(set(tasks[0]['project']), {'id', 'title'})
+        self.assertEqual(set(tasks[0]['user']), {'id', 'username', 'full_name', 'avatar', 'avatar_thumbnail'})
+        # Summaries come from joins, not from a query per task
+        self.assertFalse(any('"core_projectmember"' in query['sql'] for query in queries))
+        for _ in range(10):
+            self.ticket(self.projects[1], user=self.staff)
+        with CaptureQueriesContext(connection) as more_queries:
+            self.assertEqual(len(self.client.get('/tasks/pending/').json()['data']), 18)
+        self.assertEqual(len(more_queries), len(queries))
+
+        tasks = self.client.get('/tasks/pending/', {'expand': 'project'}).json()['data']
+        self.assertIn('members', tasks[0]['project'])
+
+
+class SparseFieldsTests(ProjectFixture, APITestCase):
+    def test_only_requested_fields_are_loaded(self):
+        self.client.force_authenticate(self.staff)
+        with CaptureQueriesContext(connection) as queries:
+            tasks = self.client.get('/tasks/pending/', {'fields': 'id,title'}).json()['data']
+        self.assertEqual([set(task) for task in tasks], [{'id', 'title'}] * 8)
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertNotIn('"core_task"."description"', sql)
+        self.assertNotIn('"core_taskimage"', sql)
+
+        self.client.force_authenticate(self.admin)
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            projects = self.client.get('/projects/', {'fields': 'id,title,percentage'}).json()['data']
+        self.assertEqual({project['title']: project['percentage'] for project in projects}, {'Project 0': 50.0, 'Project 1': 50.0})
+        self.assertFalse(any('"core_projectmember"' in query['sql'] for query in queries))
+
+
+class ProjectCacheTests(ProjectFixture, APITestCase):
+    def fetch(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return response.json()['data'], len(queries)
+
+    def test_hits_until_a_change_commits(self):
+        self.client.force_authenticate(self.staff)
+        url = f'/projects/{self.projects[0].pk}/'
+        for path in ('/projects/', url):
+            built, queries = self.fetch(path)
+            cached, cached_queries = self.fetch(path)
+            self.assertEqual(cached, built)
+            self.assertLess(cached_queries, queries)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            project = self.projects[0]
+            project.title = 'Renamed'
+            project.save()
+        self.assertIn('Renamed', [project['title'] for project in self.fetch('/projects/')[0]])
+        self.assertEqual(self.fetch(url)[0]['title'], 'Renamed')
+
+        # A new member sees the project at once
+        other = User.objects.create_user('other', 'other@example.com', 'pw', full_name='Other')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.fetch('/projects/')[0], [])
+        with self.captureOnCommitCallbacks(execute=True):
+            set_members(self.projects[1], self.manager, add=[other.pk])
+        self.assertEqual([project['id'] for project in self.fetch('/projects/')[0]], [self.projects[1].pk])
+
+
+class TicketStatsTests(ProjectFixture, APITestCase):
+    def test_counters_follow_ticket_writes(self):
+        self.client.force_authenticate(self.manager)
+        response = self.client.post('/create-ticket/', {
+            'title': 'Ticket', 'description': 'Details', 'due_date': '2030-01-01T00:00:00Z',
+            'user': self.staff.pk, 'project': self.projects[0].pk,
+        })
+        self.assertEqual(response.status_code, 201, response.content)
+        self.client.force_authenticate(self.staff)
+        response = self.client.post(f"/tickets/{response.json()['data']['id']}/change-status/", {'status': 'in_review'})
+        self.assertEqual(response.status_code, 200, response.content)
+        stats = ProjectTicketStats.objects.get(project=self.projects[0])
+        self.assertEqual((stats.total, stats.pending, stats.in_review, stats.approved), (5, 2, 2, 1))
+        self.assertEqual(verify_ticket_stats(), [])
+
+    def test_user_delete_decrements_once_per_project(self):
+        other = User.objects.create_user('other', 'other@example.com', 'pw', full_name='Other')
+        Task.objects.bulk_create([
+            Task(title='Ticket', description='', due_date=self.now, user=other, assigned_by=self.manager,
+                 is_ticket=True, project=project, status='in_review')
+            for project in self.projects for _ in range(50)
+        ])
+        rebuild_ticket_stats()
+        with CaptureQueriesContext(connection) as queries:
+            other.delete()
+        stats_updates = [query for query in queries if query['sql'].startswith('UPDATE "core_projectticketstats"')]
+        self.assertEqual(len(stats_updates), 2)
+        self.assertEqual(verify_ticket_stats(), [])
+
+    def test_project_delete_skips_its_own_counters(self):
+        Task.objects.bulk_create([
+            Task(title='Ticket', description='', due_date=self.now, user=self.staff, assigned_by=self.manager,
+                 is_ticket=True, project=self.projects[0])
+            for _ in range(200)
+        ])
+        rebuild_ticket_stats()
+        with CaptureQueriesContext(connection) as queries:
+            Project.objects.filter(pk=self.projects[0].pk).delete()
+        self.assertLess(len(queries), 30)
+        self.assertFalse(any(query['sql'].startswith('UPDATE') for query in queries))
+        self.assertEqual(verify_ticket_stats(), [])
+
+    def test_orm_writes_are_counted(self):
+        ticket = self.ticket(self.projects[0])
+        self.assertEqual(verify_ticket_stats(), [])
+        ticket.status = 'in_review'
+        ticket.save()
+        self.assertEqual(verify_ticket_stats(), [])
+        ticket.project = self.projects[1]
+        ticket.save(update_fields=['project'])
+        self.assertEqual(verify_ticket_stats(), [])
+        ticket.is_ticket = False
+        ticket.save()
+        self.assertEqual(verify_ticket_stats(), [])
+        Task.objects.filter(pk=ticket.pk).update(is_ticket=True)
+        rebuild_ticket_stats()
+        ticket.delete()
+        self.assertEqual(verify_ticket_stats(), [])
+
+    def test_drifted_counters_stop_at_zero(self):
+        ProjectTicketStats.objects.update(total=0, pending=0, in_review=0, approved=0)
+        self.client.force_authenticate(self.manager)
+        in_review = list(Task.objects.filter(status='in_review').values_list('id', flat=True))
+        response = self.client.post(f'/tickets/{in_review[0]}/change-status/', {'status': 'approved'})
+        self.assertEqual(response.status_code, 200, response.content)
+        response = self.client.post('/tickets/change-status/', {'task_ids': in_review[1:], 'status': 'approved'}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.staff.delete()
+        self.assertFalse(ProjectTicketStats.objects.filter(total__gt=0).exists())
+        rebuild_ticket_stats()
+        self.assertEqual(verify_ticket_stats(), [])
+
+    def test_drift_is_detected_and_rebuilt(self):
+        ProjectTicketStats.objects.filter(project=self.projects[0]).update(total=99)
+        self.assertEqual([project_id for project_id, _, _ in verify_ticket_stats()], [self.projects[0].pk])
+        rebuild_ticket_stats()
+        self.assertEqual(verify_ticket_stats(), [])
+
+
+class SetMembersTests(ProjectFixture, APITestCase):
+    def test_replace_invalidates_once(self):
+        project = self.projects[0]
+        others = [
+            User.objects.create_user(f'user{number}', f'user{number}@example.com', 'pw', full_name='User').pk
+            for number in range(20)
+        ]
+        set_members(project, self.manager, add=others)
+        self.assertEqual(set(ProjectMember.objects.filter(user_id__in=others).values_list('role', flat=True)), {'staff'})
+
+        updated_at = Project.objects.values_list('updated_at', flat=True).get(pk=project.pk)
+        with CaptureQueriesContext(connection) as queries:
+            result = set_members(project, self.manager, replace=[self.staff.pk])
+        self.assertEqual(sorted(result['removed']), sorted(others))
+        self.assertEqual(list(ProjectMember.objects.filter(project=project).values_list('user_id', flat=True)), [self.staff.pk])
+        touches = [query for query in queries if query['sql'].startswith('UPDATE "core_project"')]
+        self.assertEqual(len(touches), 1)
+        self.assertGreater(Project.objects.values_list('updated_at', flat=True).get(pk=project.pk), updated_at)
+
+    def test_queryset_delete_invalidates_once(self):
+        self.client.force_authenticate(self.staff)
+        self.assertEqual(len(self.client.get('/projects/').json()['data']), 2)
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as queries:
+            ProjectMember.objects.filter(user=self.staff).delete()
+        touches = [query for query in queries if query['sql'].startswith('UPDATE "core_project"')]
+        self.assertEqual(len(touches), 1)
+        # The removed member's cached list no longer shows the projects
+        self.assertEqual(self.client.get('/projects/').json()['data'], [])
+
+
+class AssignTaskTests(TemporaryMediaRoot, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.manager = User.objects.create_user('manager', 'manager@example.com', 'pw', full_name='Manager', role='Manager')
+        self.client.force_authenticate(self.manager)
+        self.task = {'title': 'Task', 'description': 'Details', 'due_date': '2030-01-01', 'start_date': '2029-12-01', 'priority': 'high'}
+
+    def staff(self, count, department='Web Development'):
+        return [
+            User.objects.create_user(f'{department}-{number}', f'{department}-{number}@example.com'.replace(' ', ''), 'pw', full_name='Staff', department=department)
+            for number in range(count)
+        ]
+
+    def assign(self, **fields):
+        image = BytesIO()
+        Image.new('RGB', (32, 32), 'teal').save(image, 'PNG')
+        upload = SimpleUploadedFile('photo.png', image.getvalue(), content_type='image/png')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/tasks/assign/', {**self.task, 'images': [upload], **fields})
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json(), len(queries)
+
+    def test_queries_do_not_grow_with_assignees(self):
+        self.staff(3)
+        _, few = self.assign(departments=['Web Development'])
+        self.staff(30, department='Videography')
+        body, many = self.assign(departments=['Videography'])
+        self.assertEqual(few, many)
+        self.assertEqual(body['created'], 30)
+
+        # One stored file and one renditions job per image, however many tasks share it
+        tasks = Task.objects.filter(user__department='Videography')
+        self.assertEqual(Notification.objects.filter(task__in=tasks).count(), 30)
+        name = TaskImage.objects.filter(task__in=tasks).values_list('image', flat=True).distinct().get()
+        self.assertEqual(MediaBlob.objects.get(name=name).refcount, 3 + 30)  # Both requests sent the same image
+        self.assertEqual(Job.objects.filter(name='images.share_renditions').count(), 2)
+
+    def test_results_per_assignee(self):
+        active, inactive = self.staff(2)
+        inactive.is_active = False
+        inactive.save()
+        body, _ = self.assign(assignees=[active.id, inactive.id, 999999])
+        self.assertEqual((body['created'], body['failed']), (1, 2))
+        self.assertEqual(
+            [(result['user'], result['status']) for result in body['results']],
+            [(active.id, 'created'), (inactive.id, 'error'), (999999, 'error')],
+        )
+        self.assertTrue(Task.objects.filter(pk=body['results'][0]['task'], user=active, assigned_by=self.manager).exists())
+
+    def test_nothing_is_written_for_an_invalid_request(self):
+        response = self.client.post('/tasks/assign/', self.task)
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/tasks/assign/', {**self.task, 'assignees': [999999]})
+        self.assertEqual(response.status_code, 400)
+        self.client.force_authenticate(self.staff(1)[0])
+        response = self.client.post('/tasks/assign/', {**self.task, 'roles': ['Staff']})
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Task.objects.exists())
+
+
+class TicketTransitionTests(ProjectFixture, APITestCase):
+    def test_bulk_move_reports_stale_and_missing_tickets(self):
+        in_review = list(Task.objects.filter(status='in_review').values_list('id', flat=True))
+        pending = Task.objects.filter(status='pending').first()
+        self.client.force_authenticate(self.manager)
+        response = self.client.post('/tickets/change-status/', {
+            'task_ids': [*in_review, pending.pk, 99999], 'status': 'approved',
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['moved'], in_review)
+        self.assertEqual(response.json()['stale'], [{'id': pending.pk, 'status': 'pending'}])
+        self.assertEqual(response.json()['not_found'], [99999])
+        self.assertEqual(Task.objects.filter(id__in=in_review, status='approved', approved_date__isnull=False).count(), 2)
+        self.assertEqual(verify_ticket_stats(), [])
+
+        # A second reviewer approving the same tickets moves nothing
+        response = self.client.post('/tickets/change-status/', {'task_ids': in_review, 'status': 'approved'}, format='json')
+        self.assertEqual(response.json()['moved'], [])
+        self.assertEqual([ticket['status'] for ticket in response.json()['stale']], ['approved', 'approved'])
+        self.assertEqual(verify_ticket_stats(), [])
+
+    def test_task_ids_must_be_a_short_list(self):
+        ticket = Task.objects.filter(status='in_review').first()
+        self.client.force_authenticate(self.manager)
+        for task_ids in (str(ticket.pk), [], list(range(1, 502)), ['x']):
+            response = self.client.post('/tickets/change-status/', {'task_ids': task_ids, 'status': 'approved'}, format='json')
+            self.assertEqual(response.status_code, 400, task_ids)
+        self.assertEqual(Task.objects.get(pk=ticket.pk).status, 'in_review')
+
+    def test_tasks_are_not_moved_as_tickets(self):
+        task = Task.objects.create(title='Task', description='', due_date=self.now, user=self.staff, assigned_by=self.manager)
+        self.client.force_authenticate(self.staff)
+        self.assertEqual(self.client.post(f'/tickets/{task.pk}/change-status/', {'status': 'in_review'}).status_code, 404)
+
+    def test_only_own_tickets_are_submitted_for_review(self):
+        ticket = Task.objects.filter(status='pending').first()
+        self.client.force_authenticate(self.manager)
+        response = self.client.post('/tickets/change-status/', {'task_ids': [ticket.pk], 'status': 'in_review'}, format='json')
+        self.assertEqual(response.json()['not_found'], [ticket.pk])
+        self.client.force_authenticate(self.staff)
+        response = self.client.post(f'/tickets/{ticket.pk}/change-status/', {'status': 'in_review'})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertIsNotNone(Task.objects.get(pk=ticket.pk).review_date)
+        self.assertEqual(verify_ticket_stats(), [])
+
+
+class NotificationFeedTests(ProjectFixture, APITestCase):
+    def pages(self, page_size, between=lambda: None):
+        """
+        Follow the `next` cursors to the end and return the ids in feed order,
+        calling `between` after every page but the last.
+        """
+        ids, cursor = [], None
+        while True:
+            response = self.client.get('/notifications/', {'page_size': page_size, **({'cursor': cursor} if cursor else {})})
+            self.assertEqual(response.status_code, 200, response.content)
+            ids.extend(notification['id'] for notification in response.json()['data'])
+            cursor = response.json()['next']
+            if cursor is None:
+                return ids
+            between()
+
+    def test_cursor_walks_rows_that_share_a_timestamp(self):
+        Notification.objects.bulk_create([Notification(user=self.staff, message='Hello', type='task') for _ in range(25)])
+        Notification.objects.filter(user=self.staff).update(created_at=self.now)
+        expected = list(Notification.objects.filter(user=self.staff).order_by('-created_at', '-id').values_list('id', flat=True))
+        self.client.force_authenticate(self.staff)
+        # New notifications arriving meanwhile do not shift the pages still to come
+        arrive = lambda: Notification.objects.create(user=self.staff, message='New', type='task')
+        self.assertEqual(self.pages(10, between=arrive), expected)
+        self.assertEqual(self.client.get('/notifications/', {'cursor': 'not-a-cursor'}).status_code, 400)
+
+
+class ProjectBoardTests(ProjectFixture, APITestCase):
+    def setUp(self):
+        super().setUp()
+        project = self.projects[0]
+        for _ in range(5):
+            self.ticket(project)
+        self.url = f'/projects/{project.pk}/board/'
+        self.client.force_authenticate(self.manager)
+
+    def test_columns_page_with_full_counts(self):
+        board = self.client.get(self.url, {'page_size': 3}).json()['data']
+        self.assertEqual({name: column['count'] for name, column in board.items()}, {'pending': 7, 'in_review': 1, 'approved': 1})
+        ids = [ticket['id'] for ticket in board['pending']['data']]
+        cursor = board['pending']['next']
+        while cursor:
+            page = self.client.get(self.url, {'column': 'pending', 'cursor': cursor, 'page_size': 3}).json()
+            ids += [ticket['id'] for ticket in page['data']]
+            cursor = page['next']
+        self.assertEqual(sorted(ids), sorted(Task.objects.filter(project=self.projects[0], status='pending').values_list('id', flat=True)))
+        self.assertEqual(len(ids), len(set(ids)))
+
+    def test_counts_without_a_counter_row(self):
+        ProjectTicketStats.objects.filter(project=self.projects[0]).delete()
+        board = self.client.get(self.url, {'page_size': 3}).json()['data']
+        self.assertEqual(board['pending']['count'], 7)
+        self.assertEqual(self.client.get(self.url, {'column': 'done'}).status_code, 400)
+
+
+class ChunkedUploadTests(TemporaryMediaRoot, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('staff', 'staff@example.com', 'pw', full_name='Staff')
+        self.client.force_authenticate(self.user)
+        image = BytesIO()
+        Image.new('RGB', (64, 64), 'teal').save(image, 'PNG')
+        self.data = image.getvalue()
+
+    def start(self, sha256=''):
+        response = self.client.post('/uploads/', {'filename': 'photo.png', 'size': len(self.data), 'sha256': sha256})
+        self.assertEqual(response.status_code, 201, response.content)
+        return f"/uploads/{response.json()['id']}/"
+
+    def put(self, url, offset, data):
+        return self.client.put(f'{url}chunk/', data, content_type='application/octet-stream', HTTP_UPLOAD_OFFSET=str(offset))
+
+    def test_resume_from_the_stored_offset(self):
+        url = self.start(hashlib.sha256(self.data).hexdigest())
+        half = len(self.data) // 2
+        self.assertEqual(self.put(url, 0, self.data[:half])['Upload-Offset'], str(half))
+        # A retried chunk at a stale offset is refused with the offset to resume from
+        response = self.put(url, 0, self.data[:half])
+        self.assertEqual((response.status_code, response.json()['offset']), (409, half))
+        self.assertEqual(self.client.get(url).json()['offset'], half)
+        self.assertEqual(self.put(url, half, self.data[half:]).json()['offset'], len(self.data))
+
+        response = self.client.post(f'{url}complete/')
+        self.assertEqual(response.status_code, 200, response.content)
+        upload = Upload.objects.get(user=self.user)
+        self.assertEqual(upload.status, 'complete')
+        with default_storage.open(upload.name) as stored:
+            self.assertEqual(stored.read(), self.data)
+
+    def test_an_upload_is_attached_once(self):
+        url = self.start(hashlib.sha256(self.data).hexdigest())
+        self.put(url, 0, self.data)
+        upload_id = self.client.post(f'{url}complete/').json()['id']
+        task = {'title': 'Task', 'description': 'Details', 'due_date': '2030-01-01', 'priority': 'high'}
+        response = self.client.post('/tasks/create/me/', {**task, 'upload_ids': [upload_id, upload_id]})
+        self.assertEqual(response.status_code, 400, response.content)
+        self.assertFalse(Task.objects.exists())
+        response = self.client.post('/tasks/create/me/', {**task, 'upload_ids': [upload_id]})
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(Task.objects.get().images.count(), 1)
+
+    def test_checksum_mismatch_resets_the_upload(self):
+        url = self.start('0' * 64)
+        self.put(url, 0, self.data)
+        response = self.client.post(f'{url}complete/')
+        self.assertEqual((response.status_code, response.json()['offset']), (422, 0))
+        self.assertEqual(self.client.get(url).json()['offset'], 0)
+
+        self.put(url, 0, self.data)
+        response = self.client.post(f'{url}complete/', {'sha256': hashlib.sha256(self.data).hexdigest()})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['sha256'], hashlib.sha256(self.data).hexdigest())
+
+
+@job('tests.flaky')
+def flaky_job(payload):
+    # Fails its first `fail` attempts
+    if Job.objects.filter(name='tests.flaky', attempts__lte=payload['fail']).exists():
+        raise RuntimeError("Flaky failure")
+
+
+@override_settings(JOBS_EAGER=False, JOBS_BACKOFF_BASE=5, JOBS_BACKOFF_MAX=60)
+class JobQueueTests(TestCase):
+    def due(self):
+        Job.objects.update(run_after=timezone.now())
+
+    def test_a_job_is_claimed_once(self):
+        queued = enqueue('tests.flaky', {'fail': 0})
+        claimed = claim_next('worker-1')
+        self.assertEqual((claimed.pk, claimed.status, claimed.attempts, claimed.locked_by), (queued.pk, 'running', 1, 'worker-1'))
+        self.assertIsNone(claim_next('worker-2'))
+        self.assertEqual(run_job(claimed), 'done')
+        self.assertEqual(Job.objects.get().locked_by, '')
+
+    def test_failures_retry_with_backoff(self):
+        enqueue('tests.flaky', {'fail': 2}, max_attempts=3)
+        for attempt in (1, 2):
+            started = timezone.now()
+            self.assertEqual(run_job(claim_next('worker')), 'queued')
+            failed = Job.objects.get()
+            self.assertIn('Flaky failure', failed.last_error)
+            # 5s, then 10s, with 20% jitter; not claimable before then
+            delay = (failed.run_after - started).total_seconds()
+            self.assertTrue(4 * attempt <= delay <= 6 * attempt + 1, delay)
+            self.assertIsNone(claim_next('worker'))
+            self.due()
+        self.assertEqual(run_job(claim_next('worker')), 'done')
+        self.assertEqual(Job.objects.get().attempts, 3)
+
+    def test_attempts_run_out(self):
+        enqueue('tests.flaky', {'fail': 5}, max_attempts=2)
+        self.assertEqual(run_job(claim_next('worker')), 'queued')
+        self.due()
+        self.assertEqual(run_job(claim_next('worker')), 'failed')
+        self.assertIsNone(claim_next('worker'))
+
+    def test_stale_jobs_are_requeued_and_delays_capped(self):
+        enqueue('tests.flaky', {'fail': 0})
+        claim_next('worker')
+        Job.objects.update(locked_at=timezone.now() - timedelta(minutes=10))
+        self.assertEqual(requeue_stale_jobs(timedelta(minutes=5)), 1)
+        self.assertEqual(claim_next('worker').attempts, 2)
+        self.assertLessEqual(backoff_delay(20).total_seconds(), 72)
+
+
+class NotificationFanOutTests(ProjectFixture, TestCase):
+    def test_fan_out_is_one_insert(self):
+        User.objects.bulk_create([
+            User(username=f'manager{number}', email=f'manager{number}@example.com', full_name='Manager', role='Manager')
+            for number in range(20)
+        ])
+        with CaptureQueriesContext(connection) as queued:
+            notify('Ready for review', 'task', users=[self.staff], roles=['Manager', 'Admin'], created_by=self.staff)
+        self.assertEqual(len(queued), 1)  # The request only inserts the job
+
+        fan_out = claim_next('test')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(run_job(fan_out), 'done')
+        inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "core_notification" ')]
+        self.assertEqual(len(inserts), 1)
+        # 21 managers, the admin and the staff member, each once
+        recipients = Notification.objects.filter(message='Ready for review').values_list('user_id', flat=True)
+        self.assertEqual(len(recipients), 23)
+        self.assertEqual(len(set(recipients)), 23)
+        self.assertEqual(reconcile_unread_counters(), {})
+
+
+class UnreadCounterTests(ProjectFixture, APITestCase):
+    def notifications(self, user, count, **fields):
+        Notification.objects.bulk_create([Notification(user=user, message='Hello', type='task', **fields) for _ in range(count)])
+
+    def test_user_delete_updates_counters_in_bulk(self):
+        other = User.objects.create_user('other', 'other@example.com', 'pw', full_name='Other')
+        self.notifications(other, 500)
+        self.notifications(self.staff, 30, created_by=other)
+        self.notifications(self.admin, 7, task=Task.objects.filter(user=self.staff).first())
+        reconcile_unread_counters()
+        with CaptureQueriesContext(connection) as queries:
+            other.delete()
+        counter_updates = [query for query in queries if query['sql'].startswith('UPDATE "core_notificationcounter"')]
+        self.assertEqual(len(counter_updates), 1)
+        self.assertEqual(reconcile_unread_counters(), {})
+
+        Project.objects.filter(pk=self.projects[0].pk).delete()
+        self.staff.delete()
+        self.assertEqual(reconcile_unread_counters(), {})
+
+    def test_direct_deletes_update_counters(self):
+        self.notifications(self.admin, 5)
+        reconcile_unread_counters()
+        Notification.objects.filter(user=self.admin).first().delete()
+        self.assertEqual(reconcile_unread_counters(), {})
+        Notification.objects.filter(user=self.admin).delete()
+        self.assertEqual(reconcile_unread_counters(), {})
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.get('/notifications/unread/').json()['unread_count'], 0)
+
+
+class ConditionalGetTests(ProjectFixture, APITestCase):
+    def test_task_list_revalidates(self):
+        assigner = User.objects.create_user('assigner', 'assigner@example.com', 'pw', full_name='Assigner', role='Manager')
+        Task.objects.create(title='Task', description='', due_date=self.now, start_date=self.now, user=self.staff, assigned_by=assigner)
+        self.client.force_authenticate(self.staff)
+        response = self.client.get('/tasks/pending/')
+        etag = response['ETag']
+        self.assertEqual(self.client.get('/tasks/pending/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # The list nests the assigner, so renaming them makes it stale
+        self.client.force_authenticate(assigner)
+        response = self.client.put('/profile/edit/', {
+            'full_name': 'Renamed', 'email': 'assigner@example.com', 'phone_number': '0123456789',
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.client.force_authenticate(self.staff)
+        response = self.client.get('/tasks/pending/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Renamed', response.content.decode())
+
+
+    def test_feed_pages_validate_their_own_rows(self):
+        Notification.objects.bulk_create([Notification(user=self.staff, message='Hello', type='task') for _ in range(30)])
+        self.client.force_authenticate(self.staff)
+        first = self.client.get('/notifications/', {'page_size': 10})
+        second = self.client.get('/notifications/', {'page_size': 10, 'cursor': first.json()['next']})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/notifications/', {'page_size': 10}, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        # The tag aggregates over the page's ids, not over every notification of the user
+        aggregate = next(query['sql'] for query in queries if 'COUNT(' in query['sql'])
+        self.assertIn('"core_notification"."id" IN (', aggregate)
+        Notification.objects.bulk_create([Notification(user=self.staff, message='Hello', type='task') for _ in range(10)])
+
+        # New notifications change the first page, not the ones behind a cursor
+        self.assertEqual(self.client.get('/notifications/', {'page_size': 10}, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
+        response = self.client.get('/notifications/', {'page_size': 10, 'cursor': first.json()['next']}, HTTP_IF_NONE_MATCH=second['ETag'])
+        self.assertEqual(response.status_code, 304)
+        # Reading a notification on a page does
+        Notification.objects.filter(pk=second.json()['data'][0]['id']).update(read_status=True, updated_at=timezone.now())
+        response = self.client.get('/notifications/', {'page_size': 10, 'cursor': first.json()['next']}, HTTP_IF_NONE_MATCH=second['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_board_revalidates(self):
+        self.client.force_authenticate(self.manager)
+        url = f'/projects/{self.projects[0].pk}/board/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        ticket = Task.objects.filter(project=self.projects[0], status='approved').get()
+        ticket.title = 'Renamed'
+        ticket.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class DateFilterTests(ProjectFixture, APITestCase):
+    def test_last_representable_day(self):
+        self.client.force_authenticate(self.staff)
+        for url in ('/tasks/date/31-12-9999/', '/tasks/date-range/01-01-2024/31-12-9999/'):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+        self.assertEqual(self.client.get('/tasks/date/31-12-10000/').status_code, 400)
+
+
+class MonthCalendarTests(ProjectFixture, APITestCase):
+    def test_counts_and_bounds(self):
+        self.client.force_authenticate(self.staff)
+        today = timezone.localdate()
+        response = self.client.get(f'/tasks/calendar/{today.year}/{today.month}/')
+        self.assertEqual(response.status_code, 200)
+        day = next(day for day in response.json()['data']['days'] if day['date'] == today.isoformat())
+        self.assertEqual(day['active'], 8)
+
+        self.assertEqual(self.client.get('/tasks/calendar/9999/12/').status_code, 200)
+        for year, month in ((2024, 13), (10000, 1), (0, 1)):
+            self.assertEqual(self.client.get(f'/tasks/calendar/{year}/{month}/').status_code, 400)
+
+
+class NotificationBrokerTests(TestCase):
+    def test_publish_from_another_thread(self):
+        broker = NotificationBroker()
+
+        async def run():
+            subscription = broker.subscribe(7, maxsize=1)
+            self.assertEqual(broker.subscribed_users({7, 8}), {7})
+            publisher = threading.Thread(target=lambda: [broker.publish(7, {'id': n}) for n in (1, 2)])
+            publisher.start()
+            await sync_to_async(publisher.join)()
+            event = await asyncio.wait_for(subscription.queue.get(), 1)
+            broker.unsubscribe(subscription)
+            return event, subscription.overflowed
+
+        event, overflowed = async_to_sync(run)()
+        self.assertEqual(event, {'id': 1})
+        self.assertTrue(overflowed)  # The second event did not fit; the stream catches up from the database
+        self.assertEqual(broker.subscribed_users(), set())
+
+
+@override_settings(NOTIFICATION_STREAM_POLL_INTERVAL=60, NOTIFICATION_STREAM_RELAY_INTERVAL=0.05, NOTIFICATION_STREAM_HEARTBEAT=60)
+class NotificationStreamTests(ProjectFixture, TestCase):
+    def stream(self, write):
+        """
+        Open a stream as the staff member, call `write` once it is connected and
+        return the response body sent within half a second.
+        """
+        app, sent = NotificationStreamApp(), []
+        scope = {
+            'type': 'http', 'method': 'GET', 'path': '/notifications/stream/',
+            'query_string': f'token={AccessToken.for_user(self.staff)}'.encode(), 'headers': [],
+        }
+
+        async def run():
+            disconnected = asyncio.Event()
+
+            async def receive():
+                await disconnected.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                sent.append(message)
+
+            connection = asyncio.ensure_future(app(scope, receive, send))
+            await asyncio.sleep(0.1)
+            await sync_to_async(write)()
+            await asyncio.sleep(0.5)
+            disconnected.set()
+            await connection
+
+        async_to_sync(run)()
+        self.assertEqual(sent[0]['status'], 200)
+        return ''.join(message.get('body', b'').decode() for message in sent[1:])
+
+    def notification(self, message):
+        return Notification(user=self.staff, message=message, type='task')
+
+    def test_same_process_publish(self):
+        def write():
+            with self.captureOnCommitCallbacks(execute=True):
+                send_notifications([self.notification('Local')])
+
+        self.assertIn('"message":"Local"', self.stream(write))
+
+    def test_signal_from_another_process(self):
+        def write():
+            # What the job worker does: commit the rows, then signal through the shared cache
+            created = Notification.objects.bulk_create([self.notification('Remote')])
+            cache.set_many({f'notification-stream:latest:{self.staff.pk}': created[0].pk})
+
+        self.assertIn('"message":"Remote"', self.stream(write))
+
+    def test_publish_signals_through_the_cache(self):
+        notification = Notification.objects.create(user=self.staff, message='Hello', type='task')
+        publish_notifications([notification])
+        self.assertEqual(cache.get(f'notification-stream:latest:{self.staff.pk}'), notification.pk)
+
+
+class UserCacheTests(TemporaryMediaRoot, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('staff', 'staff@example.com', 'pw', full_name='Staff')
+        image = BytesIO()
+        Image.new('RGB', (600, 400), 'teal').save(image, 'PNG')
+        self.user.avatar = SimpleUploadedFile('me.png', image.getvalue(), content_type='image/png')
+        self.user.save()
+
+    def test_entries_hold_column_values(self):
+        cache = UserCache(ttl=30, maxsize=10)
+        cache.put(self.user)
+        first, second = cache.get(User, self.user.pk), cache.get(User, self.user.pk)
+        self.assertEqual(first.avatar.name, self.user.avatar.name)
+        self.assertIsNot(first.avatar, second.avatar)
+        self.assertIs(first.avatar.instance, first)
+
+    def test_rendition_save_forgets_the_user(self):
+        user_cache.put(self.user)
+        generate_renditions('core.User', self.user.pk)
+        self.assertIsNone(user_cache.get(User, self.user.pk))
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.avatar_thumbnail)
+
+
+class RenditionTests(TemporaryMediaRoot, ProjectFixture, TestCase):
+    def test_renditions_are_built_in_the_background(self):
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera maker'
+        image = BytesIO()
+        Image.new('RGB', (2000, 1000), 'teal').save(image, 'JPEG', exif=exif)
+        task = Task.objects.filter(user=self.staff).first()
+        with self.settings(JOBS_EAGER=False):
+            task_image = TaskImage.objects.create(task=task, image=SimpleUploadedFile('photo.jpg', image.getvalue()))
+        self.assertFalse(task_image.thumbnail)
+        self.assertEqual(list(Job.objects.values_list('name', flat=True)), ['images.renditions'])
+
+        self.assertEqual(run_job(claim_next('test')), 'done')
+        task_image.refresh_from_db()
+        for field, size in (('thumbnail', 256), ('preview', 1280)):
+            with getattr(task_image, field).open('rb') as stored, Image.open(stored) as rendition:
+                self.assertEqual(max(rendition.size), size)
+                self.assertEqual(dict(rendition.getexif()), {})
+        with task_image.image.open('rb') as stored, Image.open(stored) as original:
+            self.assertEqual(original.size, (2000, 1000))
+
+
+class BlobStorageTests(TemporaryMediaRoot, ProjectFixture, TestCase):
+    def attach(self, data):
+        task = Task.objects.filter(user=self.staff).first()
+        return TaskImage.objects.create(task=task, image=SimpleUploadedFile('photo.png', data))
+
+    def test_identical_files_are_stored_once(self):
+        image = BytesIO()
+        Image.new('RGB', (32, 32), 'teal').save(image, 'PNG')
+        first, second = self.attach(image.getvalue()), self.attach(image.getvalue())
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(blob_digest(first.image.name), hashlib.sha256(image.getvalue()).hexdigest())
+        blob = MediaBlob.objects.get(name=first.image.name)
+        self.assertEqual((blob.refcount, blob.size), (2, len(image.getvalue())))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(default_storage.collect(timedelta(0)), (0, 0))
+        self.assertTrue(default_storage.exists(second.image.name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        # Unreferenced blobs stay for the grace period
+        self.assertEqual(default_storage.collect(timedelta(hours=1)), (0, 0))
+        self.assertEqual(default_storage.collect(timedelta(0)), (1, len(image.getvalue())))
+        self.assertFalse(default_storage.exists(second.image.name))
+        self.assertFalse(MediaBlob.objects.exists())
+
+
+class MediaServingTests(TemporaryMediaRoot, TestCase):
+    DATA = b'0123456789abcdef'
+
+    def setUp(self):
+        super().setUp()
+        self.name = default_storage.save('notes.txt', ContentFile(self.DATA))
+        self.url = f'/media/{self.name}'
+
+    def test_blobs_are_served_as_immutable(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.DATA)
+        self.assertEqual(response['ETag'], f'"{hashlib.sha256(self.DATA).hexdigest()}"')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_byte_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/16')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(response.streaming_content), b'def')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=16-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */16')
+
+        # A range against an outdated copy gets the whole file
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_offload_to_the_proxy(self):
+        with self.settings(MEDIA_SERVE_OFFLOAD='x-accel-redirect'):
+            response = self.client.get(self.url, HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.name}')
+
+    def test_hidden_and_missing_files_are_not_served(self):
+        self.assertEqual(self.client.get('/media/.spool/abc').status_code, 404)
+        self.assertEqual(self.client.get('/media/../manage.py').status_code, 404)
+        self.assertEqual(self.client.get('/media/missing.txt').status_code, 404)
+
+
+class CodedChoiceTests(ProjectFixture, APITestCase):
+    def test_priority_sorts_by_meaning(self):
+        project = self.projects[0]
+        for priority in ('medium', 'high', 'low'):
+            self.ticket(project, priority=priority)
+        tickets = Task.objects.filter(project=project)
+        self.assertEqual(
+            list(tickets.order_by('-priority').values_list('priority', flat=True).distinct()),
+            ['high', 'medium', 'low'],
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT DISTINCT priority FROM core_task ORDER BY priority')
+            self.assertEqual([row[0] for row in cursor.fetchall()], [1, 2, 3])
+        with self.assertRaises(ValueError):
+            Task.objects.filter(priority='urgent').exists()
+
+    def test_the_api_keeps_string_values(self):
+        self.client.force_authenticate(self.admin)
+        ticket = self.ticket(self.projects[0], priority='high')
+        body = self.client.get(f'/tasks/{ticket.pk}/').json()
+        self.assertEqual((body['priority'], body['status']), ('high', 'pending'))
+
+    def test_ticket_lists_are_read_in_index_order(self):
+        tickets = Task.objects.filter(project=self.projects[0], is_ticket=True, status='pending').order_by('-priority', 'due_date', 'id')
+        plan = str(tickets.explain())
+        self.assertIn('core_task_board', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+
+class CodedChoiceMigrationTests(TransactionTestCase):
+    before = [('core', '0021_projectmember_unique')]
+    after = [('core', '0022_coded_priority_status')]
+
+    def setUp(self):
+        self.addCleanup(call_command, 'migrate', 'core', verbosity=0)
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        apps = executor.loader.project_state(self.before).apps
+        User, Task = apps.get_model('core', 'User'), apps.get_model('core', 'Task')
+        user = User.objects.create(username='staff', email='staff@example.com', full_name='Staff')
+        for priority, status in (('high', 'in_review'), ('low', 'approved'), ('medium', 'pending')):
+            Task.objects.create(title='Task', description='', due_date=timezone.now(), priority=priority, status=status, user=user, assigned_by=user)
+        self.executor = MigrationExecutor(connection)
+
+    def values(self, state):
+        Task = self.executor.loader.project_state(state).apps.get_model('core', 'Task')
+        return sorted(Task.objects.values_list('priority', 'status'))
+
+    def test_values_survive_both_directions(self):
+        expected = [('high', 'in_review'), ('low', 'approved'), ('medium', 'pending')]
+        self.executor.migrate(self.after)
+        self.assertEqual(self.values(self.after), expected)
+        self.executor = MigrationExecutor(connection)
+        self.executor.migrate(self.before)
+        self.assertEqual(self.values(self.before), expected)
+
+
+def database_settings(**environ):
+    with mock.patch.dict(os.environ, environ):
+        return database_config(Path('/srv/project'))
+
+
+class DatabaseConfigTests(SimpleTestCase):
+    def test_sqlite_defaults(self):
+        config = database_settings()
+        self.assertEqual(config['NAME'], Path('/srv/project/db.sqlite3'))
+        self.assertEqual((config['CONN_MAX_AGE'], config['CONN_HEALTH_CHECKS']), (60, True))
+        self.assertEqual(config['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+        for pragma in ('journal_mode = WAL', 'synchronous = NORMAL', 'busy_timeout = 5000'):
+            self.assertIn(pragma, config['OPTIONS']['init_command'])
+
+    def test_environment_overrides(self):
+        config = database_settings(DB_NAME='/tmp/other.sqlite3', DB_CONN_MAX_AGE='0', DB_CONN_HEALTH_CHECKS='no', SQLITE_SYNCHRONOUS='full')
+        self.assertEqual((config['NAME'], config['CONN_MAX_AGE'], config['CONN_HEALTH_CHECKS']), ('/tmp/other.sqlite3', 0, False))
+        self.assertIn('synchronous = FULL', config['OPTIONS']['init_command'])
+
+        config = database_settings(DB_ENGINE='postgres', DB_HOST='db', DB_NAME='')
+        self.assertEqual((config['ENGINE'], config['HOST']), ('django.db.backends.postgresql', 'db'))
+
+        for environ in ({'DB_CONN_MAX_AGE': 'forever'}, {'SQLITE_JOURNAL_MODE': 'wall'}, {'DB_ENGINE': 'oracle'}):
+            with self.assertRaises(ValueError):
+                database_settings(**environ)
+
+    def test_replicas_copy_the_primary(self):
+        primary = database_settings(DB_ENGINE='postgresql', DB_PORT='5432')
+        with mock.patch.dict(os.environ, {'DB_REPLICAS': 'replica-a, replica-b:6432,'}):
+            replicas = replica_configs(primary)
+        self.assertEqual(list(replicas), ['replica_1', 'replica_2'])
+        self.assertEqual([(config['HOST'], config['PORT']) for config in replicas.values()], [('replica-a', '5432'), ('replica-b', '6432')])
+        self.assertEqual(replicas['replica_1']['TEST'], {'MIRROR': 'default'})
+
+
+class SQLiteConnectionTests(TransactionTestCase):
+    def test_pragmas_are_applied_on_connect(self):
+        # A connection of its own to a file database; the test database is in memory, where WAL is unavailable
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        handler = ConnectionHandler({'default': database_settings(DB_NAME=os.path.join(directory, 'probe.sqlite3'))})
+        probe = handler['default']
+        self.addCleanup(probe.close)
+        with probe.cursor() as cursor:
+            values = []
+            for pragma in ('journal_mode', 'synchronous', 'busy_timeout'):
+                cursor.execute(f'PRAGMA {pragma}')
+                values.append(cursor.fetchone()[0])
+        self.assertEqual(values, ['wal', 1, 5000])  # synchronous=NORMAL reads back as 1
+
+    def test_maintenance_runs_outside_transactions(self):
+        out = StringIO()
+        call_command('db_maintenance', '--analyze', '--vacuum', '--checkpoint', stdout=out)
+        self.assertIn('ANALYZE done.', out.getvalue())
+        self.assertIn('VACUUM done.', out.getvalue())
+
+        with self.assertRaisesMessage(CommandError, 'inside a transaction'), transaction.atomic():
+            call_command('db_maintenance', stdout=StringIO())
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1'])
+class ReplicaRoutingTests(APITransactionTestCase):
+    """
+    The replica is a second SQLite file that only changes when sync_replicas
+    copies the primary into it, so a read that went to a stale replica shows up
+    as a missing row.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        # The alias only exists from here on, so the test runner must not see it in `databases`
+        cls.replica_dir = tempfile.mkdtemp()
+        connections.settings['replica_1'] = {
+            **connections['default'].settings_dict, 'NAME': os.path.join(cls.replica_dir, 'replica.sqlite3'),
+        }
+        cls.databases = {'default', 'replica_1'}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica_1'].close()
+        del connections['replica_1']
+        del connections.settings['replica_1']
+        shutil.rmtree(cls.replica_dir)
+
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+        self.user = User.objects.create_user('staff', 'staff@example.com', 'pw', full_name='Staff', role='Staff')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        self.sync()
+
+    def sync(self):
+        call_command('sync_replicas', stdout=StringIO())
+
+    def test_safe_methods_read_from_the_replica(self):
+        self.client.get('/tasks/pending/')  # Caches the user, which is always loaded from the primary
+        with CaptureQueriesContext(connection) as primary, CaptureQueriesContext(connections['replica_1']) as replica:
+            response = self.client.get('/tasks/pending/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(primary), 0)
+        self.assertGreater(len(replica), 0)
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_writes_pin_the_client_to_the_primary(self):
+        with CaptureQueriesContext(connections['replica_1']) as replica:
+            response = self.client.post('/tasks/create/me/', {
+                'title': 'Task', 'description': 'Details', 'due_date': '2030-01-01', 'priority': 'high',
+            })
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(len(replica), 0)
+        self.assertIn(PIN_COOKIE, response.cookies)
+        url = f"/tasks/{Task.objects.get(user=self.user).pk}/"
+
+        # The replica has not caught up; the cookie keeps the client on the primary
+        self.assertEqual(self.client.get(url).status_code, 200)
+        # Without the cookie the user is still pinned through the cache
+        self.client.cookies.clear()
+        self.assertEqual(self.client.get(url).status_code, 200)
+        # Once the window is over the client reads the stale replica, until it syncs
+        cache.clear()
+        user_cache.clear()
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.sync()
+        self.assertEqual(self.client.get(url).status_code, 200)
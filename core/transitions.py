@@ -0,0 +1,108 @@
+# transitions.py
+"""
+Ticket status transitions as guarded UPDATEs.
+
+Each transition is applied to any number of tickets with one
+`UPDATE ... WHERE status = <expected>`. A ticket that another reviewer moved
+first no longer matches, so it is reported as stale instead of being moved
+twice. The UPDATE stamps the moved rows with a unique `updated_at`, which finds
+them again without a second round of checks. `.update()` skips the model
+signals, so counters, project cache invalidation and notifications are
+applied here, in batches.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils.timezone import now
+from .caching import invalidate_projects
+from .conditional import touch_projects
+from .counters import tickets_moved
+from .models import Task
+from .notifications import notify_batch
+
+# target status -> (required current status, date field updates)
+TRANSITIONS = {
+    'in_review': ('pending', lambda at: {'review_date': at}),
+    'approved': ('in_review', lambda at: {'approved_date': at}),
+    'pending': ('in_review', lambda at: {'review_date': None}),
+}
+
+MAX_TICKETS = 500
+
+
+def _marker(tickets):
+    # Strictly later than any updated_at already on these rows, so only the rows
+    # this UPDATE touches can carry it
+    at = now()
+    latest = tickets.aggregate(latest=Max('updated_at'))['latest']
+    if latest is not None and latest >= at:
+        at = latest + timedelta(microseconds=1)
+    return at
+
+
+def _notifications(actor, target, tickets):
+    specs = []
+    for ticket in tickets:
+        link = dict(type='task', task=ticket['id'])  # Link the notification to the specific task
+        if target == 'in_review':
+            # Every manager and admin gets a task to review
+            specs.append(dict(
+                message=f"{ticket['user__username']} has been assigned a task to review.",
+                roles=['Manager', 'Admin'],
+                created_by=ticket['user_id'],
+                **link,
+            ))
+            continue
+        verb = 'approved' if target == 'approved' else 'rejected'
+        specs.append(dict(
+            message=f"{actor.username} has been {verb} your task",
+            users=[ticket['user_id']],
+            created_by=actor,
+            **link,
+        ))
+        specs.append(dict(
+            message=f"{actor.username} has been {verb} {ticket['user__username']}'s task",
+            roles=['Admin'],
+            created_by=actor,
+            **link,
+        ))
+    return specs
+
+
+def transition_tickets(actor, ticket_ids, target):
+    """
+    Move the given tickets to `target`. Submitting for review (to 'in_review')
+    only moves the actor's own tickets. Returns
+    {'moved': [ids], 'stale': [{'id', 'status'}], 'not_found': [ids]}.
+    """
+    if target not in TRANSITIONS:
+        raise ValueError(f"Unknown ticket status: {target!r}")
+    expected, dates = TRANSITIONS[target]
+    ticket_ids = list(dict.fromkeys(ticket_ids))
+
+    eligible = Task.objects.filter(id__in=ticket_ids, is_ticket=True)
+    if target == 'in_review':
+        eligible = eligible.filter(user=actor)
+
+    with transaction.atomic():
+        at = _marker(eligible)
+        eligible.filter(status=expected).update(status=target, updated_at=at, **dates(at))
+        rows = list(eligible.values('id', 'status', 'updated_at', 'project_id', 'user_id', 'user__username'))
+
+        moved = [row for row in rows if row['status'] == target and row['updated_at'] == at]
+        if moved:
+            tickets_moved(Counter(row['project_id'] for row in moved), expected, target)
+            project_ids = {row['project_id'] for row in moved}
+            touch_projects(project_ids)
+            invalidate_projects(project_ids)
+            notify_batch(_notifications(actor, target, moved))
+
+    moved_ids = {row['id'] for row in moved}
+    found = {row['id'] for row in rows}
+    return {
+        'moved': [ticket_id for ticket_id in ticket_ids if ticket_id in moved_ids],
+        'stale': [{'id': row['id'], 'status': row['status']} for row in rows if row['id'] not in moved_ids],
+        'not_found': [ticket_id for ticket_id in ticket_ids if ticket_id not in found],
+    }
@@ -0,0 +1,218 @@
+# uploads.py
+"""
+Chunked, resumable uploads.
+
+A client starts an upload with its filename, size and (optionally) SHA-256,
+then PUTs the bytes in chunks at explicit offsets. Each chunk is streamed from
+the request straight into the upload's part file inside MEDIA_ROOT, so the data
+is written once. After an interruption the client asks for the current
+offset and carries on from there. Completing the upload verifies the size and
+checksum and renames the part file into the content-addressed blob tree (see
+core/storage.py).
+
+A complete upload holds one reference to its blob. Attaching it to a task,
+project or avatar hands that reference to the model's file field, which only
+changes a column and never copies the file. Each user's unfinished uploads are
+limited to UPLOAD_USER_QUOTA bytes.
+"""
+import os
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.utils.timezone import now
+from PIL import Image
+from .models import Upload
+from .storage import CHUNK_SIZE, file_sha256
+
+ALLOWED_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp')
+UPLOAD_DIR = '.uploads'
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400, **extra):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.extra = extra
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def part_path(upload):
+    return default_storage.path(f'{UPLOAD_DIR}/{upload.pk}.part')
+
+
+def _remove_part(upload):
+    try:
+        os.remove(part_path(upload))
+    except FileNotFoundError:
+        pass
+
+
+def quota_used(user):
+    """
+    Bytes held by the user's uploads that are not attached or aborted yet.
+    """
+    held = Upload.objects.filter(user=user, status__in=['pending', 'complete']).aggregate(total=Sum('size'))
+    return held['total'] or 0
+
+
+def start_upload(user, filename, size, sha256=''):
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension not in ALLOWED_EXTENSIONS:
+        raise UploadError("File type not supported. Please upload a valid image file.")
+    if size <= 0:
+        raise UploadError("Size must be a positive number of bytes.")
+    if size > _setting('UPLOAD_MAX_SIZE', 50 * 1024 * 1024):
+        raise UploadError("File is too large.", status=413)
+    if sha256 and (len(sha256) != 64 or any(c not in '0123456789abcdef' for c in sha256.lower())):
+        raise UploadError("sha256 must be 64 hexadecimal characters.")
+
+    with transaction.atomic():
+        # Lock the user's row so concurrent starts cannot both squeeze under the quota
+        type(user)._default_manager.select_for_update().filter(pk=user.pk).first()
+        quota = _setting('UPLOAD_USER_QUOTA', 500 * 1024 * 1024)
+        if quota_used(user) + size > quota:
+            raise UploadError("Upload quota exceeded. Finish or cancel other uploads first.", status=413)
+        upload = Upload.objects.create(user=user, filename=os.path.basename(filename), size=size, sha256=(sha256 or '').lower())
+
+    os.makedirs(os.path.dirname(part_path(upload)), exist_ok=True)
+    open(part_path(upload), 'wb').close()
+    return upload
+
+
+def write_chunk(upload, offset, stream, length=None):
+    """
+    Write the chunk read from `stream` at `offset`, which must be the number of
+    bytes received so far. Returns the new offset.
+    """
+    if upload.status != 'pending':
+        raise UploadError("Upload is not accepting data.", status=409, offset=upload.received)
+    if offset != upload.received:
+        raise UploadError("Offset does not match the bytes received so far.", status=409, offset=upload.received)
+
+    limit = min(upload.size - offset, _setting('UPLOAD_MAX_CHUNK_SIZE', 16 * 1024 * 1024))
+    if length is not None and length > limit:
+        raise UploadError("Chunk is larger than allowed or runs past the declared size.", status=413, offset=offset)
+
+    written = 0
+    with open(part_path(upload), 'r+b') as part:
+        part.seek(offset)
+        while True:
+            chunk = stream.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            written += len(chunk)
+            if written > limit:
+                part.truncate(offset)
+                raise UploadError("Chunk is larger than allowed or runs past the declared size.", status=413, offset=offset)
+            part.write(chunk)
+
+    # Guarded on the offset: of two racing requests for the same chunk only one counts
+    if not Upload.objects.filter(pk=upload.pk, status='pending', received=offset).update(received=offset + written, updated_at=now()):
+        upload.refresh_from_db(fields=['received', 'status'])
+        raise UploadError("Another chunk was written at this offset.", status=409, offset=upload.received)
+    upload.received = offset + written
+    return upload.received
+
+
+def complete_upload(upload, sha256=''):
+    """
+    Verify the received file and move it into storage. A checksum mismatch
+    discards the data so the client can send it again from offset 0.
+    """
+    if upload.status == 'complete':
+        return upload
+    if upload.status != 'pending':
+        raise UploadError("Upload cannot be completed.", status=409)
+    if upload.received != upload.size:
+        raise UploadError("Upload is incomplete.", status=409, offset=upload.received)
+
+    expected = (sha256 or upload.sha256).lower()
+    if not expected:
+        raise UploadError("sha256 is required to complete the upload.")
+
+    path = part_path(upload)
+    digest = file_sha256(path)
+    if digest != expected:
+        with open(path, 'r+b') as part:
+            part.truncate(0)
+        Upload.objects.filter(pk=upload.pk).update(received=0, updated_at=now())
+        raise UploadError("Checksum mismatch; the upload was reset.", status=422, offset=0)
+
+    try:
+        with Image.open(path) as image:
+            image.verify()
+    except Exception:
+        _remove_part(upload)
+        Upload.objects.filter(pk=upload.pk).update(status='aborted', updated_at=now())
+        raise UploadError("Upload is not a valid image.")
+
+    name = default_storage.adopt(path, os.path.splitext(upload.filename)[1], digest)
+    if not Upload.objects.filter(pk=upload.pk, status='pending').update(status='complete', name=name, sha256=digest, updated_at=now()):
+        default_storage.delete(name)  # Completed concurrently; drop our extra reference
+        upload.refresh_from_db()
+        return upload
+    upload.status, upload.name, upload.sha256 = 'complete', name, digest
+    return upload
+
+
+def abort_upload(upload):
+    if upload.status == 'attached':
+        raise UploadError("Upload is already attached.", status=409)
+    if Upload.objects.filter(pk=upload.pk, status=upload.status).update(status='aborted', updated_at=now()):
+        if upload.status == 'complete':
+            default_storage.delete(upload.name)
+        _remove_part(upload)
+    upload.status = 'aborted'
+
+
+def claim_uploads(user, upload_ids):
+    """
+    Mark the user's complete uploads as attached and return their storage
+    names, in the order given. The caller stores the names in file fields,
+    which take over the references; call it inside the same transaction.
+    """
+    try:
+        upload_ids = [str(uuid.UUID(str(upload_id))) for upload_id in upload_ids]
+    except ValueError:
+        raise UploadError("Upload ids must be UUIDs.")
+    if len(set(upload_ids)) != len(upload_ids):
+        # Each attachment takes over the upload's single blob reference
+        raise UploadError("Upload ids must not repeat.")
+    if not upload_ids:
+        return []
+    names = dict(
+        Upload.objects.filter(user=user, status='complete', pk__in=upload_ids).values_list('pk', 'name')
+    )
+    names = {str(pk): name for pk, name in names.items()}
+    missing = [upload_id for upload_id in upload_ids if upload_id not in names]
+    if missing:
+        raise UploadError(f"Unknown or unfinished upload(s): {', '.join(missing)}.")
+    # Guarded so an upload is never attached twice
+    claimed = Upload.objects.filter(pk__in=upload_ids, status='complete').update(status='attached', updated_at=now())
+    if claimed != len(upload_ids):
+        raise UploadError("Upload(s) were attached concurrently.", status=409)
+    return [names[upload_id] for upload_id in upload_ids]
+
+
+def purge_uploads(older_than=None):
+    """
+    Abort uploads left unfinished for longer than UPLOAD_EXPIRY_HOURS and delete
+    finished records of that age. Returns the number of uploads aborted.
+    """
+    if older_than is None:
+        older_than = timedelta(hours=_setting('UPLOAD_EXPIRY_HOURS', 24))
+    cutoff = now() - older_than
+    aborted = 0
+    for upload in Upload.objects.filter(status__in=['pending', 'complete'], updated_at__lt=cutoff).iterator():
+        abort_upload(upload)
+        aborted += 1
+    Upload.objects.filter(Q(status='aborted') | Q(status='attached'), updated_at__lt=cutoff).delete()
+    return aborted
@@ -10,8 +10,13 @@ urlpatterns = [
     path('profile/', UserProfileView.as_view(), name='profile'),
     path('profile/edit/', EditProfileView.as_view(), name='edit-profile'),
     path('edit-avatar/', EditAvatarView.as_view(), name='edit-avatar'),
+    path('uploads/', UploadStartView.as_view(), name='upload-start'),
+    path('uploads/<uuid:upload_id>/', UploadDetailView.as_view(), name='upload-detail'),
+    path('uploads/<uuid:upload_id>/chunk/', UploadChunkView.as_view(), name='upload-chunk'),
+    path('uploads/<uuid:upload_id>/complete/', UploadCompleteView.as_view(), name='upload-complete'),
     path('tasks/create/me/', CreateTaskForMeView.as_view(), name='create_task_me'),
     path('tasks/create/manager/', CreateTaskManagerView.as_view(), name='create_task_manager'),
+    path('tasks/assign/', AssignTaskView.as_view(), name='assign_task'),
     path('tasks/pending/', UserPendingTasksView.as_view(), name='user_pending_task'),
     path('tasks/<int:task_id>/', TaskDetailView.as_view(), name='task-detail'),
     path('tasks/<int:task_id>/change-status/', ChangeTaskStatusView.as_view(), name='change-task-status'),
@@ -19,12 +24,17 @@ urlpatterns = [
     path('tasks/date-range/<str:start_date>/<str:end_date>/', UserSpecificDateRangeTasksView.as_view(), name='tasks-date-range'),
     path('user/<int:user_id>/tasks/date/<str:specific_date>/', UserSpecificDateTasksUserView.as_view(), name='tasks-specific-date'),
     path('user/<int:user_id>/tasks/range/<str:start_date>/<str:end_date>/', UserSpecificDateRangeTasksUserView.as_view(), name='tasks-date-range'),
+    path('tasks/calendar/<int:year>/<int:month>/', UserMonthCalendarView.as_view(), name='tasks-calendar'),
+    path('user/<int:user_id>/tasks/calendar/<int:year>/<int:month>/', UserMonthCalendarUserView.as_view(), name='tasks-calendar-user'),
     path('projects/', ProjectListView.as_view(), name='project-list'),
     path('projects/<int:project_id>/', ProjectDetailView.as_view(), name='project-detail'),
     path('create-ticket/', CreateTicketTaskView.as_view(), name='create_ticket_task'),
     path('projects/<int:project_id>/tickets/', ProjectTicketsView.as_view(), name='project-tickets'),
+    path('projects/<int:project_id>/board/', ProjectBoardView.as_view(), name='project-board'),
     path('tickets/<int:task_id>/change-status/', ChangeTicketStatusView.as_view(), name='change-task-status'),
+    path('tickets/change-status/', BulkTicketStatusView.as_view(), name='bulk-change-ticket-status'),
     path('projects/<int:project_id>/add-member/', AddMemberToProjectView.as_view(), name='add-member-to-project'),
+    path('projects/<int:project_id>/members/', ProjectMembersView.as_view(), name='project-members'),
     path('users/', UserListView.as_view(), name='user-list'),  # Endpoint to get all users
     path('projects/latest-high-priority/', LatestHighPriorityProjectsView.as_view(), name='latest-high-priority-projects'),
     path('notifications/', GetUserNotificationsView.as_view(), name='get_notifications'),
@@ -8,22 +8,34 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from django.conf import settings
 from rest_framework.permissions import AllowAny
 from .serializers import *
-from .models import User
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from .models import Upload, User
+from .queries import project_queryset, projects_for_user, task_detail_queryset, task_list_queryset
+from .jobs import enqueue
+from .notifications import mark_as_read, notify, unread_count
+from .pagination import InvalidCursor, first_pages, page_size_from, paginate_keyset
+from .dates import active_on_day_q, end_of, parse_day, start_of
+from .heatmap import month_heatmap
+from .sparse import load_for, sparse_context
+from .caching import cached_project_detail, cached_project_list
+from .conditional import TASK_STAMPS, Validators
+from .counters import count_tickets
+from .authentication import forget_user
+from .assignments import MAX_ASSIGNEES, assign_task, resolve_assignees
+from .members import MemberError, set_members
+from .transitions import MAX_TICKETS, TRANSITIONS, transition_tickets
+from .uploads import UploadError, abort_upload, claim_uploads, complete_upload, start_upload, write_chunk
 from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.authentication import JWTAuthentication
 import logging
 from rest_framework.parsers import JSONParser
 from django.contrib.auth import get_user_model
 from rest_framework.parsers import MultiPartParser, FormParser
 from django.core.exceptions import ValidationError
 from django.utils.dateparse import parse_datetime
-from django.db.models import Q
-from django.utils.timezone import localdate, make_aware
-from django.utils.timezone import now
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils.timezone import localdate
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from datetime import datetime
 
 
 
@@ -68,12 +80,8 @@ class UserProfileView(APIView):
     permission_classes = [IsAuthenticated]  # Ensure the user is authenticated
 
     def get(self, request):
-        # Debugging: Check if the token is coming in the headers
-        logger.debug(f"Authorization Header: {request.headers.get('Authorization')}")
-
-        # Using JWTAuthentication to authenticate the user
-        authentication = JWTAuthentication()
-        user, auth = authentication.authenticate(request)
+        # Already authenticated by the default authentication class
+        user = request.user
 
         if user:
             user_data = {
@@ -136,6 +144,7 @@ class EditProfileView(APIView):
         user.email = email
         user.phone_number = phone_number
         user.save()
+        forget_user(user.pk)
 
         # Prepare the response data
         response_data = {
@@ -162,24 +171,29 @@ class EditProfileView(APIView):
 
 class EditAvatarView(APIView):
     permission_classes = [IsAuthenticated]
-    parser_classes = [MultiPartParser, FormParser]
+    parser_classes = [MultiPartParser, FormParser, JSONParser]
 
     def put(self, request):
         user = request.user  # Get the authenticated user
 
-        # Check if there's a new avatar in the request
+        # Either a file in the request or the id of a finished chunked upload
         avatar = request.FILES.get('avatar')
-        if not avatar:
+        upload_id = request.data.get('upload_id')
+        if not avatar and not upload_id:
             return Response({'error': 'No avatar provided.'}, status=status.HTTP_400_BAD_REQUEST)
 
         # Validate that the avatar is an image file
-        if not avatar.name.endswith(('jpg', 'jpeg', 'png', 'gif')):
+        if avatar and not avatar.name.lower().endswith(('jpg', 'jpeg', 'png', 'gif', 'webp')):
             return Response({'error': 'File type not supported. Please upload a valid image file.'}, status=status.HTTP_400_BAD_REQUEST)
         
         # Save the avatar
         try:
-            user.avatar = avatar  # Set the avatar
-            user.save()  # Save the user object with the new avatar
+            with transaction.atomic():
+                if upload_id:
+                    avatar = claim_uploads(user, [upload_id])[0]
+                user.avatar = avatar  # Set the avatar
+                user.save()  # Save the user object with the new avatar
+            forget_user(user.pk)
 
             return Response({
                 'message': 'Avatar updated successfully.',
@@ -195,6 +209,8 @@ class EditAvatarView(APIView):
                 }
             }, status=status.HTTP_200_OK)
         
+        except UploadError as e:
+            return Response({'error': e.message}, status=e.status)
         except ValidationError as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -209,6 +225,97 @@ class EditAvatarView(APIView):
 
 
 
+class UploadStartView(APIView):
+    """
+    Start a chunked upload: `filename`, `size` in bytes and optionally `sha256`.
+    The chunks are then PUT to uploads/<id>/chunk/ (see core/uploads.py).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        try:
+            size = int(request.data.get('size', 0))
+        except (TypeError, ValueError):
+            return Response({'error': 'Size must be a number of bytes.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            upload = start_upload(request.user, request.data.get('filename', ''), size, request.data.get('sha256', ''))
+        except UploadError as e:
+            return Response({'error': e.message, **e.extra}, status=e.status)
+        return Response({
+            'id': upload.id,
+            'offset': upload.received,
+            'chunk_size': getattr(settings, 'UPLOAD_CHUNK_SIZE', 5 * 1024 * 1024),
+        }, status=status.HTTP_201_CREATED)
+
+
+
+
+class UploadDetailView(APIView):
+    """
+    GET tells a resuming client where to continue; DELETE cancels the upload.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, upload_id):
+        upload = get_object_or_404(Upload, id=upload_id, user=request.user)
+        return Response({'id': upload.id, 'offset': upload.received, 'size': upload.size, 'status': upload.status})
+
+    def delete(self, request, upload_id):
+        upload = get_object_or_404(Upload, id=upload_id, user=request.user)
+        try:
+            abort_upload(upload)
+        except UploadError as e:
+            return Response({'error': e.message, **e.extra}, status=e.status)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+
+
+class UploadChunkView(APIView):
+    """
+    PUT the raw bytes of the next chunk. The `Upload-Offset` header (or the
+    `offset` query parameter) must equal the bytes received so far.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def put(self, request, upload_id):
+        upload = get_object_or_404(Upload, id=upload_id, user=request.user)
+        try:
+            offset = int(request.headers.get('Upload-Offset', request.query_params.get('offset', '')))
+            length = int(request.headers['Content-Length']) if request.headers.get('Content-Length') else None
+        except ValueError:
+            return Response({'error': 'Upload-Offset must be a number of bytes.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            # Read the body as a stream; it is never parsed or held in memory
+            received = write_chunk(upload, offset, request._request, length)
+        except UploadError as e:
+            return Response({'error': e.message, **e.extra}, status=e.status)
+        response = Response({'offset': received, 'size': upload.size})
+        response['Upload-Offset'] = str(received)
+        return response
+
+
+
+
+class UploadCompleteView(APIView):
+    """
+    Verify the finished upload against `sha256` and store it. Its id can then
+    be given as `upload_ids` when creating tasks, tickets and projects, or as
+    `upload_id` to edit-avatar/.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, upload_id):
+        upload = get_object_or_404(Upload, id=upload_id, user=request.user)
+        try:
+            upload = complete_upload(upload, request.data.get('sha256', ''))
+        except UploadError as e:
+            return Response({'error': e.message, **e.extra}, status=e.status)
+        return Response({'id': upload.id, 'status': upload.status, 'sha256': upload.sha256, 'size': upload.size})
+
+
+
+
 class CreateTaskForMeView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -255,12 +362,12 @@ class CreateTaskManagerView(APIView):
         if serializer.is_valid():
             task = serializer.save()  # Save the task with the user data
             # Create a notification for the added user
-            Notification.objects.create(
-                user=task.user,
-                message = f"{user.username} has assigned you a new task.",
-                type='task',  # Notification type is 'project'
-                task=task,  # Link the notification to the specific project
-                created_by = user
+            notify(
+                f"{user.username} has assigned you a new task.",
+                'task',
+                users=[task.user],
+                task=task,  # Link the notification to the specific task
+                created_by=user,
             )
             return Response({
                 "message": "Task created successfully!",
@@ -270,10 +377,55 @@ class CreateTaskManagerView(APIView):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class AssignTaskView(APIView):
+    """
+    Assign one task to many users in a single request: the template fields
+    plus `assignees` (user ids), `departments` and/or `roles`. Returns one
+    result per assignee (see core/assignments.py).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        user = request.user
+
+        if user.role == 'Staff':
+            return Response({
+                "error": "Permission denied. Staff members are not allowed to create tasks."
+            }, status=status.HTTP_403_FORBIDDEN)
+
+        serializer = TaskAssignmentSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = dict(serializer.validated_data)
+        requested, upload_ids = data.pop('assignees'), data.pop('upload_ids')
+
+        # Everything is checked before anything is written
+        assignees, missing = resolve_assignees(requested, data.pop('departments'), data.pop('roles'))
+        if not assignees:
+            return Response({"error": "No matching users to assign."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(assignees) > MAX_ASSIGNEES:
+            return Response({"error": f"At most {MAX_ASSIGNEES} users can be assigned at once."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            tasks = assign_task(data, user, assignees.values(), request.FILES.getlist('images'), upload_ids)
+        except UploadError as e:
+            return Response({"upload_ids": [e.message]}, status=e.status)
+
+        results = [{"user": task.user_id, "status": "created", "task": task.id} for task in tasks]
+        results += [{"user": user_id, "status": "error", "error": "User does not exist or is inactive."} for user_id in missing]
+        return Response({
+            "message": f"Task assigned to {len(tasks)} user(s).",
+            "created": len(tasks),
+            "failed": len(missing),
+            "results": results,
+        }, status=status.HTTP_201_CREATED)
+
+
 class UserTasksWithTodayStartDateView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
+        context = sparse_context(request)
         # Get the logged-in user
         user = request.user
 
@@ -281,18 +433,25 @@ class UserTasksWithTodayStartDateView(APIView):
         today = localdate()
 
         # Fetch tasks for the logged-in user where start_date is today
-        tasks = Task.objects.filter(
-            Q(user=user) &
-            Q(start_date__date=today)
+        tasks = task_list_queryset(context).filter(
+            user=user,
+            start_date__gte=start_of(today),
+            start_date__lt=end_of(today),
         )
 
+        # Answer revalidations before serializing anything
+        validators = Validators.for_queryset(request, tasks, TASK_STAMPS)
+        not_modified = validators.not_modified(request)
+        if not_modified:
+            return not_modified
+
         # Serialize the tasks
-        serializer = TaskSerializer(tasks, many=True)
+        serializer = TaskListSerializer(tasks, many=True, context=context)
 
-        return Response({
+        return validators.apply(Response({
             "message": "Tasks with today's start date retrieved successfully!",
             "data": serializer.data
-        }, status=status.HTTP_200_OK)
+        }, status=status.HTTP_200_OK))
 
 
 
@@ -304,31 +463,38 @@ class UserPendingTasksView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
+        context = sparse_context(request)
         # Get the logged-in user
         user = request.user
         
         
         # Current date (only date part)
-        current_date = now().date()
+        current_date = localdate()
 
         # Fetch tasks for the logged-in user with specified conditions
-        tasks = Task.objects.filter(
+        tasks = task_list_queryset(context).filter(
             Q(user=user) & (
                 # Tasks that are ongoing: start_date in the past and due_date in the future
-                Q(start_date__date__lte=current_date, due_date__date__gte=current_date) |
-                
+                active_on_day_q(current_date) |
+
                 # Tasks that are overdue: due_date in the past and status is not 'approved'
-                Q(due_date__date__lt=current_date)
+                Q(due_date__lt=start_of(current_date))
             )
         )
 
+        # Answer revalidations before serializing anything
+        validators = Validators.for_queryset(request, tasks, TASK_STAMPS)
+        not_modified = validators.not_modified(request)
+        if not_modified:
+            return not_modified
+
         # Serialize the tasks
-        serializer = TaskSerializer(tasks, many=True)
+        serializer = TaskListSerializer(tasks, many=True, context=context)
 
-        return Response({
+        return validators.apply(Response({
             "message": "Pending tasks retrieved successfully!",
             "data": serializer.data
-        }, status=status.HTTP_200_OK)
+        }, status=status.HTTP_200_OK))
         
 
 
@@ -336,10 +502,18 @@ class TaskDetailView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, task_id):
+        context = sparse_context(request)
         try:
-            task = Task.objects.get(id=task_id)
-            serializer = TaskSerializer(task)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            # The payload nests the full project and the users, so their changes count too
+            stamps = Task.objects.values_list(*TASK_STAMPS).get(id=task_id)
+            validators = Validators.for_object(request, stamps)
+            not_modified = validators.not_modified(request)
+            if not_modified:
+                return not_modified
+
+            task = task_detail_queryset(context).get(id=task_id)
+            serializer = TaskSerializer(task, context=context)
+            return validators.apply(Response(serializer.data, status=status.HTTP_200_OK))
         except Task.DoesNotExist:
             return Response(
                 {"error": "Task not found or you do not have permission to view it."},
@@ -369,30 +543,16 @@ class ChangeTaskStatusView(APIView):
         # Change the task status to 'in_review'
         task.status = 'in_review'
         task.review_date = timezone.now()
-        task.save()
-
-        # notification___here
-        managers = User.objects.filter(role = 'Manager')
-        Admins = User.objects.filter(role = 'Admin')
-
-        for x in managers:
-            # Create a notification for the added user
-            Notification.objects.create(
-                user=x,
-                message = f"{task.user.username} has been assigned a task to review.",
-                type='task',  # Notification type is 'project'
-                task=task,  # Link the notification to the specific task
-                created_by = task.user
-            )
+        with transaction.atomic():
+            task.save()
 
-        for x in Admins:
-            # Create a notification for the added user
-            Notification.objects.create(
-                user=x,
-                message = f"{task.user.username} has been assigned a task to review.",
-                type='task',  # Notification type is 'task'
+            # Notify every manager and admin that there is a task to review
+            notify(
+                f"{task.user.username} has been assigned a task to review.",
+                'task',
+                roles=['Manager', 'Admin'],
                 task=task,  # Link the notification to the specific task
-                created_by = task.user
+                created_by=task.user,
             )
 
         # Serialize the updated task
@@ -416,32 +576,34 @@ class UserSpecificDateTasksView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, specific_date):
+        context = sparse_context(request)
         # Get the logged-in user
         user = request.user
 
-        # Convert the specific date (e.g., '25-11-2024') to a datetime object
+        # Convert the specific date (e.g., '25-11-2024') to a date
         try:
-            specific_date = datetime.strptime(specific_date, '%d-%m-%Y')  # Date format: 'dd-mm-yyyy'
-            specific_date = make_aware(specific_date)  # Make it timezone-aware
+            specific_date = parse_day(specific_date)  # Date format: 'dd-mm-yyyy'
         except ValueError:
             return Response({"message": "Invalid date format. Please use 'dd-mm-yyyy'."}, status=status.HTTP_400_BAD_REQUEST)
 
         # Fetch tasks for the logged-in user that match the criteria:
-        # - Tasks where start_date's date part is less than or equal to the specific date
-        # - Tasks where due_date's date part is greater than or equal to the specific date
-        tasks = Task.objects.filter(
-            user=user,
-            start_date__date__lte=specific_date.date(),  # Use only the date part of start_date
-            due_date__date__gte=specific_date.date()     # Use only the date part of due_date
-        )
+        # - Tasks that start on or before the specific date
+        # - Tasks that are due on or after the specific date
+        tasks = task_list_queryset(context).filter(active_on_day_q(specific_date), user=user)
+
+        # Answer revalidations before serializing anything
+        validators = Validators.for_queryset(request, tasks, TASK_STAMPS)
+        not_modified = validators.not_modified(request)
+        if not_modified:
+            return not_modified
 
         # Serialize the tasks
-        serializer = TaskSerializer(tasks, many=True)
+        serializer = TaskListSerializer(tasks, many=True, context=context)
 
-        return Response({
+        return validators.apply(Response({
             "message": "Tasks for the specified date retrieved successfully!",
             "data": serializer.data
-        }, status=status.HTTP_200_OK)
+        }, status=status.HTTP_200_OK))
 
 
 
@@ -456,34 +618,39 @@ class UserSpecificDateRangeTasksView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, start_date, end_date):
+        context = sparse_context(request)
         # Get the logged-in user
         user = request.user
 
-        # Convert the start and end dates (e.g., '25-11-2024') to datetime objects
+        # Convert the start and end dates (e.g., '25-11-2024') to dates
         try:
-            start_date = datetime.strptime(start_date, '%d-%m-%Y')  # Date format: 'dd-mm-yyyy'
-            start_date = make_aware(start_date)  # Make it timezone-aware
-            end_date = datetime.strptime(end_date, '%d-%m-%Y')  # Date format: 'dd-mm-yyyy'
-            end_date = make_aware(end_date)  # Make it timezone-aware
+            start_date = parse_day(start_date)  # Date format: 'dd-mm-yyyy'
+            end_date = parse_day(end_date)
         except ValueError:
             return Response({"message": "Invalid date format. Please use 'dd-mm-yyyy'."}, status=status.HTTP_400_BAD_REQUEST)
 
         # Fetch tasks for the logged-in user that match the criteria:
-        # - Tasks where the start_date's date part is on or after the start date
-        # - Tasks where the due_date's date part is on or before the end date
-        tasks = Task.objects.filter(
+        # - Tasks that start on or after the start date
+        # - Tasks that are due on or before the end date
+        tasks = task_list_queryset(context).filter(
             user=user,
-            start_date__date__gte=start_date.date(),  # Use only the date part of start_date
-            due_date__date__lte=end_date.date()       # Use only the date part of due_date
+            start_date__gte=start_of(start_date),
+            due_date__lt=end_of(end_date),
         )
 
+        # Answer revalidations before serializing anything
+        validators = Validators.for_queryset(request, tasks, TASK_STAMPS)
+        not_modified = validators.not_modified(request)
+        if not_modified:
+            return not_modified
+
         # Serialize the tasks
-        serializer = TaskSerializer(tasks, many=True)
+        serializer = TaskListSerializer(tasks, many=True, context=context)
 
-        return Response({
+        return validators.apply(Response({
             "message": "Tasks for the specified date range retrieved successfully!",
             "data": serializer.data
-        }, status=status.HTTP_200_OK)
+        }, status=status.HTTP_200_OK))
 
 
 
@@ -491,94 +658,31 @@ class UserSpecificDateRangeTasksView(APIView):
 
 
 
-class ProjectListView(APIView):
+class UserMonthCalendarView(APIView):
     """
-    View to list all projects with the percentage of completed tasks.
+    Per-day counts of active, pending and overdue tasks of the logged-in user for
+    one month. `?include=tasks` also returns compact task summaries for each day.
     """
+    permission_classes = [IsAuthenticated]
 
-    def get(self, request):
-        projects = Project.objects.filter(
-            Q(team_lead=request.user) | 
-            Q(members__user=request.user) | 
-            Q(created_by=request.user)
-        ).distinct().order_by('due_date')
-
-        # Iterate through each project and calculate the percentage of completed tasks
-        project_data = []
-        for project in projects:
-            # Fetch the tasks that are tickets for this project
-            tasks = Task.objects.filter(project=project, is_ticket=True)
-
-            # Count the tasks with status 'completed', 'in_review', and 'approved'
-            completed_tasks = tasks.filter( Q(status='in_review') | Q(status='approved')).count()
-            pending_tasks = tasks.filter(status='pending').count()
-            total_tasks = tasks.count()
-
-            # Calculate the percentage of completed tasks
-            percentage_completed = 0
-            if total_tasks > 0:
-                percentage_completed = (completed_tasks / total_tasks) * 100
-
-            # Serialize the project data and add the calculated percentage
-            project_serializer = ProjectSerializer(project)
-            project_data.append({
-                **project_serializer.data,
-                'percentage': round(percentage_completed, 2)  # Add the calculated percentage to the response data
-            })
-
-        return Response({
-            "message": "Projects fetched successfully!",
-            "data": project_data
-        }, status=status.HTTP_200_OK)
-
-
-
-
+    def get(self, request, year, month):
+        return month_calendar_response(request, request.user.id, year, month)
 
-class ProjectListView(APIView):
-    """
-    View to list all projects with the percentage of completed tasks.
-    """
 
-    def get(self, request):
-        if request.user.role == 'Admin':
-            # Admins can view all projects
-            projects = Project.objects.all().distinct().order_by('due_date')
-        else:
-            # Non-admin users are filtered by specific conditions
-            projects = Project.objects.filter(
-                Q(team_lead=request.user) |
-                Q(members__user=request.user) |
-                Q(created_by=request.user)
-            ).distinct().order_by('due_date')
-
-        # Iterate through each project and calculate the percentage of completed tasks
-        project_data = []
-        for project in projects:
-            # Fetch the tasks that are tickets for this project
-            tasks = Task.objects.filter(project=project, is_ticket=True)
-
-            # Count the tasks with status 'completed', 'in_review', and 'approved'
-            completed_tasks = tasks.filter( Q(status='in_review') | Q(status='approved')).count()
-            pending_tasks = tasks.filter(status='pending').count()
-            total_tasks = tasks.count()
-
-            # Calculate the percentage of completed tasks
-            percentage_completed = 0
-            if total_tasks > 0:
-                percentage_completed = (completed_tasks / total_tasks) * 100
-
-            # Serialize the project data and add the calculated percentage
-            project_serializer = ProjectSerializer(project)
-            project_data.append({
-                **project_serializer.data,
-                'percentage': round(percentage_completed, 2)  # Add the calculated percentage to the response data
-            })
+def month_calendar_response(request, user_id, year, month):
+    try:
+        days = month_heatmap(user_id, year, month, include_tasks=request.query_params.get('include') == 'tasks')
+    except (ValueError, OverflowError):
+        return Response({"message": "Invalid month."}, status=status.HTTP_400_BAD_REQUEST)
 
-        return Response({
-            "message": "Projects fetched successfully!",
-            "data": project_data
-        }, status=status.HTTP_200_OK)
+    return Response({
+        "message": "Task calendar retrieved successfully!",
+        "data": {
+            "year": year,
+            "month": month,
+            "days": days,
+        }
+    }, status=status.HTTP_200_OK)
 
 
 
@@ -592,44 +696,23 @@ class ProjectListView(APIView):
     """
 
     def get(self, request):
-        if request.user.role == 'Admin':
-            # Admins can view all projects
-            projects = Project.objects.all().distinct().order_by('due_date')
-        else:
-            # Non-admin users are filtered by specific conditions
-            projects = Project.objects.filter(
-                Q(team_lead=request.user) |
-                Q(members__user=request.user) |
-                Q(created_by=request.user)
-            ).distinct().order_by('due_date')
-
-        # Iterate through each project and calculate the percentage of completed tasks
-        project_data = []
-        for project in projects:
-            # Fetch the tasks that are tickets for this project
-            tasks = Task.objects.filter(project=project, is_ticket=True)
-
-            # Count the tasks with status 'completed', 'in_review', and 'approved'
-            completed_tasks = tasks.filter( Q(status='in_review') | Q(status='approved')).count()
-            pending_tasks = tasks.filter(status='pending').count()
-            total_tasks = tasks.count()
-
-            # Calculate the percentage of completed tasks
-            percentage_completed = 0
-            if total_tasks > 0:
-                percentage_completed = (completed_tasks / total_tasks) * 100
-
-            # Serialize the project data and add the calculated percentage
-            project_serializer = ProjectSerializer(project)
-            project_data.append({
-                **project_serializer.data,
-                'percentage': round(percentage_completed, 2)  # Add the calculated percentage to the response data
-            })
+        context = sparse_context(request)
 
-        return Response({
+        # Admins can view all projects, everyone else only the ones they take part in
+        projects = projects_for_user(request.user, context)
+
+        validators = Validators.for_queryset(request, projects)
+        not_modified = validators.not_modified(request)
+        if not_modified:
+            return not_modified
+
+        def build():
+            return ProjectProgressSerializer(projects, many=True, context=context).data
+
+        return validators.apply(Response({
             "message": "Projects fetched successfully!",
-            "data": project_data
-        }, status=status.HTTP_200_OK)
+            "data": cached_project_list(request.user, context, build)
+        }, status=status.HTTP_200_OK))
 
 
 
@@ -642,34 +725,24 @@ class ProjectDetailView(APIView):
     """
 
     def get(self, request, project_id):
-        try:
-            # Fetch the project by ID
-            project = Project.objects.get(id=project_id)
-
-            # Fetch the tasks that are tickets for this project
-            tasks = Task.objects.filter(project=project, is_ticket=True)
+        context = sparse_context(request)
 
-            # Count the tasks with status 'completed', 'in_review', and 'approved'
-            completed_tasks = tasks.filter(Q(status='in_review') | Q(status='approved')).count()
-            pending_tasks = tasks.filter(status='pending').count()
-            total_tasks = tasks.count()
+        def build():
+            # Fetch the project by ID along with its ticket counts
+            project = project_queryset(context).get(id=project_id)
+            return ProjectProgressSerializer(project, context=context).data
 
-            # Calculate the percentage of completed tasks
-            percentage_completed = 0
-            if total_tasks > 0:
-                percentage_completed = (completed_tasks / total_tasks) * 100
-
-            # Serialize the project data and add the calculated percentage
-            project_serializer = ProjectSerializer(project)
-            project_data = {
-                **project_serializer.data,
-                'percentage': round(percentage_completed, 2)  # Add the calculated percentage to the response data
-            }
+        try:
+            updated_at = Project.objects.values_list('updated_at', flat=True).get(id=project_id)
+            validators = Validators.for_object(request, [updated_at])
+            not_modified = validators.not_modified(request)
+            if not_modified:
+                return not_modified
 
-            return Response({
+            return validators.apply(Response({
                 "message": "Project fetched successfully!",
-                "data": project_data
-            }, status=status.HTTP_200_OK)
+                "data": cached_project_detail(project_id, context, build)
+            }, status=status.HTTP_200_OK))
 
         except Project.DoesNotExist:
             return Response({
@@ -690,17 +763,17 @@ class CreateTicketTaskView(APIView):
         serializer = TicketTaskSerializer(data=request.data, context={'request': request, 'user': user})
 
         if serializer.is_valid():
-            task = serializer.save()  # Save the validated data
+            with transaction.atomic():
+                task = serializer.save()  # Save the validated data
 
-            Notification.objects.create(
-                user=task.user,
-                message = f"{user.username} has created a ticket for you under the {task.project.title} project.",
-                type='task',  # Notification type is 'task'
-                task=task,  # Link the notification to the specific task
-                created_by = user
-            )
+                notify(
+                    f"{user.username} has created a ticket for you under the {task.project.title} project.",
+                    'task',
+                    users=[task.user],
+                    task=task,  # Link the notification to the specific task
+                    created_by=user,
+                )
 
-            # notification___here
             return Response({
                 "message": "Ticket created successfully!",
                 "data": serializer.data,
@@ -715,54 +788,135 @@ class CreateTicketTaskView(APIView):
 class ProjectTicketsView(APIView):
     """
     View to get all tickets for a project sorted by status, priority, and due date.
+    For large projects use ProjectBoardView, which pages each column.
     """
     permission_classes = [IsAuthenticated]
 
     def get(self, request, project_id):
+        context = sparse_context(request)
         try:
             # Get the project
             project = Project.objects.get(id=project_id)
             
             # Get all tasks (tickets) for the project and sort
-            tickets = Task.objects.filter(project=project, is_ticket=True).order_by(
+            tickets = task_list_queryset(context).filter(project=project, is_ticket=True).order_by(
+                'status',     # Grouped below anyway; lets the core_task_board index supply the order
                 '-priority',  # High priority first
                 'due_date',   # Closest due date first
+                'id',
             )
 
-            # Group tasks by status
-            pending = tickets.filter(status='pending')
-            in_review = tickets.filter(status='in_review')
-            approved = tickets.filter(status='approved')
+            validators = Validators.for_queryset(request, tickets, TASK_STAMPS)
+            not_modified = validators.not_modified(request)
+            if not_modified:
+                return not_modified
 
-            # Serialize tasks
-            serializer = TaskSerializer(tickets, many=True)
-            return Response({
+            # Serialize once and group by status in the same pass; the status is
+            # annotated so sparse fieldsets that leave it out cost no extra queries
+            tickets = list(tickets.annotate(_column=F('status')))
+            columns = {"pending": [], "in_review": [], "approved": []}
+            for ticket, data in zip(tickets, TaskListSerializer(tickets, many=True, context=context).data):
+                columns[ticket._column].append(data)
+
+            return validators.apply(Response({
                 "message": "Tickets fetched successfully!",
-                "data": {
-                    "pending": TaskSerializer(pending, many=True).data,
-                    "in_review": TaskSerializer(in_review, many=True).data,
-                    "approved": TaskSerializer(approved, many=True).data,
-                },
-            }, status=status.HTTP_200_OK)
+                "data": columns,
+            }, status=status.HTTP_200_OK))
         except Project.DoesNotExist:
             return Response({"error": "Project not found"}, status=status.HTTP_404_NOT_FOUND)
 
 
 
 
+class ProjectBoardView(APIView):
+    """
+    Kanban board of a project's tickets: the count and first page of every
+    status column in one query. `?column=<status>&cursor=<next>` loads the
+    following page of one column; `page_size` sets the page length.
+    """
+    permission_classes = [IsAuthenticated]
+    columns = ['pending', 'in_review', 'approved']
+    ordering = ['-priority', 'due_date', 'id']
+
+    def get(self, request, project_id):
+        context = sparse_context(request)
+        if not Project.objects.filter(id=project_id).exists():
+            return Response({"error": "Project not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        tickets = task_list_queryset(context).filter(project_id=project_id, is_ticket=True)
+        page_size = page_size_from(request, settings.BOARD_PAGE_SIZE, settings.BOARD_MAX_PAGE_SIZE)
+
+        column = request.query_params.get('column')
+        if column is not None:
+            # One more page of a single column
+            if column not in self.columns:
+                return Response({"message": "Invalid column."}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                rows, next_cursor = paginate_keyset(
+                    tickets.filter(status=column),
+                    self.ordering,
+                    cursor=request.query_params.get('cursor'),
+                    page_size=page_size,
+                )
+            except InvalidCursor:
+                return Response({"message": "Invalid cursor."}, status=status.HTTP_400_BAD_REQUEST)
+
+            # Validate the page only, before serializing it
+            validators = Validators.for_page(request, Task, rows, TASK_STAMPS, extra=[next_cursor])
+            not_modified = validators.not_modified(request)
+            if not_modified:
+                return not_modified
+            return validators.apply(Response({
+                "message": "Tickets fetched successfully!",
+                "column": column,
+                "data": TaskListSerializer(rows, many=True, context=context).data,
+                "next": next_cursor,
+            }, status=status.HTTP_200_OK))
+
+        # Counts come from the project's maintained ticket counters, or a recount
+        # for a project that has none yet
+        counts = ProjectTicketStats.objects.filter(project_id=project_id).values(*self.columns).first()
+        if counts is None:
+            counts = count_tickets([project_id]).get(project_id, {})
+        pages = first_pages(tickets, 'status', self.ordering, page_size)
+        pages = {name: pages.get(name, ([], None)) for name in self.columns}
+
+        validators = Validators.for_page(
+            request, Task, [row for rows, _ in pages.values() for row in rows], TASK_STAMPS,
+            extra=[counts, *(next_cursor for _, next_cursor in pages.values())],
+        )
+        not_modified = validators.not_modified(request)
+        if not_modified:
+            return not_modified
+
+        board = {}
+        for name in self.columns:
+            rows, next_cursor = pages[name]
+            board[name] = {
+                "count": counts.get(name, 0),
+                "data": TaskListSerializer(rows, many=True, context=context).data,
+                "next": next_cursor,
+            }
+        return validators.apply(Response({
+            "message": "Board fetched successfully!",
+            "data": board,
+        }, status=status.HTTP_200_OK))
+
+
+
+
 
 
 class ChangeTicketStatusView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, task_id):
+        # Fetch the ticket by task_id; outside the try below, so a missing ticket stays a 404
+        task = get_object_or_404(Task.objects.only('id', 'status', 'user_id'), id=task_id, is_ticket=True)
         try:
-            # Fetch the task by task_id
-            task = get_object_or_404(Task, id=task_id)
-
             # Ensure the task belongs to the currently authenticated user
             if task.status == 'pending':
-                if task.user != request.user:
+                if task.user_id != request.user.id:
                     return Response({"message": "You don't have permission to change this task's status."}, status=status.HTTP_403_FORBIDDEN)
 
             # Get the status from the request body and ensure it's not None or empty
@@ -776,80 +930,13 @@ class ChangeTicketStatusView(APIView):
             if status_value not in ['pending', 'in_review', 'approved']:
                 return Response({"message": "Invalid status provided."}, status=status.HTTP_400_BAD_REQUEST)
 
-
-            # notification___here
-            managers = User.objects.filter(role = 'Manager')
-            Admins = User.objects.filter(role = 'Admin')
-            
             # Check if the status change is allowed
-            if task.status == 'pending' and status_value == 'in_review':
-                task.status = 'in_review'
-                task.review_date = timezone.now()
-
-                for x in managers:
-                    Notification.objects.create(
-                        user=x,
-                        message = f"{task.user.username} has been assigned a task to review.",
-                        type='task',  # Notification type is 'task'
-                        task=task,  # Link the notification to the specific task
-                        created_by = task.user
-                    )
-
-                for x in Admins:
-                    Notification.objects.create(
-                        user=x,
-                        message = f"{task.user.username} has been assigned a task to review.",
-                        type='task',  # Notification type is 'task'
-                        task=task,  # Link the notification to the specific task
-                        created_by = task.user
-                    )
-                    
-            elif task.status == 'in_review' and status_value == 'approved':
-                task.status = 'approved'
-                task.approved_date = timezone.now()
-                Notification.objects.create(
-                    user=task.user,
-                    message = f"{request.user.username} has been approved your task",
-                    type='task',  # Notification type is 'task'
-                    task=task,  # Link the notification to the specific task
-                    created_by = request.user
-                )
-
-                for x in Admins:
-                    Notification.objects.create(
-                        user=x,
-                        message = f"{request.user.username} has been approved {task.user.username}'s task",
-                        type='task',  # Notification type is 'task'
-                        task=task,  # Link the notification to the specific task
-                        created_by = request.user
-                    )
-                #notification___here
-
-            elif task.status == 'in_review' and status_value == 'pending':
-                task.status = 'pending'
-                task.review_date = None
-                
-                Notification.objects.create(
-                    user=task.user,
-                    message = f"{request.user.username} has been rejected your task",
-                    type='task',  # Notification type is 'task'
-                    task=task,  # Link the notification to the specific task
-                    created_by = request.user
-                )
-
-                for x in Admins:
-                    Notification.objects.create(
-                        user=x,
-                        message = f"{request.user.username} has been rejected {task.user.username}'s task",
-                        type='task',  # Notification type is 'task'
-                        task=task,  # Link the notification to the specific task
-                        created_by = request.user
-                    )
-                #notification___here
-            else:
+            if TRANSITIONS[status_value][0] != task.status:
                 return Response({"message": "Invalid status transition."}, status=status.HTTP_400_BAD_REQUEST)
 
-            task.save()
+            # Guarded write: loses cleanly to a reviewer who changed the ticket meanwhile
+            if not transition_tickets(request.user, [task.id], status_value)['moved']:
+                return Response({"message": "The ticket's status was changed by someone else."}, status=status.HTTP_409_CONFLICT)
 
             return Response({
                 "message": f"Task status changed to {status_value} successfully.",
@@ -862,6 +949,38 @@ class ChangeTicketStatusView(APIView):
 
 
 
+class BulkTicketStatusView(APIView):
+    """
+    Move many tickets at once: `task_ids` plus the new `status`. Tickets whose
+    status no longer allows the move are reported as stale, not changed
+    (see core/transitions.py).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        status_value = str(request.data.get('status', '')).lower()
+        if status_value not in TRANSITIONS:
+            return Response({"message": "Invalid status provided."}, status=status.HTTP_400_BAD_REQUEST)
+
+        task_ids = request.data.get('task_ids')
+        if not isinstance(task_ids, list) or not task_ids:
+            return Response({"message": "task_ids must be a list of task IDs."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(task_ids) > MAX_TICKETS:
+            return Response({"message": f"At most {MAX_TICKETS} tickets can be changed at once."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            task_ids = [int(task_id) for task_id in task_ids]
+        except (TypeError, ValueError):
+            return Response({"message": "task_ids must be a list of task IDs."}, status=status.HTTP_400_BAD_REQUEST)
+
+        result = transition_tickets(request.user, task_ids, status_value)
+        return Response({
+            "message": f"{len(result['moved'])} ticket(s) changed to {status_value}.",
+            **result,
+        }, status=status.HTTP_200_OK)
+
+
+
+
 
 
 class AddMemberToProjectView(APIView):
@@ -881,33 +1000,51 @@ class AddMemberToProjectView(APIView):
         if not user_id:
             return Response({"message": "User ID is required."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Fetch the user to be added
-        user_to_add = get_object_or_404(User, id=user_id)
+        try:
+            result = set_members(project, request.user, add=[user_id])
+        except MemberError:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        if not result['added']:
+            return Response({"message": "User is already a member of this project."}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            "message": "User added to the project successfully."
+        }, status=status.HTTP_200_OK)
 
-        if user_to_add == project.team_lead:
-            return Response({"message": "User is already a member of this project. "}, status=status.HTTP_400_BAD_REQUEST)
 
 
-        # Ensure the user is not already a member of the project
-        if ProjectMember.objects.filter(project=project, user=user_to_add).exists():
-            return Response({"message": "User is already a member of this project."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Add the user to the project members
-        ProjectMember.objects.create(project=project, user=user_to_add, role='Staff')  # Default role is 'Staff', can be adjusted if needed
+class ProjectMembersView(APIView):
+    """
+    Change many members at once. POST takes `add` and/or `remove` lists of
+    user ids; PUT takes `members`, the complete new list (see core/members.py).
+    """
+    permission_classes = [IsAuthenticated]
 
-        # Create a notification for the added user
-        Notification.objects.create(
-            user=user_to_add,
-            message = f"{request.user.username} has added you as a member to the '{project.title}' project.",
-            type='project',  # Notification type is 'project'
-            project=project,  # Link the notification to the specific project
-            created_by = request.user
-        )
+    def change(self, request, project_id, **changes):
+        project = get_object_or_404(Project, id=project_id)
 
-        #notification___here
-        return Response({
-            "message": f"User {user_to_add.username} added to the project successfully."
-        }, status=status.HTTP_200_OK)
+        # Same rule as adding a single member: Team Lead, Manager, or Admin
+        if request.user.role not in ['Manager', 'Admin'] and request.user != project.team_lead:
+            return Response({"message": "You do not have the required permissions to change members."}, status=status.HTTP_403_FORBIDDEN)
+
+        try:
+            result = set_members(project, request.user, **changes)
+        except MemberError as e:
+            return Response({"message": e.message, "user_ids": e.user_ids}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_200_OK)
+
+    def post(self, request, project_id):
+        add, remove = request.data.get('add', []), request.data.get('remove', [])
+        if not isinstance(add, list) or not isinstance(remove, list):
+            return Response({"message": "add and remove must be lists of user ids."}, status=status.HTTP_400_BAD_REQUEST)
+        return self.change(request, project_id, add=add, remove=remove)
+
+    def put(self, request, project_id):
+        members = request.data.get('members')
+        if not isinstance(members, list):
+            return Response({"message": "members must be a list of user ids."}, status=status.HTTP_400_BAD_REQUEST)
+        return self.change(request, project_id, replace=members)
 
 
 
@@ -919,8 +1056,9 @@ class UserListView(generics.ListAPIView):
 
     def get(self, request, *args, **kwargs):
         # You can customize the queryset, for example, filter users based on their role or department if needed
-        users = self.get_queryset()
-        serializer = self.get_serializer(users, many=True)
+        context = sparse_context(request)
+        users = load_for(self.get_queryset(), UserSerializer, context)
+        serializer = UserSerializer(users, many=True, context=context)
         return Response(serializer.data)
 
 
@@ -933,57 +1071,27 @@ class LatestHighPriorityProjectsView(APIView):
     """
 
     def get(self, request):
+        context = sparse_context(request)
 
         user = request.user
 
         # Query the projects with status 'pending' and priority 'high', ordered by `created_at`
 
 
-        if request.user.role == 'Admin':
-            # Admins can view all pending projects
-            projects = Project.objects.filter(
-                status='pending'
-            ).order_by('due_date')[:3]
-        else:
-            # Non-admin users are filtered by specific conditions
-            projects = Project.objects.filter(
-                status='pending'
-            ).filter(
-                Q(team_lead=request.user) | 
-                Q(members__user=request.user) | 
-                Q(created_by=request.user)
-            ).distinct().order_by('due_date')[:3]
-
-        project_data = []
-
-        for project in projects:
-            # Fetch the tasks that are tickets for this project
-            tasks = Task.objects.filter(project=project, is_ticket=True)
-
-            # Count the tasks with status 'completed', 'in_review', and 'approved'
-            completed_tasks = tasks.filter( Q(status='in_review') | Q(status='approved')).count()
-            pending_tasks = tasks.filter(status='pending').count()
-            total_tasks = tasks.count()
-
-            # Calculate the percentage of completed tasks
-            percentage_completed = 0
-            if total_tasks > 0:
-                percentage_completed = (completed_tasks / total_tasks) * 100
-
-            # Serialize the project data and add the calculated percentage
-            project_serializer = ProjectSerializer(project)
-            project_data.append({
-                **project_serializer.data,
-                'percentage': round(percentage_completed, 2)  # Add the calculated percentage to the response data
-            })
-
-        # Serialize the projects
-        project_serializer = ProjectSerializer(projects, many=True)
+        # Admins can view all pending projects, everyone else only the ones they take part in
+        projects = projects_for_user(user, context).filter(status='pending')[:3]
 
-        return Response({
+        validators = Validators.for_queryset(request, projects)
+        not_modified = validators.not_modified(request)
+        if not_modified:
+            return not_modified
+
+        serializer = ProjectProgressSerializer(projects, many=True, context=context)
+
+        return validators.apply(Response({
             "message": "Latest high-priority pending projects fetched successfully!",
-            "data": project_data
-        }, status=status.HTTP_200_OK)
+            "data": serializer.data
+        }, status=status.HTTP_200_OK))
 
 
 
@@ -991,23 +1099,48 @@ class LatestHighPriorityProjectsView(APIView):
 
 
 class GetUserNotificationsView(APIView):
+    """
+    Notification feed for the authenticated user, newest first, paginated with
+    an opaque `cursor` and an optional `page_size`.
+    """
     permission_classes = [IsAuthenticated]
+    ordering = ['-created_at', '-id']
 
     def get(self, request):
+        context = sparse_context(request)
         # Get the current authenticated user
         user = request.user
 
-        # Fetch all notifications related to the user, ordered by creation date
-        notifications = Notification.objects.filter(user=user).order_by('-created_at')
+        page_size = page_size_from(request, settings.NOTIFICATIONS_PAGE_SIZE, settings.NOTIFICATIONS_MAX_PAGE_SIZE)
+
+        # Fetch one page of the user's notifications, seeking past the cursor
+        try:
+            notifications, next_cursor = paginate_keyset(
+                load_for(Notification.objects.filter(user=user), NotificationSerializer, context),
+                self.ordering,
+                cursor=request.query_params.get('cursor'),
+                page_size=page_size,
+            )
+        except InvalidCursor:
+            return Response({"message": "Invalid cursor."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Only the rows on this page (and their senders) decide its tag
+        validators = Validators.for_page(
+            request, Notification, notifications, ('updated_at', 'created_by__updated_at'), extra=[next_cursor],
+        )
+        not_modified = validators.not_modified(request)
+        if not_modified:
+            return not_modified
 
         # Serialize the notifications
-        serializer = NotificationSerializer(notifications, many=True)
+        serializer = NotificationSerializer(notifications, many=True, context=context)
 
         # Return the notifications as a response
-        return Response({
+        return validators.apply(Response({
             "message": "Notifications fetched successfully!",
-            "data": serializer.data
-        }, status=status.HTTP_200_OK)
+            "data": serializer.data,
+            "next": next_cursor,
+        }, status=status.HTTP_200_OK))
 
 
 
@@ -1024,12 +1157,10 @@ class MarkNotificationAsReadView(APIView):
         if not notification_ids:
             return Response({"message": "No notification IDs provided."}, status=400)
 
-        # Ensure the notifications belong to the current user
-        notifications = Notification.objects.filter(id__in=notification_ids, user=request.user)
+        # Mark the user's own notifications as read, keeping the unread counter in step
+        marked = mark_as_read(request.user, notification_ids)
 
-        if notifications.exists():
-            # Update the read status of the selected notifications
-            notifications.update(read_status=True)
+        if marked or Notification.objects.filter(id__in=notification_ids, user=request.user).exists():
             return Response({"message": "Notifications marked as read."}, status=200)
         else:
             return Response({"message": "No notifications found."}, status=404)
@@ -1042,18 +1173,15 @@ class MarkNotificationAsReadView(APIView):
 
 class UnreadNotificationAPIView(APIView):
     """
-    API view to check if the authenticated user has any unread notifications.
+    API view to get the number of unread notifications of the authenticated user.
     """
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        # Get unread notifications for the currently authenticated user
-        unread_notifications = Notification.objects.filter(user=request.user, read_status=False)
+        # Read the user's unread counter instead of scanning their notifications
+        count = unread_count(request.user)
 
-        # Return true if there are unread notifications, otherwise false
-        has_unread = unread_notifications.exists()
-
-        return Response({'has_unread': has_unread})
+        return Response({'has_unread': count > 0, 'unread_count': count})
 
 
 
@@ -1073,11 +1201,13 @@ class CreateProjectView(APIView):
         data = request.data
         print("Received Data:", data)
 
-        members_data = data.get('members', [])
+        members_data = data.getlist('members') if hasattr(data, 'getlist') else data.get('members', [])
         images_data = request.FILES.getlist('images')  # Get list of uploaded files (images)
+        # Ids of finished chunked uploads to attach as images
+        upload_ids = data.getlist('upload_ids') if hasattr(data, 'getlist') else data.get('upload_ids', [])
 
-        # Remove 'members' and 'images' from the data before further processing
-        data_to_serializer = {key: value for key, value in data.items() if key not in ['members', 'images']}
+        # Remove 'members', 'images' and 'upload_ids' from the data before further processing
+        data_to_serializer = {key: value for key, value in data.items() if key not in ['members', 'images', 'upload_ids']}
 
         # Validate that 'team_lead' is passed as a valid user ID
         try:
@@ -1093,23 +1223,21 @@ class CreateProjectView(APIView):
         serializer = ProjectSerializerCreate(data=data_to_serializer)
         
         if serializer.is_valid():
-            # Save the project object
-            project = serializer.save()
-
-            # Add project members (if any)
-            for member in members_data:
-                try:
-                    user = User.objects.get(id=int(member))
-                    ProjectMember.objects.create(project=project, user=user)
-                    Notification.objects.create(
-                        user=user,
-                        message = f"{request.user.username} has added you as a member to the '{project.title}' project.",
-                        type='project',  # Notification type is 'task'
-                        task=project,  # Link the notification to the specific task
-                        created_by = request.user
-                    )
-                except User.DoesNotExist:
-                    return Response({"detail": f"Member with ID {member} does not exist."}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                with transaction.atomic():
+                    # Save the project object
+                    project = serializer.save()
+
+                    # Attach finished chunked uploads; the project is rolled back if any is invalid
+                    for name in claim_uploads(request.user, upload_ids):
+                        ProjectImage.objects.create(project=project, image=name)
+
+                    # Add project members (if any) and let them know, in one batch
+                    set_members(project, request.user, add=members_data, role='staff')
+            except UploadError as e:
+                return Response({"detail": e.message}, status=e.status)
+            except MemberError as e:
+                return Response({"detail": e.message}, status=status.HTTP_400_BAD_REQUEST)
 
             # Add project images (if any)
             for image in images_data:
@@ -1136,9 +1264,9 @@ class DeleteProjectView(APIView):
         if project.created_by != request.user and not request.user.is_staff:
             return Response({"detail": "You do not have permission to delete this project."}, status=status.HTTP_403_FORBIDDEN)
 
-        # Delete the project
-        project.delete()
-        return Response({"message": "Project deleted successfully."}, status=status.HTTP_204_NO_CONTENT)
+        # Delete the project (and everything that cascades from it) in the background
+        enqueue('projects.delete', {'project': project.id})
+        return Response({"message": "Project deletion scheduled."}, status=status.HTTP_202_ACCEPTED)
 
 
 
@@ -1148,14 +1276,15 @@ class GetUserDetailsView(APIView):
     permission_classes = [IsAuthenticated]  # Ensure the user is authenticated
 
     def get(self, request, user_id):
+        context = sparse_context(request)
         # Try to fetch the user with the given user_id
         try:
-            user = User.objects.get(id=user_id)
+            user = load_for(User.objects.all(), UserSerializer, context).get(id=user_id)
         except User.DoesNotExist:
             return Response({"detail": "User not found."}, status=status.HTTP_404_NOT_FOUND)
 
         # Serialize the user data
-        serializer = UserSerializer(user)
+        serializer = UserSerializer(user, context=context)
 
         return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -1170,6 +1299,7 @@ class ProjectListUserView(APIView):
     """
 
     def get(self, request):
+        context = sparse_context(request)
         # Get the user_id parameter from the request query
         user_id = request.query_params.get('user_id', None)
         
@@ -1186,37 +1316,22 @@ class ProjectListUserView(APIView):
             }, status=status.HTTP_404_NOT_FOUND)
 
         # Query for projects where the user is either the team_lead or a member
-        projects = Project.objects.filter(
-            Q(team_lead=user) | Q(members__user=user)
-        ).distinct().order_by('due_date')
-
-        # Iterate through each project and calculate the percentage of completed tasks
-        project_data = []
-        for project in projects:
-            # Fetch the tasks that are tickets for this project
-            tasks = Task.objects.filter(project=project, is_ticket=True)
-
-            # Count the tasks with status 'completed', 'in_review', and 'approved'
-            completed_tasks = tasks.filter(Q(status='in_review') | Q(status='approved')).count()
-            pending_tasks = tasks.filter(status='pending').count()
-            total_tasks = tasks.count()
-
-            # Calculate the percentage of completed tasks
-            percentage_completed = 0
-            if total_tasks > 0:
-                percentage_completed = (completed_tasks / total_tasks) * 100
-
-            # Serialize the project data and add the calculated percentage
-            project_serializer = ProjectSerializer(project)
-            project_data.append({
-                **project_serializer.data,
-                'percentage': round(percentage_completed, 2)  # Add the calculated percentage to the response data
-            })
+        member_of = ProjectMember.objects.filter(user=user).values('project_id')
+        projects = project_queryset(context).filter(
+            Q(team_lead=user) | Q(id__in=member_of)
+        ).order_by('due_date')
 
-        return Response({
+        validators = Validators.for_queryset(request, projects)
+        not_modified = validators.not_modified(request)
+        if not_modified:
+            return not_modified
+
+        serializer = ProjectProgressSerializer(projects, many=True, context=context)
+
+        return validators.apply(Response({
             "message": "Projects fetched successfully!",
-            "data": project_data
-        }, status=status.HTTP_200_OK)
+            "data": serializer.data
+        }, status=status.HTTP_200_OK))
 
 
 
@@ -1230,33 +1345,35 @@ class UserSpecificDateTasksUserView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, user_id, specific_date):
+        context = sparse_context(request)
         # Ensure that the logged-in user is authorized to access the tasks of the given user
         if request.user.role == 'Staff':
             return Response({"message": "You don't have permission to view this user's tasks."}, status=status.HTTP_403_FORBIDDEN)
 
-        # Convert the specific date (e.g., '25-11-2024') to a datetime object
+        # Convert the specific date (e.g., '25-11-2024') to a date
         try:
-            specific_date = datetime.strptime(specific_date, '%d-%m-%Y')  # Date format: 'dd-mm-yyyy'
-            specific_date = make_aware(specific_date)  # Make it timezone-aware
+            specific_date = parse_day(specific_date)  # Date format: 'dd-mm-yyyy'
         except ValueError:
             return Response({"message": "Invalid date format. Please use 'dd-mm-yyyy'."}, status=status.HTTP_400_BAD_REQUEST)
 
         # Fetch tasks for the specified user that match the criteria:
-        # - Tasks where start_date's date part is less than or equal to the specific date
-        # - Tasks where due_date's date part is greater than or equal to the specific date
-        tasks = Task.objects.filter(
-            user__id=user_id,  # Filter by user ID
-            start_date__date__lte=specific_date.date(),  # Use only the date part of start_date
-            due_date__date__gte=specific_date.date()     # Use only the date part of due_date
-        )
+        # - Tasks that start on or before the specific date
+        # - Tasks that are due on or after the specific date
+        tasks = task_list_queryset(context).filter(active_on_day_q(specific_date), user__id=user_id)
+
+        # Answer revalidations before serializing anything
+        validators = Validators.for_queryset(request, tasks, TASK_STAMPS)
+        not_modified = validators.not_modified(request)
+        if not_modified:
+            return not_modified
 
         # Serialize the tasks
-        serializer = TaskSerializer(tasks, many=True)
+        serializer = TaskListSerializer(tasks, many=True, context=context)
 
-        return Response({
+        return validators.apply(Response({
             "message": "Tasks for the specified date retrieved successfully!",
             "data": serializer.data
-        }, status=status.HTTP_200_OK)
+        }, status=status.HTTP_200_OK))
 
 
 
@@ -1266,33 +1383,52 @@ class UserSpecificDateRangeTasksUserView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, user_id, start_date, end_date):
+        context = sparse_context(request)
         # Ensure that the logged-in user is authorized to access the tasks of the given user
         if request.user.role == 'Staff':
             return Response({"message": "You don't have permission to view this user's tasks."}, status=status.HTTP_403_FORBIDDEN)
 
-        # Convert the start and end dates (e.g., '25-11-2024') to datetime objects
+        # Convert the start and end dates (e.g., '25-11-2024') to dates
         try:
-            start_date = datetime.strptime(start_date, '%d-%m-%Y')  # Date format: 'dd-mm-yyyy'
-            start_date = make_aware(start_date)  # Make it timezone-aware
-            end_date = datetime.strptime(end_date, '%d-%m-%Y')  # Date format: 'dd-mm-yyyy'
-            end_date = make_aware(end_date)  # Make it timezone-aware
+            start_date = parse_day(start_date)  # Date format: 'dd-mm-yyyy'
+            end_date = parse_day(end_date)
         except ValueError:
             return Response({"message": "Invalid date format. Please use 'dd-mm-yyyy'."}, status=status.HTTP_400_BAD_REQUEST)
 
         # Fetch tasks for the specified user within the date range
-        tasks = Task.objects.filter(
+        tasks = task_list_queryset(context).filter(
             user__id=user_id,  # Filter by user ID
-            start_date__date__gte=start_date.date(),  # Tasks that start after the start_date
-            due_date__date__lte=end_date.date()       # Tasks that end before the end_date
+            start_date__gte=start_of(start_date),  # Tasks that start on or after the start_date
+            due_date__lt=end_of(end_date),         # Tasks that end on or before the end_date
         )
 
+        # Answer revalidations before serializing anything
+        validators = Validators.for_queryset(request, tasks, TASK_STAMPS)
+        not_modified = validators.not_modified(request)
+        if not_modified:
+            return not_modified
+
         # Serialize the tasks
-        serializer = TaskSerializer(tasks, many=True)
+        serializer = TaskListSerializer(tasks, many=True, context=context)
 
-        return Response({
+        return validators.apply(Response({
             "message": "Tasks for the specified date range retrieved successfully!",
             "data": serializer.data
-        }, status=status.HTTP_200_OK)
+        }, status=status.HTTP_200_OK))
+
+
+
+
+
+class UserMonthCalendarUserView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, user_id, year, month):
+        # Ensure that the logged-in user is authorized to access the tasks of the given user
+        if request.user.role == 'Staff':
+            return Response({"message": "You don't have permission to view this user's tasks."}, status=status.HTTP_403_FORBIDDEN)
+
+        return month_calendar_response(request, user_id, year, month)
 
 
 
@@ -1338,6 +1474,7 @@ class DeleteUserView(APIView):
 
         # Delete the user
         user.delete()
+        forget_user(user_id)
 
         return Response({"detail": "User deleted successfully."}, status=status.HTTP_204_NO_CONTENT)
 
@@ -1374,5 +1511,6 @@ class EditUserView(APIView):
 
         # Save the updated user data
         user.save()
+        forget_user(user.pk)
 
         return Response({"detail": "User updated successfully."}, status=status.HTTP_200_OK)
\ No newline at end of file
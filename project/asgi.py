@@ -13,4 +13,16 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up, since it loads models and settings
+from core.streams import NotificationStreamApp  # noqa: E402
+
+notification_stream = NotificationStreamApp()
+
+
+async def application(scope, receive, send):
+    # Long-lived notification streams bypass the Django request cycle
+    if scope['type'] == 'http' and scope['path'] == '/notifications/stream/':
+        return await notification_stream(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -0,0 +1,116 @@
+"""
+Database settings read from the environment.
+
+DB_ENGINE selects 'sqlite' (the default) or 'postgresql'. For SQLite, DB_NAME is
+the database file (default db.sqlite3 in the project directory). Every new
+connection sets the pragmas below. WAL lets readers keep going while one writer
+commits, and synchronous=NORMAL syncs at checkpoints instead of on every commit.
+Transactions start as IMMEDIATE, so a writer waits on busy_timeout up front
+instead of failing with "database is locked" when it upgrades a read lock.
+
+Connections are kept open for DB_CONN_MAX_AGE seconds and health-checked before
+reuse. `python manage.py db_maintenance` runs ANALYZE, VACUUM and WAL
+checkpoints.
+
+DB_REPLICAS lists read replicas, comma-separated: database files for SQLite,
+host[:port] for PostgreSQL. They become the aliases replica_1, replica_2, ...
+with the primary's other settings (see core/routing.py). SQLite replicas are
+refreshed from the primary by `python manage.py sync_replicas`.
+"""
+import copy
+import os
+
+TRUE = {'1', 'true', 'yes', 'on'}
+
+
+def env(name, default):
+    return os.environ.get(name, default)
+
+
+def env_int(name, default):
+    value = os.environ.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer, got {value!r}") from None
+
+
+def env_bool(name, default):
+    value = os.environ.get(name)
+    if value in (None, ''):
+        return default
+    return value.strip().lower() in TRUE
+
+
+def env_choice(name, default, choices):
+    value = env(name, default).strip().upper()
+    if value not in choices:
+        raise ValueError(f"{name} must be one of {', '.join(sorted(choices))}, got {value!r}")
+    return value
+
+
+def sqlite_pragmas():
+    # busy_timeout goes first, so switching the journal mode waits for other connections too
+    return [
+        f"PRAGMA busy_timeout = {env_int('SQLITE_BUSY_TIMEOUT_MS', 5000)}",
+        f"PRAGMA journal_mode = {env_choice('SQLITE_JOURNAL_MODE', 'WAL', {'WAL', 'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY'})}",
+        f"PRAGMA synchronous = {env_choice('SQLITE_SYNCHRONOUS', 'NORMAL', {'OFF', 'NORMAL', 'FULL', 'EXTRA'})}",
+        f"PRAGMA mmap_size = {env_int('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)}",
+        # Negative values are KiB: 64 MB of page cache per connection
+        f"PRAGMA cache_size = {env_int('SQLITE_CACHE_SIZE', -64 * 1024)}",
+    ]
+
+
+def database_config(base_dir):
+    """Return the 'default' entry for DATABASES."""
+    engine = env('DB_ENGINE', 'sqlite').strip().lower()
+    common = {
+        'CONN_MAX_AGE': env_int('DB_CONN_MAX_AGE', 60),  # 0 closes after every request
+        'CONN_HEALTH_CHECKS': env_bool('DB_CONN_HEALTH_CHECKS', True),
+    }
+
+    if engine in ('sqlite', 'sqlite3'):
+        return {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': env('DB_NAME', '') or base_dir / 'db.sqlite3',
+            'OPTIONS': {
+                'init_command': '; '.join(sqlite_pragmas()),
+                'transaction_mode': env_choice('SQLITE_TRANSACTION_MODE', 'IMMEDIATE', {'DEFERRED', 'IMMEDIATE', 'EXCLUSIVE'}),
+            },
+            **common,
+        }
+
+    if engine in ('postgresql', 'postgres'):
+        return {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': env('DB_NAME', 'project'),
+            'USER': env('DB_USER', ''),
+            'PASSWORD': env('DB_PASSWORD', ''),
+            'HOST': env('DB_HOST', ''),
+            'PORT': env('DB_PORT', ''),
+            'OPTIONS': {
+                'connect_timeout': env_int('DB_CONNECT_TIMEOUT', 10),
+            },
+            **common,
+        }
+
+    raise ValueError(f"DB_ENGINE must be 'sqlite' or 'postgresql', got {engine!r}")
+
+
+def replica_configs(primary):
+    """Return the DATABASES entries for the replicas listed in DB_REPLICAS."""
+    locations = [location.strip() for location in env('DB_REPLICAS', '').split(',') if location.strip()]
+    replicas = {}
+    for number, location in enumerate(locations, 1):
+        config = copy.deepcopy(primary)
+        if config['ENGINE'] == 'django.db.backends.sqlite3':
+            config['NAME'] = location
+        else:
+            host, _, port = location.partition(':')
+            config.update(HOST=host, PORT=port or config['PORT'])
+        # Tests create only the primary; the replicas read from it
+        config['TEST'] = {'MIRROR': 'default'}
+        replicas[f'replica_{number}'] = config
+    return replicas
@@ -19,6 +19,8 @@ import os
 from pathlib import Path
 from datetime import timedelta
 
+from .database import database_config, replica_configs
+
 
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -62,7 +64,7 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',  # Only use JWTAuthentication
+        'core.authentication.CachedJWTAuthentication',  # JWT, with the user loaded from a short-lived cache
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',  # Ensure user is authenticated
@@ -84,6 +86,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.routing.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -149,14 +152,97 @@ SIMPLE_JWT = {
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
+# Configured from DB_* and SQLITE_* environment variables (see project/database.py)
 
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_config(BASE_DIR),
 }
 
+# Read replicas from DB_REPLICAS serve GET requests (see core/routing.py). A client
+# that writes reads from the primary for REPLICA_STICKY_SECONDS, which should
+# exceed the replication lag.
+DATABASES.update(replica_configs(DATABASES['default']))
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['core.routing.PrimaryReplicaRouter']
+REPLICA_STICKY_SECONDS = 10
+
+
+# Background jobs
+# Side effects such as notification fan-out are queued in the database and run by
+# `python manage.py run_jobs`. Set JOBS_EAGER to run them inline without a worker.
+
+JOBS_EAGER = False
+JOBS_MAX_ATTEMPTS = 5
+JOBS_BACKOFF_BASE = 5        # Seconds before the first retry, doubled on every attempt
+JOBS_BACKOFF_MAX = 15 * 60   # Upper bound for the retry delay in seconds
+
+
+# Notification feed page size (`?page_size=` is clamped to the maximum)
+
+NOTIFICATIONS_PAGE_SIZE = 20
+NOTIFICATIONS_MAX_PAGE_SIZE = 100
+
+
+# Project board column page size (`?page_size=` is clamped to the maximum)
+
+BOARD_PAGE_SIZE = 20
+BOARD_MAX_PAGE_SIZE = 100
+
+
+# Notification stream (Server-Sent Events at /notifications/stream/, served by project/asgi.py)
+# Notifications written by other processes (the job worker) are signalled through
+# the cache, so they are pushed across processes only with a shared cache (REDIS_URL).
+
+NOTIFICATION_STREAM_HEARTBEAT = 15         # Seconds between keep-alive comments on an idle stream
+NOTIFICATION_STREAM_RELAY_INTERVAL = 0.5   # Seconds between each process's cache checks for signals from other processes
+NOTIFICATION_STREAM_POLL_INTERVAL = 60     # Seconds between fallback database checks for signals that never arrived
+NOTIFICATION_STREAM_BUFFER = 100           # Pending events per connection before it falls back to a database catch-up
+
+
+# Cache
+# Set REDIS_URL so every process shares the cache; the local-memory default is
+# per process, which leaves invalidations unseen by the other workers.
+
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'project-management',
+        }
+    }
+
+# Authentication: seconds a user row is reused before it is reloaded for a token,
+# and how many users each process keeps (see core/authentication.py)
+
+AUTH_USER_CACHE_TTL = 30
+AUTH_USER_CACHE_SIZE = 10_000
+
+# Image renditions (thumbnail and preview sizes are in core/images.py)
+
+IMAGE_RENDITION_FORMAT = 'WEBP'   # Falls back to JPEG when Pillow is built without WebP
+IMAGE_RENDITION_QUALITY = 80
+
+# Project list/detail response cache (see core/caching.py)
+
+PROJECT_CACHE_TIMEOUT = 5 * 60       # Seconds an entry lives; invalidation normally replaces it sooner
+PROJECT_CACHE_LOCK_TIMEOUT = 10      # Seconds a rebuild may hold the stampede lock
+PROJECT_CACHE_WAIT = 2               # Seconds a request waits for another's rebuild before building itself
+
+# Chunked, resumable uploads (see core/uploads.py)
+
+UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024         # Chunk size suggested to clients
+UPLOAD_MAX_CHUNK_SIZE = 16 * 1024 * 1024    # Largest chunk accepted in one request
+UPLOAD_MAX_SIZE = 50 * 1024 * 1024          # Largest file
+UPLOAD_USER_QUOTA = 500 * 1024 * 1024       # Bytes a user may hold in unfinished uploads
+UPLOAD_EXPIRY_HOURS = 24                    # Idle uploads are aborted by `manage.py purge_uploads`
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -191,6 +277,23 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Media responses (core/media.py). Set MEDIA_SERVE_OFFLOAD to 'x-accel-redirect' (nginx,
+# with an internal location at MEDIA_ACCEL_REDIRECT_PREFIX aliased to MEDIA_ROOT) or
+# 'x-sendfile' (Apache/lighttpd) to let the front proxy send the file bytes.
+MEDIA_SERVE_OFFLOAD = os.environ.get('MEDIA_SERVE_OFFLOAD', '')
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+MEDIA_CACHE_MAX_AGE = 60 * 60  # Files outside the content-addressed blob tree may change
+
+# Uploads are stored once per distinct content under media/blobs/ (see core/storage.py)
+STORAGES = {
+    'default': {
+        'BACKEND': 'core.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
 CORS_ALLOW_ALL_ORIGINS = True
 
 